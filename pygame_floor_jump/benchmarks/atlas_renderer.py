@@ -0,0 +1,90 @@
+"""Rendering benchmark: per-game screens against one batched atlas for many Floor-jumper games"""
+# Этот скрипт создает N игр без окна с общими изображениями (ImageResources), симулирует их
+# и рисует каждый кадр двумя способами:
+#     по отдельности - каждая игра рисует свой экран 800x600, который затем уменьшается
+#                      в свою клетку стены (pygame.transform.scale)
+#     атлас          - AtlasRenderer (src/atlas_renderer.py) рисует все игры сразу в одну
+#                      поверхность, плюс get_observations() - массив пикселей всех игр
+# и печатает время кадра для обоих. С --save сохраняет последнюю стену атласа в файл.
+
+# Запуск из каталога pygame_floor_jump:
+#     python -m benchmarks.atlas_renderer --games 16 --scale 0.25 --save wall.png
+
+import argparse
+import random
+import sys
+import time
+from src.headless import create_headless_game
+import src.game_functions as gf
+from src.atlas_renderer import AtlasRenderer
+from src.image_resources import ImageResources
+from src.settings import Settings
+import pygame
+
+def create_games(game_count):
+    """game_count games sharing one ImageResources, each with its own block layout"""
+    pygame.init()
+    image_res = ImageResources(Settings())
+    tile_maps = []
+    for index in range(0, game_count):
+        random.seed(index)
+        tile_maps.append(create_headless_game(image_res=image_res))
+    return (image_res, tile_maps)
+
+def simulate(tile_maps, frames):
+    """Advance every game, a few frames so the games drift apart"""
+    for frame in range(0, frames):
+        for tile_map in tile_maps:
+            tile_map.update()
+
+def draw_separately(tile_maps, screen, atlas):
+    """Draw each game full size and scale it into its cell, the games all draw to the display"""
+    settings = tile_maps[0].settings
+    for tile_map, cell_rect in zip(tile_maps, atlas.cell_rects):
+        screen.fill(settings.bg_color)
+        gf.draw_game_objects(settings, screen, tile_map)
+        atlas.surface.blit(pygame.transform.scale(screen, cell_rect.size), cell_rect)
+
+def run_benchmark(args):
+    """Time both ways of drawing the wall"""
+    image_res, tile_maps = create_games(args.games)
+    atlas = AtlasRenderer(tile_maps[0].settings, image_res, args.games, args.scale, args.columns)
+    screen = tile_maps[0].screen
+    print("{} games, {}x{} cells, {}x{} atlas".format(args.games, atlas.cell_width, atlas.cell_height,
+        atlas.surface.get_width(), atlas.surface.get_height()))
+
+    separate_seconds = 0.0
+    atlas_seconds = 0.0
+    for frame in range(0, args.frames):
+        simulate(tile_maps, args.step)
+
+        start_time = time.perf_counter()
+        draw_separately(tile_maps, screen, atlas)
+        separate_seconds += time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        atlas.render(tile_maps)
+        atlas.get_observations()
+        atlas_seconds += time.perf_counter() - start_time
+
+    print("separately {:8.2f} ms/frame".format(separate_seconds * 1000 / args.frames))
+    print("atlas      {:8.2f} ms/frame  (with observations {})".format(atlas_seconds * 1000 / args.frames,
+        atlas.observations.shape))
+    if args.save:
+        pygame.image.save(atlas.surface, args.save)
+        print("Saved the wall to {}".format(args.save))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare per-game drawing with the batched atlas renderer")
+    parser.add_argument('--games', type=int, default=16, help="number of games")
+    parser.add_argument('--scale', type=float, default=0.25, help="scale of each game in the atlas")
+    parser.add_argument('--columns', type=int, default=None, help="cells per atlas row, square-ish by default")
+    parser.add_argument('--frames', type=int, default=200, help="frames to draw")
+    parser.add_argument('--step', type=int, default=3, help="simulated frames between drawn frames")
+    parser.add_argument('--save', default=None, help="save the last atlas to this image file")
+    args = parser.parse_args()
+
+    if not AtlasRenderer.available:
+        print("atlas_renderer needs NumPy")
+        sys.exit(1)
+    run_benchmark(args)
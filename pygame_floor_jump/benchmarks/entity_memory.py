@@ -0,0 +1,194 @@
+"""Memory benchmark: bytes per game entity for Floor-jumper"""
+# Этот скрипт измеряет, сколько памяти занимает один игровой объект
+# (блок, блоб, частица, бонус времени, цифра) с помощью модуля tracemalloc.
+# Для каждого типа создается N объектов и разница в выделенной памяти делится на N.
+
+# Рядом печатается исходная раскладка тех же объектов (классы Baseline* ниже повторяют
+# атрибуты, которые объекты хранили до перехода на __slots__ и общие ресурсы: у каждого
+# свой __dict__, свои ссылки на настройки и экран, копия rect экрана, а у блоба - свой
+# словарь объектов Animation), чтобы было видно, сколько сэкономлено.
+
+# Запуск из каталога pygame_floor_jump:
+#     python -m benchmarks.entity_memory [N]
+
+import gc
+import os
+import sys
+import tracemalloc
+
+# No window is needed to build the entities
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+from src.settings import Settings
+from src.image_resources import ImageResources
+from src.block import Block
+from src.blob_enemy import Blob
+from src.particle_generator import ParticleGenerator
+from src.particle import Particle
+from src.time_bonus import TimeBonus
+from src.level_timer import LevelTimer
+from src.simulation_clock import SimulationClock
+from src.digit_sprite import DigitSprite
+from src.sprite_resources import SpriteResources
+from pygame.sprite import Sprite
+
+class BaselineBlock(Sprite):
+    """Block as it was stored before the compact layout"""
+
+    def __init__(self, settings, screen, image):
+        super().__init__()
+        self.settings = settings
+        self.screen = screen
+        self.image = image
+        self.rect = self.image.get_rect()
+        self.screen_rect = screen.get_rect()
+        self.dying = False
+
+class BaselineAnimation():
+    """Animation as it was stored, one per animation of each sprite"""
+
+    def __init__(self, frame_sequence, delay):
+        self.animation = frame_sequence
+        self.frames_per_update = delay
+        self.frames_delayed = 0
+        self.current_frame_index = 0
+
+class BaselineBlob(Sprite):
+    """Blob as it was stored before the compact layout"""
+
+    def __init__(self, settings, screen, images):
+        super().__init__()
+        self.settings = settings
+        self.screen = screen
+        self.images = images
+        self.screen_rect = screen.get_rect()
+        self.rect = images[0].get_rect()
+        self.dx = settings.enemy_blob_dx
+        self.dy = 0.0
+        self.falling = False
+        self.falling_frames = 0
+        self.dying = False
+        self.animations = {}
+        self.current_animation = None
+        self.facing_left = False
+        self.margin_left = 0
+        self.margin_right = 0
+        self.margin_top = 0
+        self.margin_bottom = 0
+        self.bound_by_the_laws_of_physics = True
+        self.bound_by_map = True
+        self.collision_check = None
+        self.animations['walk_left'] = BaselineAnimation([0, 1, 2, 1], 2)
+        self.animations['walk_right'] = BaselineAnimation([3, 4, 5, 4], 2)
+        self.animations['jump_down_left'] = BaselineAnimation([6], 1)
+        self.animations['jump_down_right'] = BaselineAnimation([6], 1)
+        self.animations['dead'] = BaselineAnimation([7], 60)
+        self.current_animation = 'walk_right'
+
+class BaselineParticle():
+    """Particle as it was stored before the compact layout"""
+
+    def __init__(self, screen, settings, x, y, dx, dy, width, color):
+        self.x = x
+        self.y = y
+        self.dx = dx
+        self.dy = dy
+        self.color = color
+        self.screen = screen
+        self.screen_rect = self.screen.get_rect()
+        self.settings = settings
+        self.width = width
+
+class BaselineTimeBonus():
+    """TimeBonus as it was stored before the compact layout"""
+
+    def __init__(self, enemy_rect, text, milliseconds, font):
+        self.ms_reduction = milliseconds
+        self.enemy_rect = enemy_rect
+        self.dy = -4
+        self.frame = 0
+        self.frame_delay = 2
+        self.frames_max = 80
+        self.total_frames = 0
+        self.font = font
+        self.text = text
+        self.text_rect = self.font.get_rect(self.text)
+        self.text_rect.left = self.enemy_rect.left
+        self.text_rect.top = self.enemy_rect.top
+        self.color = (255, 0, 0)
+
+class BaselineDigitSprite(Sprite):
+    """DigitSprite (with its FlyInSprite base) as it was stored before the compact layout"""
+
+    def __init__(self, settings, screen, images, digit=0):
+        super().__init__()
+        self.settings = settings
+        self.screen = screen
+        self.screen_rect = self.screen.get_rect()
+        self.image = images[0]
+        self.rect = self.image.get_rect()
+        self.dx = 0.0
+        self.dy = 0.0
+        self.target_top = 0
+        self.target_left = 0
+        self.start_top = 0
+        self.start_left = 0
+        self.frames_max = 0
+        self.frame_current = 0
+        self.images = images
+        self.image_index = digit
+        self.image = self.images[self.image_index]
+        self.screen_rect = screen.get_rect()
+        self.rect = self.images[self.image_index].get_rect()
+
+def measure(count, factory):
+    """Create count entities with factory and return the average traced bytes for each"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    entities = [factory() for index in range(0, count)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list is kept alive until after the measurement
+    del entities
+    return (after - before) / count
+
+def compare(name, count, baseline_factory, factory):
+    """Print the bytes per entity in the baseline and the current layout"""
+    baseline = measure(count, baseline_factory)
+    current = measure(count, factory)
+    print("{:<12} {:>8.1f} {:>8.1f} {:>7.1f}%".format(name, baseline, current, (current - baseline) * 100 / baseline))
+
+def run_benchmark(count):
+    """Measure each entity type the game creates in bulk"""
+    pygame.init()
+    settings = Settings()
+    image_res = ImageResources(settings)
+    settings.image_res = image_res
+    screen = pygame.Surface((settings.screen_width, settings.screen_height))
+    level_timer = LevelTimer(settings, screen, SimulationClock(settings.simulation_step_ms))
+    generator = ParticleGenerator(screen, settings, settings.particle_gen_color, 0, 0)
+    bonus_rect = pygame.Rect(0, 0, settings.enemy_blob_width, settings.enemy_blob_height)
+
+    # Shared by all the sprites of a kind, like BlobPool and LevelInfo do
+    blob_resources = SpriteResources(settings, screen, image_res.enemy_blob_images,
+        image_res.enemy_blob_hitboxes, image_res.enemy_blob_masks)
+    digit_resources = SpriteResources(settings, screen)
+
+    print("Bytes per entity ({} of each)".format(count))
+    print("{:<12} {:>8} {:>8} {:>8}".format('', 'baseline', 'current', 'change'))
+    compare('Block', count, lambda: BaselineBlock(settings, screen, image_res.block_image),
+        lambda: Block(image_res.block_image))
+    compare('Blob', count, lambda: BaselineBlob(settings, screen, image_res.enemy_blob_images),
+        lambda: Blob(blob_resources))
+    compare('Particle', count, lambda: BaselineParticle(screen, settings, 0, 0, 1, -5, 2, settings.particle_gen_color),
+        lambda: Particle(generator, 0, 0, 1, -5, 2, settings.particle_gen_color))
+    compare('TimeBonus', count, lambda: BaselineTimeBonus(bonus_rect, "-0.5 seconds", 0, settings.bonus_font),
+        lambda: TimeBonus(bonus_rect, "-0.5 seconds", 0, level_timer, settings.bonus_font))
+    compare('DigitSprite', count, lambda: BaselineDigitSprite(settings, screen, image_res.digit_images, 0),
+        lambda: DigitSprite(digit_resources, image_res.digit_images, 0))
+
+if __name__ == '__main__':
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
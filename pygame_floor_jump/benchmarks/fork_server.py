@@ -0,0 +1,58 @@
+"""Spawn benchmark: workers that build their own game against workers forked from a fork server"""
+# Этот скрипт запускает SharedMemoryVectorEnv (src/vector_env.py) с разным числом рабочих
+# процессов двумя способами: каждый процесс сам создает игру, или процессы запускаются через
+# fork из готовой игры (ForkServer, src/fork_server.py). Печатает время запуска (до первого
+# reset) на процесс и среднюю память процесса: RSS, PSS (общие страницы поделены между
+# процессами) и собственную (не общую) память. Память читается из /proc - только Linux.
+
+# Запуск из каталога pygame_floor_jump:
+#     python -m benchmarks.fork_server --workers 8,32 --observation symbolic
+
+import argparse
+import sys
+import time
+from src.fork_server import ForkServer
+from src.game_env import ACTION_COUNT
+from src.vector_env import SharedMemoryVectorEnv
+
+def measure(num_envs, steps, fork_server, env_options):
+    """Returns (milliseconds to start per worker, average (rss, pss, private) per worker or None)"""
+    start_time = time.perf_counter()
+    vector_env = SharedMemoryVectorEnv(num_envs, fork_server, **env_options)
+    vector_env.reset(seed=0)
+    start_ms = (time.perf_counter() - start_time) * 1000 / num_envs
+
+    # A few steps so the pages a worker writes to are counted as its own
+    for step in range(0, steps):
+        vector_env.step([step % ACTION_COUNT] * num_envs)
+    usages = [usage for usage in vector_env.get_worker_memory() if usage]
+    vector_env.close()
+    if not usages:
+        return (start_ms, None)
+    return (start_ms, [sum(values) / len(usages) for values in zip(*usages)])
+
+def run_benchmark(args):
+    """Start the workers both ways at each worker count"""
+    env_options = {'observation': args.observation}
+    start_time = time.perf_counter()
+    fork_server = ForkServer(**env_options)
+    print("{} observations, fork server ready in {:.0f}ms".format(args.observation,
+        (time.perf_counter() - start_time) * 1000))
+    for num_envs in [int(count) for count in args.workers.split(',')]:
+        for name, server in (('own game', None), ('fork server', fork_server)):
+            start_ms, usage = measure(num_envs, args.steps, server, env_options)
+            memory = "RSS {:6.1f}MB  PSS {:6.1f}MB  private {:6.1f}MB".format(*[value / 1024 for value in usage]) \
+                if usage else "memory not available"
+            print("{:3d} workers {:<12} {:7.1f} ms/worker  {}".format(num_envs, name, start_ms, memory))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare worker start time and memory with and without the fork server")
+    parser.add_argument('--workers', default='8,32', help="comma separated worker counts")
+    parser.add_argument('--steps', type=int, default=50, help="steps before the memory is read")
+    parser.add_argument('--observation', default='symbolic', choices=('pixels', 'symbolic'), help="observation type")
+    args = parser.parse_args()
+
+    if not SharedMemoryVectorEnv.available or not ForkServer.available:
+        print("fork_server needs NumPy and os.fork")
+        sys.exit(1)
+    run_benchmark(args)
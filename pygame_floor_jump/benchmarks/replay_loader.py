@@ -0,0 +1,46 @@
+"""Throughput benchmark: (observation, action) batches decoded from Floor-jumper replays"""
+# Этот скрипт проходит по повторам с помощью ReplayDataset (src/replay_dataset.py) и печатает
+# скорость выдачи пачек (кадров в секунду), как если бы их потреблял обучающий процесс.
+# С --consume-ms после каждой пачки добавляется пауза, имитирующая шаг обучения.
+
+# Запуск из каталога pygame_floor_jump:
+#     python -m benchmarks.replay_loader game.fjrp [other.fjrp ...] --workers 4 --batch-size 256
+
+import argparse
+import sys
+import time
+from src.replay_dataset import ReplayDataset
+
+def run_benchmark(args):
+    """Read every batch of one pass over the replays"""
+    dataset = ReplayDataset(args.paths, batch_size=args.batch_size, workers=args.workers, prefetch=args.prefetch,
+        shuffle_buffer=args.shuffle_buffer, seed=args.seed)
+    first_batch_time = None
+    start_time = time.perf_counter()
+    for observations, actions in dataset:
+        if first_batch_time is None:
+            first_batch_time = time.perf_counter() - start_time
+            print("batch shapes: observations {} {}, actions {} {}".format(observations.shape, observations.dtype,
+                actions.shape, actions.dtype))
+        if args.consume_ms:
+            time.sleep(args.consume_ms / 1000)
+
+    if first_batch_time is not None:
+        print("first batch after {:.2f}s".format(first_batch_time))
+    print(dataset.get_stats_text())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure how fast replays decode into training batches")
+    parser.add_argument('paths', nargs='+', help="replay files recorded with the default settings")
+    parser.add_argument('--batch-size', type=int, default=256, help="samples per batch")
+    parser.add_argument('--workers', type=int, default=2, help="decoding processes, 0 decodes in this process")
+    parser.add_argument('--prefetch', type=int, default=4, help="segments requested ahead")
+    parser.add_argument('--shuffle-buffer', type=int, default=8192, help="samples shuffled together")
+    parser.add_argument('--seed', type=int, default=0, help="shuffle seed")
+    parser.add_argument('--consume-ms', type=float, default=0, help="pretend each batch takes this long to train on")
+    args = parser.parse_args()
+
+    if not ReplayDataset.available:
+        print("replay_loader needs NumPy")
+        sys.exit(1)
+    run_benchmark(args)
@@ -0,0 +1,83 @@
+"""Memory benchmark: per-worker sprite pixels against sprite pixels in shared memory"""
+# Этот скрипт запускает SharedMemoryVectorEnv (src/vector_env.py) с разным числом рабочих
+# процессов двумя способами: каждый процесс загружает свои изображения, или изображения
+# строятся поверх общей памяти (SharedSprites, src/shared_sprites.py). Для каждого случая
+# печатает измеренную память рабочих процессов из /proc (только Linux): средние PSS (общие
+# страницы поделены между процессами) и USS (только свои страницы) на процесс, их сумму по всем
+# процессам, а с общими изображениями еще и PSS блока общей памяти в процессе (из
+# /proc/<pid>/smaps). Разница USS двух случаев - это пиксели, которые больше не копируются.
+
+# Запуск из каталога pygame_floor_jump:
+#     python -m benchmarks.shared_sprites --workers 8,32,64
+
+import argparse
+import sys
+from src.fork_server import read_memory_usage
+from src.headless import create_headless_game
+from src.shared_sprites import SharedSprites
+from src.vector_env import SharedMemoryVectorEnv
+
+def read_mapping_pss(pid, block_name):
+    """PSS in KB of the process's mappings of the shared memory block, None where /proc/<pid>/smaps isn't available"""
+    try:
+        with open('/proc/{}/smaps'.format(pid)) as file:
+            lines = file.readlines()
+    except OSError:
+        return None
+
+    pss = 0
+    in_block = False
+    for line in lines:
+        fields = line.split()
+        # Each mapping starts with its address range, the file (if any) is the last field
+        if '-' in fields[0] and not fields[0].endswith(':'):
+            in_block = fields[-1].endswith('/' + block_name)
+        elif in_block and fields[0] == 'Pss:':
+            pss += int(fields[1])
+    return pss
+
+def measure(num_envs, shared_sprites, env_options):
+    """Measured memory of the workers in KB: (pss, uss, shared block pss) summed over the workers and
+    the number of workers they were read from, None where /proc can't be read"""
+    vector_env = SharedMemoryVectorEnv(num_envs, shared_sprites=shared_sprites, **env_options)
+    vector_env.reset(seed=0)
+    pids = [process.pid for process in vector_env.processes]
+    usages = [usage for usage in [read_memory_usage(pid) for pid in pids] if usage]
+    block_pss = 0
+    if shared_sprites:
+        block_pss = sum([read_mapping_pss(pid, shared_sprites.memory.name) or 0 for pid in pids])
+    vector_env.close()
+    if not usages:
+        return None
+    return (sum([usage[1] for usage in usages]), sum([usage[2] for usage in usages]), block_pss, len(usages))
+
+def run_benchmark(args):
+    """Compare the image memory of the workers with and without the shared sprites"""
+    env_options = {'observation': args.observation}
+    tile_map = create_headless_game()
+    shared_sprites = SharedSprites(tile_map.settings.image_res)
+    print("images: {:.1f}KB loaded per worker, {:.1f}KB in shared memory".format(
+        tile_map.settings.image_res.get_memory_usage()[0] / 1024, shared_sprites.size / 1024))
+
+    for num_envs in [int(count) for count in args.workers.split(',')]:
+        for name, sprites in (('loaded', None), ('shared', shared_sprites)):
+            usage = measure(num_envs, sprites, env_options)
+            if not usage:
+                print("{:3d} workers {:<7} memory not available".format(num_envs, name))
+                continue
+            pss, uss, block_pss, count = usage
+            block = "  shared block PSS {:5.1f}KB/worker".format(block_pss / count) if sprites else ""
+            print("{:3d} workers {:<7} PSS {:6.2f}MB/worker {:7.1f}MB total  USS {:6.2f}MB/worker {:7.1f}MB total{}".format(
+                num_envs, name, pss / count / 1024, pss / 1024, uss / count / 1024, uss / 1024, block))
+    shared_sprites.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the image memory of workers with and without shared sprites")
+    parser.add_argument('--workers', default='8,32,64', help="comma separated worker counts")
+    parser.add_argument('--observation', default='symbolic', choices=('pixels', 'symbolic'), help="observation type")
+    args = parser.parse_args()
+
+    if not SharedSprites.available or not SharedMemoryVectorEnv.available:
+        print("shared_sprites needs NumPy")
+        sys.exit(1)
+    run_benchmark(args)
@@ -0,0 +1,58 @@
+"""Throughput benchmark: shared memory against pipe transport for Floor-jumper vector environments"""
+# Этот скрипт запускает SharedMemoryVectorEnv и PipeVectorEnv (src/vector_env.py) с разным числом
+# рабочих процессов, делает одинаковое число шагов со случайными действиями и печатает
+# шагов сред в секунду и время запуска. Разница - стоимость передачи наблюдений.
+
+# Запуск из каталога pygame_floor_jump:
+#     python -m benchmarks.vector_env --workers 8,32,64 --observation pixels --downsample 4
+
+import argparse
+import sys
+import time
+from src.game_env import ACTION_COUNT
+from src.vector_env import PipeVectorEnv, SharedMemoryVectorEnv
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def measure(vector_env_class, num_envs, steps, env_options):
+    """Steps per second of one vector environment, returns (start seconds, steps per second)"""
+    start_time = time.perf_counter()
+    vector_env = vector_env_class(num_envs, **env_options)
+    vector_env.reset(seed=0)
+    start_seconds = time.perf_counter() - start_time
+
+    rng = numpy.random.default_rng(0)
+    all_actions = rng.integers(0, ACTION_COUNT, size=(steps, num_envs))
+    start_time = time.perf_counter()
+    for actions in all_actions:
+        vector_env.step(actions)
+    seconds = time.perf_counter() - start_time
+    vector_env.close()
+    return (start_seconds, steps * num_envs / seconds)
+
+def run_benchmark(args):
+    """Compare both transports at each worker count"""
+    env_options = {'observation': args.observation, 'grayscale': args.grayscale, 'downsample': args.downsample}
+    print("{} observations, {} steps".format(args.observation, args.steps))
+    for num_envs in [int(count) for count in args.workers.split(',')]:
+        for name, vector_env_class in (('shared memory', SharedMemoryVectorEnv), ('pipes', PipeVectorEnv)):
+            start_seconds, steps_per_second = measure(vector_env_class, num_envs, args.steps, env_options)
+            print("{:3d} workers {:<14} {:9.0f} steps/s  (started in {:.1f}s)".format(num_envs, name,
+                steps_per_second, start_seconds))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare shared memory and pipe transport for vector environments")
+    parser.add_argument('--workers', default='8,32,64', help="comma separated worker counts")
+    parser.add_argument('--steps', type=int, default=200, help="steps of every environment")
+    parser.add_argument('--observation', default='pixels', choices=('pixels', 'symbolic'), help="observation type")
+    parser.add_argument('--grayscale', action='store_true', help="grayscale pixel observations")
+    parser.add_argument('--downsample', type=int, default=1, help="keep every Nth pixel")
+    args = parser.parse_args()
+
+    if not SharedMemoryVectorEnv.available:
+        print("vector_env needs NumPy")
+        sys.exit(1)
+    run_benchmark(args)
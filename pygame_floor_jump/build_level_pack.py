@@ -0,0 +1,73 @@
+# Этот скрипт - офлайн генератор набора уровней (level pack) для игры "Floor jumper".
+
+# Сначала LevelValidator один раз проверяет, что по физике прыжка из Settings и хитбоксам
+# игрока уровни вообще можно пройти (от раскладки это не зависит, см. src/level_validator.py).
+# Затем для каждого seed (начиная с --seed) создается раскладка блоков тем же способом, что и игра,
+# и для нее считается число ударов, нужное чтобы подняться наверх (оценка сложности).
+# Подсчет идет параллельно в нескольких процессах (multiprocessing.Pool).
+
+# --count раскладок записываются в файл, который игра загружает, если в Settings указан level_pack_file.
+
+# Запуск из каталога pygame_floor_jump:
+#     python build_level_pack.py levels.fjlp --count 1000 --seed 1 --workers 4
+
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+# The workers only need the settings numbers, not the pygame banner
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame.freetype
+from src.settings import Settings
+from src.image_resources import ImageResources
+from src.level_pack import generate_layout, write_level_pack
+from src.level_validator import LevelValidator
+
+# Set in each worker process by init_worker()
+worker_validator = None
+
+def init_worker(validator):
+    """Keep a copy of the validator in the worker process"""
+    global worker_validator
+    worker_validator = validator
+
+def check_seed(seed):
+    """Generate the layout for a seed and rate it, returns (seed, hits, layout)"""
+    layout = generate_layout(worker_validator.row_width, worker_validator.row_count, random.Random(seed))
+    return (seed, worker_validator.validate(layout), bytes(layout))
+
+def build_level_pack(path, count, first_seed, workers):
+    """Check the jump physics, then rate the layouts of count seeds from first_seed onwards and write them to path"""
+    # Settings makes fonts, so freetype has to be up even though they aren't used
+    pygame.freetype.init()
+    settings = Settings()
+    validator = LevelValidator(settings, ImageResources(settings).player_sprite_hitboxes)
+    print("jump rise {:.1f}px, {} frames above the next floor, head {}px, hitbox {}px wide".format(validator.max_rise,
+        validator.frames_above_floor, validator.head_height, validator.hitbox_width))
+    if not validator.can_climb():
+        print("the levels can't be climbed with the current jump settings, nothing written")
+        return
+
+    if first_seed + count - 1 > 0xffffffff:
+        raise ValueError("Seeds have to fit in 32 bits")
+    start_time = time.perf_counter()
+    with multiprocessing.Pool(workers, init_worker, (validator,)) as pool:
+        records = pool.map(check_seed, range(first_seed, first_seed + count), chunksize=64)
+
+    elapsed = time.perf_counter() - start_time
+    hits = [record[1] for record in records]
+    print("rated {} layouts in {:.2f}s, {} to {} hits".format(len(records), elapsed, min(hits), max(hits)))
+    write_level_pack(path, validator.row_width, validator.row_count, records)
+    print("wrote {} levels to {} ({} bytes)".format(len(records), path, os.path.getsize(path)))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build a pack of validated Floor-jumper levels")
+    parser.add_argument('path', help="level pack file to write")
+    parser.add_argument('--count', type=int, default=1000, help="number of levels in the pack")
+    parser.add_argument('--seed', type=int, default=1, help="first seed to try")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    args = parser.parse_args()
+    build_level_pack(args.path, args.count, args.seed, args.workers)
@@ -11,12 +11,19 @@
 # включая вывод карты плиток на экран. Цикл управляется объектом Pygame clock, 
 # который обеспечивает запуск игры с фиксированной частотой 30 кадров в секунду.
 
+# Если в настройках задан replay_record_file, каждый кадр вместе с вводом игрока
+# записывается в файл повтора (ReplayWriter), который закрывается при выходе из игры.
+# Так же, если задан telemetry_file, каждый кадр пишется в файл телеметрии (TelemetryRecorder).
+
 # В целом, код представляет собой простой, но полноценный игровой скрипт,
 # который инициализирует, запускает и управляет базовой игрой на основе Pygame.
 
 import src.game_functions as gf
 from src.image_resources import ImageResources
+from src.replay import ReplayWriter
+from src.telemetry import TelemetryRecorder
 from src.settings import Settings
+from src.simulation_clock import SimulationClock
 from src.tilemap import Tilemap
 import random
 import pygame
@@ -39,9 +46,13 @@ def run_game():
     screen = pygame.display.set_mode((settings.screen_width, settings.screen_height))
     pygame.display.set_caption(settings.caption)
     
+    # Game time is counted in fixed simulation steps, each tilemap update advances it by one
+    sim_clock = SimulationClock(settings.simulation_step_ms)
+
     # Create a 2D tilemap - this takes a list of indices and an image list to produce a tiled surface
     tile_map = Tilemap(settings, screen, settings.map_indicies, image_res.tile_images, 
-        image_res.block_image, image_res.blob_exit_images, image_res.player_sprite_images, image_res.enemy_blob_images)
+        image_res.block_image, image_res.blob_exit_images, image_res.player_sprite_images, image_res.enemy_blob_images,
+        sim_clock)
 
     # Overwrite default indices with generated map 
     tile_map.generate_basic_map(settings.map_number_floors , settings.map_number_subfloors)
@@ -49,20 +60,38 @@ def run_game():
     # Reset the game
     gf.reset_game(tile_map)
 
+    # Optionally record the game, the inputs of each frame are enough to replay it
+    replay_writer = None
+    if settings.replay_record_file:
+        replay_writer = ReplayWriter(settings.replay_record_file, settings.replay_keyframe_interval)
+    # Optionally log telemetry, written on a background thread
+    if settings.telemetry_file:
+        tile_map.telemetry = TelemetryRecorder(settings.telemetry_file, tile_map)
+
     # Use pygame's simple loop management for a fixed 30 FPS
     clock = pygame.time.Clock()
-    while True:
-        # Should make sure each frame spends at least 1/30 seconds in this loop
-        # downside is wasted sleep on fast hardware and slow hardware will lag
-        # but slow hardware will always lag and implementing a time-delta based
-        # loop for this simple game is IMHO overkill.
-        clock.tick(30)
-
-        # Process system events (key-presses, joystick, etc)
-        gf.check_events(settings, screen, tile_map)
-
-        # Update the game (this will update all sub-object and render them to the screen)
-        gf.update_screen(settings, screen, tile_map)
+    try:
+        while True:
+            # Should make sure each frame spends at least 1/30 seconds in this loop
+            # downside is wasted sleep on fast hardware and slow hardware will lag
+            # but slow hardware will always lag and implementing a time-delta based
+            # loop for this simple game is IMHO overkill.
+            clock.tick(round(1000 / settings.simulation_step_ms))
+
+            # Process system events (key-presses, joystick, etc)
+            input_mask = gf.check_events(settings, screen, tile_map)
+            if replay_writer:
+                replay_writer.record_frame(tile_map, input_mask)
+            gf.apply_input(settings, screen, tile_map, input_mask)
+
+            # Update the game (this will update all sub-object and render them to the screen)
+            gf.update_screen(settings, screen, tile_map)
+    finally:
+        # exit_game() leaves through sys.exit, the recording still gets its index
+        if replay_writer:
+            replay_writer.close()
+        if tile_map.telemetry:
+            tile_map.telemetry.close()
     
 # Invokes the function above when the script is run
 run_game()
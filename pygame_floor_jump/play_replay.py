@@ -0,0 +1,98 @@
+# Этот скрипт воспроизводит повтор игры "Floor jumper", записанный с replay_record_file в настройках.
+
+# Карта создается так же, как в floor_jumper.py (с теми же настройками, что и при записи),
+# затем ReplayReader переходит к кадру --frame (восстанавливает ближайший ключевой кадр и
+# досчитывает симуляцию) и дальше подает записанный ввод кадр за кадром.
+
+# С --stats окно не открывается: печатается размер файла, число кадров и сегментов
+# и время перехода к нескольким кадрам.
+
+# Запуск из каталога pygame_floor_jump:
+#     python play_replay.py game.fjrp --frame 1200
+#     python play_replay.py game.fjrp --stats
+
+import argparse
+import os
+import random
+import time
+import pygame
+import src.game_functions as gf
+from src.image_resources import ImageResources
+from src.replay import ReplayReader
+from src.settings import Settings
+from src.tilemap import Tilemap
+
+def create_tile_map(settings, screen):
+    """Set up the map the same way the game does, the replay's keyframes overwrite its state"""
+    tile_map = Tilemap(settings, screen, settings.map_indicies, settings.image_res.tile_images,
+        settings.image_res.block_image, settings.image_res.blob_exit_images, settings.image_res.player_sprite_images,
+        settings.image_res.enemy_blob_images)
+    tile_map.generate_basic_map(settings.map_number_floors, settings.map_number_subfloors)
+    gf.reset_game(tile_map)
+    return tile_map
+
+def print_stats(reader, tile_map):
+    """Size of the replay and the cost of seeking in it"""
+    first_frame = reader.get_first_frame()
+    end_frame = reader.get_end_frame()
+    frame_count = end_frame - first_frame
+    file_size = os.path.getsize(reader.path)
+    print("{} frames ({:.1f}s of play) in {} segments, {} bytes, {:.2f} bytes per frame".format(frame_count,
+        frame_count * tile_map.settings.simulation_step_ms / 1000, reader.segment_count, file_size,
+        file_size / max(1, frame_count)))
+
+    seek_times = []
+    for frame in random.Random(0).sample(range(first_frame, end_frame), min(20, frame_count)):
+        start_time = time.perf_counter()
+        reader.seek(tile_map, frame)
+        seek_times.append(time.perf_counter() - start_time)
+    print("seek: {:.1f}ms average, {:.1f}ms worst".format(sum(seek_times) * 1000 / len(seek_times), max(seek_times) * 1000))
+
+def play_replay(path, frame, stats):
+    """Play the replay from the frame, or just report on it"""
+    if stats:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+
+    settings = Settings()
+    settings.image_res = ImageResources(settings)
+    screen = pygame.display.set_mode((settings.screen_width, settings.screen_height))
+    pygame.display.set_caption(settings.caption)
+    tile_map = create_tile_map(settings, screen)
+
+    reader = ReplayReader(path)
+    if stats:
+        print_stats(reader, tile_map)
+        reader.close()
+        return
+
+    if frame is None:
+        frame = reader.get_first_frame()
+    reader.seek(tile_map, frame)
+
+    clock = pygame.time.Clock()
+    end_frame = reader.get_end_frame()
+    segment = reader.find_segment(frame)
+    while segment < reader.segment_count:
+        first_frame, keyframe, inputs = reader.read_segment(segment)
+        for input_mask in inputs[frame - first_frame:]:
+            clock.tick(round(1000 / settings.simulation_step_ms))
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                    reader.close()
+                    return
+            gf.apply_input(settings, screen, tile_map, input_mask)
+            gf.update_screen(settings, screen, tile_map)
+        segment += 1
+        frame = first_frame + len(inputs)
+
+    print("replay finished at frame {}".format(end_frame))
+    reader.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play a Floor-jumper replay")
+    parser.add_argument('path', help="replay file recorded with replay_record_file in settings")
+    parser.add_argument('--frame', type=int, default=None, help="simulation frame to start playing from")
+    parser.add_argument('--stats', action='store_true', help="print the replay size and seek times instead of playing")
+    args = parser.parse_args()
+    play_replay(args.path, args.frame, args.stats)
@@ -0,0 +1,93 @@
+# Этот скрипт загружает записанные сессии игры "Floor jumper" (файлы телеметрии, telemetry_file
+# в настройках) в колоночное хранилище (AnalyticsStore) и выполняет запросы к нему.
+
+# Команды:
+#     ingest      - добавить файлы телеметрии в хранилище
+#     deaths      - карта смертей по клеткам карты (можно только для одного этажа и/или уровня)
+#     level-times - процентили времени прохождения каждого уровня
+#     summary     - размер хранилища
+
+# Результаты запросов кэшируются в хранилище, повторный запрос читается из кэша.
+
+# Запуск из каталога pygame_floor_jump:
+#     python session_analytics.py ingest store sessions/*.fjtl
+#     python session_analytics.py deaths store --floor 5
+#     python session_analytics.py level-times store --percentiles 50,90
+
+import argparse
+import sys
+import time
+from src.analytics_store import AnalyticsStore
+
+def print_heatmap(heatmap):
+    """The death counts as a grid, the top tile row first"""
+    rows = heatmap['rows']
+    if not rows:
+        print("no deaths")
+        return
+
+    width = max(len(str(count)) for row in rows for count in row)
+    for row_offset, row in enumerate(rows):
+        tile_row = heatmap['first_row'] + len(rows) - 1 - row_offset
+        print("row {:4d} (floor {:3d}) | {}".format(tile_row, tile_row // heatmap['floor_rows'],
+            ' '.join(str(count).rjust(width) if count else '.'.rjust(width) for count in row)))
+
+def print_level_times(level_times, percentiles):
+    """One line per level"""
+    if not level_times:
+        print("no finished levels")
+        return
+
+    print("level  count  " + "  ".join("p{:<7}".format("{:g}".format(percentile)) for percentile in percentiles))
+    for level in sorted(level_times, key=int):
+        times = level_times[level]
+        print("{:5}  {:5}  ".format(level, times['count']) + "  ".join("{:7.2f}s".format(ms / 1000) for ms in times['percentiles']))
+
+def run_command(args):
+    """Do what the command line asks"""
+    store = AnalyticsStore(args.store)
+    if args.command == 'ingest':
+        start_time = time.perf_counter()
+        added = store.ingest(args.paths, args.shard_rows)
+        print("{} sessions added in {:.2f}s, {} sessions and {} records in {} shards".format(added,
+            time.perf_counter() - start_time, len(store.manifest['sessions']), store.get_row_count(),
+            len(store.manifest['shards'])))
+        return
+
+    if args.command == 'summary':
+        print("{} sessions, {} records in {} shards, generation {}".format(len(store.manifest['sessions']),
+            store.get_row_count(), len(store.manifest['shards']), store.manifest['generation']))
+        return
+
+    start_time = time.perf_counter()
+    if args.command == 'deaths':
+        result, cached = store.run_query('death_heatmap', floor=args.floor, level=args.level)
+        print_heatmap(result)
+    else:
+        percentiles = [float(percentile) for percentile in args.percentiles.split(',')]
+        result, cached = store.run_query('level_times', percentiles=percentiles)
+        print_level_times(result, percentiles)
+    print("{} in {:.1f}ms".format("cached" if cached else "computed", (time.perf_counter() - start_time) * 1000))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load Floor-jumper telemetry into a columnar store and query it")
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = commands.add_parser('ingest', help="add telemetry files to the store")
+    ingest_parser.add_argument('store', help="store directory, created if needed")
+    ingest_parser.add_argument('paths', nargs='+', help="telemetry files")
+    ingest_parser.add_argument('--shard-rows', type=int, default=1000000, help="records per shard")
+    deaths_parser = commands.add_parser('deaths', help="death counts per map tile")
+    deaths_parser.add_argument('store', help="store directory")
+    deaths_parser.add_argument('--floor', type=int, default=None, help="only this floor, 0 is the ground floor")
+    deaths_parser.add_argument('--level', type=int, default=None, help="only this level")
+    times_parser = commands.add_parser('level-times', help="time to finish each level")
+    times_parser.add_argument('store', help="store directory")
+    times_parser.add_argument('--percentiles', default='50,90,99', help="comma separated percentiles")
+    summary_parser = commands.add_parser('summary', help="size of the store")
+    summary_parser.add_argument('store', help="store directory")
+    args = parser.parse_args()
+
+    if not AnalyticsStore.available:
+        print("session_analytics.py needs NumPy")
+        sys.exit(1)
+    run_command(args)
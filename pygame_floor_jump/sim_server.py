@@ -0,0 +1,106 @@
+# Этот скрипт запускает сервер симуляции "Floor jumper" (SimulationServer, src/sim_server.py),
+# к которому внешние программы (боты) подключаются по сокету и играют через reset/step/observe,
+# или генератор нагрузки для такого сервера.
+
+# Команды:
+#     serve - запустить сервер (TCP или Unix-сокет), статистика печатается при остановке (Ctrl+C)
+#     load  - подключить N клиентов к серверу и напечатать запросы в секунду и процентили задержки;
+#             с --spawn-server сервер запускается в отдельном процессе на время теста
+
+# Запуск из каталога pygame_floor_jump:
+#     python sim_server.py serve --port 7777
+#     python sim_server.py load --port 7777 --clients 64 --pipeline 2 --duration 10
+#     python sim_server.py load --unix /tmp/fj.sock --spawn-server
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from src.sim_server import SimulationServer, SimulationClient, run_load_test
+
+def create_server(args):
+    """The server with the options from the command line"""
+    return SimulationServer(args.max_sessions, args.batch_size, args.max_queued, args.max_pending, args.env_pool,
+        observation=args.observation)
+
+def run_server(args):
+    """Serve until interrupted, then print the stats"""
+    server = create_server(args)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    print(server.get_stats_text())
+
+async def wait_for_server(args, timeout=30.0):
+    """Wait until the server accepts connections"""
+    end_time = time.perf_counter() + timeout
+    while True:
+        try:
+            client = await SimulationClient.connect(args.host, args.port, args.unix)
+            await client.close()
+            return
+        except (ConnectionError, FileNotFoundError):
+            if time.perf_counter() > end_time:
+                raise
+            await asyncio.sleep(0.1)
+
+async def run_load(args):
+    """Run the load test and print the results"""
+    await wait_for_server(args)
+    percentiles = [float(percentile) for percentile in args.percentiles.split(',')]
+    result = await run_load_test(args.clients, args.duration, args.pipeline, args.host, args.port, args.unix, percentiles)
+    print("{} clients x {} in flight: {} steps in {:.1f}s, {:.0f} requests/s, {} shed".format(args.clients, args.pipeline,
+        result['requests'], result['seconds'], result['rps'], result['shed']))
+    print("latency " + "  ".join("p{:g} {:.2f}ms".format(percentile, ms) for percentile, ms in result['percentiles'])
+        + "  max {:.2f}ms".format(result['max_ms']))
+
+def run_command(args):
+    """Do what the command line asks"""
+    if args.command == 'serve':
+        run_server(args)
+        return
+
+    server_process = None
+    if args.spawn_server:
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+        server_process = multiprocessing.Process(target=run_server, args=(args,), daemon=True)
+        server_process.start()
+    try:
+        asyncio.run(run_load(args))
+    finally:
+        if server_process:
+            # As if Ctrl+C was pressed, so the server prints its stats
+            os.kill(server_process.pid, signal.SIGINT)
+            server_process.join()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve Floor-jumper games over a socket, or load test a server")
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help="run the simulation server")
+    load_parser = commands.add_parser('load', help="load test a simulation server")
+    for command_parser in (serve_parser, load_parser):
+        command_parser.add_argument('--host', default='127.0.0.1', help="TCP host")
+        command_parser.add_argument('--port', type=int, default=7777, help="TCP port")
+        command_parser.add_argument('--unix', default=None, help="Unix socket path, used instead of TCP")
+        command_parser.add_argument('--observation', default='symbolic', choices=('pixels', 'symbolic'), help="observation type")
+        command_parser.add_argument('--max-sessions', type=int, default=256, help="connections served at once")
+        command_parser.add_argument('--batch-size', type=int, default=64, help="requests run per event loop tick")
+        command_parser.add_argument('--max-queued', type=int, default=4, help="requests queued per session")
+        command_parser.add_argument('--max-pending', type=int, default=1024, help="requests queued in all, over it busy sessions are shed")
+        command_parser.add_argument('--env-pool', type=int, default=16, help="games created before serving")
+    load_parser.add_argument('--clients', type=int, default=32, help="client connections")
+    load_parser.add_argument('--pipeline', type=int, default=1, help="steps each client keeps in flight")
+    load_parser.add_argument('--duration', type=float, default=5.0, help="seconds to run")
+    load_parser.add_argument('--percentiles', default='50,90,99', help="comma separated latency percentiles")
+    load_parser.add_argument('--spawn-server', action='store_true', help="run a server in another process for the test")
+    args = parser.parse_args()
+
+    if args.command == 'load' and not args.spawn_server and args.unix and not os.path.exists(args.unix):
+        print("No server at {}".format(args.unix))
+        sys.exit(1)
+    run_command(args)
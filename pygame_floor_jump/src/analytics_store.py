@@ -0,0 +1,242 @@
+"""This module implements the columnar analytics store for recorded Floor-jumper sessions"""
+# Этот код определяет класс AnalyticsStore - хранилище записанных сессий (файлов телеметрии,
+# см. src/telemetry.py) в колоночном виде для быстрых запросов, например "где игроки умирают
+# на 5 этаже" или "медианное время прохождения уровня".
+
+# ingest() читает файлы телеметрии и раскладывает записи по частям (shards): каждая часть -
+# это каталог с одним файлом .npy на колонку (кадр, уровень, положение игрока, флаги и т.д.).
+# При загрузке добавляются вычисляемые колонки: номер сессии, клетка карты (колонка, ряд
+# плиток от низа первого этажа, этаж) и события (EVENT_*: начало смерти, завершение уровня).
+# Сессия никогда не делится между частями.
+
+# manifest.json - небольшой индекс: колонки и их типы, части (число строк, диапазон уровней),
+# загруженные сессии и число рядов плиток в этаже (из заголовков телеметрии, у всех сессий
+# хранилища оно должно совпадать). Повторная загрузка того же файла пропускается.
+
+# Запросы (death_heatmap, level_times) открывают колонки через numpy.load(mmap_mode='r'),
+# поэтому в память читаются только нужные колонки нужных частей, а части без нужного уровня
+# пропускаются по манифесту. Вычисления векторные (NumPy).
+# Результаты кэшируются в каталоге cache по хэшу запроса и поколения манифеста
+# (поколение меняется при каждой загрузке, поэтому кэш не устаревает).
+
+# NumPy не является обязательной зависимостью игры: без него AnalyticsStore.available равно False.
+
+import hashlib
+import json
+import os
+from src.telemetry import (TELEMETRY_HEADER_FORMAT, TELEMETRY_RECORD_FORMAT, TELEMETRY_MAGIC, TELEMETRY_VERSION,
+    TELEMETRY_FLAG_DYING, TELEMETRY_FLAG_AT_TOP)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MANIFEST_VERSION = 2
+# Bits of the events column
+EVENT_DEATH = 1
+EVENT_LEVEL_DONE = 2
+
+if numpy is not None:
+    # The same layout as TELEMETRY_RECORD_FORMAT, so a file's records load in one read
+    TELEMETRY_DTYPE = numpy.dtype([('frame', '<u4'), ('level', '<u2'), ('x', '<i4'), ('bottom', '<i4'), ('flags', 'u1'),
+        ('blobs', '<u2'), ('blocks_removed', '<u4'), ('kills', '<u4'), ('elapsed_ms', '<f8'), ('frame_ms', '<f4')])
+    # Stored columns, the record fields plus the ones worked out on ingest
+    COLUMN_DTYPES = [(name, TELEMETRY_DTYPE.fields[name][0]) for name in TELEMETRY_DTYPE.names] + [
+        ('session', numpy.dtype('<u4')), ('tile_col', numpy.dtype('<i2')), ('tile_row', numpy.dtype('<i2')),
+        ('floor', numpy.dtype('<i2')), ('events', numpy.dtype('u1'))]
+
+def read_telemetry(path):
+    """Returns (header values, record array) of a telemetry file"""
+    with open(path, 'rb') as telemetry_file:
+        header = TELEMETRY_HEADER_FORMAT.unpack(telemetry_file.read(TELEMETRY_HEADER_FORMAT.size))
+        magic, version, record_size = header[0:3]
+        if magic != TELEMETRY_MAGIC or version != TELEMETRY_VERSION or record_size != TELEMETRY_RECORD_FORMAT.size:
+            raise ValueError("{} is not a version {} telemetry file".format(path, TELEMETRY_VERSION))
+        # A session that was cut off can end in a partial record, which is left out
+        data = telemetry_file.read()
+    record_count = len(data) // TELEMETRY_DTYPE.itemsize
+    return (header, numpy.frombuffer(data, dtype=TELEMETRY_DTYPE, count=record_count))
+
+def get_onsets(mask):
+    """True where the mask becomes True, i.e. it is True and was False on the previous record"""
+    onsets = mask.copy()
+    onsets[1:] &= ~mask[:-1]
+    return onsets
+
+class AnalyticsStore():
+    """Columnar .npy shards of telemetry records with a JSON manifest, and the queries over them"""
+
+    # False when NumPy isn't installed
+    available = numpy is not None
+
+    def __init__(self, path):
+        """Open the store at path, an empty one if it doesn't exist yet"""
+        self.path = path
+        self.manifest_path = os.path.join(path, 'manifest.json')
+        self.cache_path = os.path.join(path, 'cache')
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as manifest_file:
+                self.manifest = json.load(manifest_file)
+            if self.manifest['version'] != MANIFEST_VERSION:
+                raise ValueError("{} is a version {} store, expected {}".format(path, self.manifest['version'], MANIFEST_VERSION))
+        else:
+            # floor_rows is taken from the first session ingested
+            self.manifest = {'version': MANIFEST_VERSION, 'generation': 0, 'floor_rows': None,
+                'columns': {name: dtype.str for name, dtype in COLUMN_DTYPES}, 'shards': [], 'sessions': []}
+
+    def save_manifest(self):
+        """Write the manifest, through a temporary file so a crash never leaves half of one"""
+        temporary_path = self.manifest_path + '.tmp'
+        with open(temporary_path, 'w') as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=1)
+        os.replace(temporary_path, self.manifest_path)
+
+    def get_session_columns(self, session_id, header, records):
+        """The stored columns for one session's records"""
+        magic, version, record_size, map_left, ground_bottom, tile_width, tile_height, floor_rows = header
+        columns = {name: records[name] for name in TELEMETRY_DTYPE.names}
+        columns['session'] = numpy.full(len(records), session_id, dtype='<u4')
+        columns['tile_col'] = ((records['x'] - map_left) // tile_width).astype('<i2')
+        # Tile rows and floors are counted up from the ground floor, the feet are in the row above the bottom
+        tile_row = (ground_bottom - records['bottom']) // tile_height
+        columns['tile_row'] = tile_row.astype('<i2')
+        columns['floor'] = (tile_row // floor_rows).astype('<i2')
+        events = numpy.zeros(len(records), dtype='u1')
+        events[get_onsets((records['flags'] & TELEMETRY_FLAG_DYING) != 0)] |= EVENT_DEATH
+        events[get_onsets((records['flags'] & TELEMETRY_FLAG_AT_TOP) != 0)] |= EVENT_LEVEL_DONE
+        columns['events'] = events
+        return columns
+
+    def ingest(self, paths, shard_rows=1000000):
+        """Add telemetry files to the store, roughly shard_rows records per shard.  Returns the number of sessions added"""
+        known_paths = set(session['path'] for session in self.manifest['sessions'])
+        pending = []
+        pending_rows = 0
+        added = 0
+        for path in paths:
+            path = os.path.abspath(path)
+            if path in known_paths:
+                continue
+            header, records = read_telemetry(path)
+            # The floor column and the heatmap's floors need the same floor height in every session
+            floor_rows = header[-1]
+            if self.manifest['floor_rows'] is None:
+                self.manifest['floor_rows'] = floor_rows
+            elif floor_rows != self.manifest['floor_rows']:
+                raise ValueError("{} has floors of {} tile rows, the store has {}".format(path, floor_rows,
+                    self.manifest['floor_rows']))
+            session_id = len(self.manifest['sessions'])
+            self.manifest['sessions'].append({'id': session_id, 'path': path, 'rows': len(records)})
+            known_paths.add(path)
+            pending.append((session_id, self.get_session_columns(session_id, header, records)))
+            pending_rows += len(records)
+            added += 1
+            if pending_rows >= shard_rows:
+                self.write_shard(pending)
+                pending = []
+                pending_rows = 0
+
+        if pending:
+            self.write_shard(pending)
+        if added:
+            self.manifest['generation'] += 1
+            self.save_manifest()
+        return added
+
+    def write_shard(self, sessions):
+        """Write the columns of some (session id, columns) as a new shard, one .npy file per column"""
+        name = 'shard_{:05d}'.format(len(self.manifest['shards']))
+        shard_path = os.path.join(self.path, name)
+        os.makedirs(shard_path, exist_ok=True)
+        for column, dtype in COLUMN_DTYPES:
+            numpy.save(os.path.join(shard_path, column + '.npy'),
+                numpy.concatenate([columns[column] for session_id, columns in sessions]).astype(dtype, copy=False))
+
+        # The level range lets queries for one level skip the shard
+        levels = numpy.concatenate([columns['level'] for session_id, columns in sessions])
+        self.manifest['shards'].append({'name': name, 'rows': int(levels.size),
+            'min_level': int(levels.min()) if levels.size else 0, 'max_level': int(levels.max()) if levels.size else 0,
+            'sessions': [sessions[0][0], sessions[-1][0]]})
+
+    def get_shards(self, level=None):
+        """The shards that can hold records of the level (all of them when level is None)"""
+        return [shard for shard in self.manifest['shards']
+            if level is None or shard['min_level'] <= level <= shard['max_level']]
+
+    def load_column(self, shard, column):
+        """A column of a shard, memory-mapped"""
+        return numpy.load(os.path.join(self.path, shard['name'], column + '.npy'), mmap_mode='r')
+
+    def get_row_count(self):
+        """Records in the store"""
+        return sum(shard['rows'] for shard in self.manifest['shards'])
+
+    def run_query(self, name, **params):
+        """Run a query method (e.g. 'death_heatmap') by name, returns (result, True if it came from the cache).
+        The result is cached by the query, its parameters and the manifest generation"""
+        key = json.dumps([name, params, self.manifest['generation']], sort_keys=True)
+        cache_file_path = os.path.join(self.cache_path, hashlib.sha1(key.encode()).hexdigest() + '.json')
+        if os.path.exists(cache_file_path):
+            with open(cache_file_path) as cache_file:
+                return (json.load(cache_file), True)
+
+        result = getattr(self, name)(**params)
+        os.makedirs(self.cache_path, exist_ok=True)
+        with open(cache_file_path, 'w') as cache_file:
+            json.dump(result, cache_file)
+        return (result, False)
+
+    def death_heatmap(self, floor=None, level=None):
+        """Deaths counted per tile of the map, optionally only on one floor and/or level.
+        Returns {'first_row', 'floor_rows', 'rows'}: rows[0] is the top tile row (first_row is the bottom one,
+        counted up from the ground floor, a floor is floor_rows tile rows) and each row has a count per tile column"""
+        death_rows = []
+        death_cols = []
+        for shard in self.get_shards(level):
+            deaths = (self.load_column(shard, 'events') & EVENT_DEATH) != 0
+            if level is not None:
+                deaths &= self.load_column(shard, 'level') == level
+            if floor is not None:
+                deaths &= self.load_column(shard, 'floor') == floor
+            indices = numpy.flatnonzero(deaths)
+            death_rows.append(self.load_column(shard, 'tile_row')[indices])
+            death_cols.append(self.load_column(shard, 'tile_col')[indices])
+
+        if not death_rows or not sum(rows.size for rows in death_rows):
+            return {'first_row': 0, 'floor_rows': self.manifest['floor_rows'], 'rows': []}
+
+        rows = numpy.concatenate(death_rows).astype(numpy.int64)
+        cols = numpy.concatenate(death_cols).astype(numpy.int64)
+        first_row = int(rows.min())
+        row_count = int(rows.max()) - first_row + 1
+        col_count = int(cols.max()) + 1
+        counts = numpy.bincount((rows - first_row) * col_count + cols, minlength=row_count * col_count)
+        return {'first_row': first_row, 'floor_rows': self.manifest['floor_rows'], 'rows': counts.reshape(row_count, col_count)[::-1].tolist()}
+
+    def level_times(self, percentiles=(50, 90, 99)):
+        """Time to finish each level (ms) at the given percentiles.  Returns {level: {'count', 'percentiles'}}"""
+        levels = []
+        times = []
+        for shard in self.get_shards():
+            indices = numpy.flatnonzero((self.load_column(shard, 'events') & EVENT_LEVEL_DONE) != 0)
+            levels.append(self.load_column(shard, 'level')[indices])
+            times.append(self.load_column(shard, 'elapsed_ms')[indices])
+
+        result = {}
+        if not levels:
+            return result
+
+        levels = numpy.concatenate(levels)
+        times = numpy.concatenate(times)
+        # Group by level: sort once, then each level is a contiguous run
+        order = numpy.argsort(levels, kind='stable')
+        levels = levels[order]
+        times = times[order]
+        unique_levels, starts = numpy.unique(levels, return_index=True)
+        ends = list(starts[1:]) + [levels.size]
+        for level, start, end in zip(unique_levels.tolist(), starts.tolist(), ends):
+            level_times = times[start:end]
+            result[str(level)] = {'count': int(level_times.size),
+                'percentiles': numpy.percentile(level_times, list(percentiles)).tolist()}
+        return result
@@ -4,11 +4,11 @@
 # Класс AnimatedSprite содержит общую логику для игровых спрайтов, 
 # которые необходимо анимировать, таких как перемещение или прыжки.
 
-# Конструктор класса принимает три параметра: "настройки", "экран" и "изображения".
-# Параметр "настройки" - это набор настроек для спрайта, таких как его скорость и гравитация.
-# Параметр "screen" - это поверхность pygame, на которой будет нарисован спрайт, 
-# а параметр "images" - это список поверхностей pygame, 
-# содержащих отдельные кадры анимации спрайта.
+# Конструктор класса принимает объект SpriteResources (src/sprite_resources.py), общий для всех
+# спрайтов одного вида: в нем "настройки" (скорость, гравитация и т.д.), "экран" - поверхность pygame,
+# на которой будет нарисован спрайт, "изображения" - список поверхностей pygame с отдельными
+# кадрами анимации спрайта, а также хитбоксы и маски кадров. Спрайт хранит только ссылку на него,
+# свойства settings, screen, images, hitboxes и masks читают значения оттуда.
 
 # Класс имеет несколько методов, которые могут быть переопределены производными классами 
 # для обеспечения пользовательского поведения. Например, "handle_collision" - это метод, 
@@ -25,22 +25,50 @@
 
 
 import pygame
+import struct
 from pygame.sprite import Sprite
 
+# x, y, dx, dy, falling, falling_frames, dying, current_animation, frame_index, frames_delayed, facing_left
+SPRITE_STATE_FORMAT = struct.Struct('<iiddBiBBHHB')
+
 class AnimatedSprite(Sprite):
     """Animated Sprite object holding shared logic"""
 
-    def __init__(self, settings, screen, images):
-        """Init the Animated Sprite logic"""
+    # Compact layout, the derived classes add their own slots.  The screen rect is
+    # shared through the tilemap rather than copied to every sprite, and the settings, screen,
+    # images and collision data through the resources object
+    __slots__ = ('resources', 'rect', 'dx', 'dy', 'falling', 'falling_frames', 'dying',
+        'animations', 'current_animation', 'frame_index', 'frames_delayed', 'facing_left',
+        'margin_left', 'margin_right', 'margin_top', 'margin_bottom',
+        'bound_by_the_laws_of_physics', 'bound_by_map',
+        'hitbox', 'hitbox_x', 'hitbox_y', 'hitbox_image_index', 'collision_list',
+        'support_blocks', 'support_top', 'support_bottom', 'support_first_cell', 'support_last_cell')
+
+    def __init__(self, resources):
+        """Init the Animated Sprite logic, resources is the SpriteResources shared by
+        every sprite of this kind (settings, screen, images and per-frame collision data)"""
         super().__init__()
-        # cache these objects
-        self.settings = settings
-        self.screen = screen
-        self.images = images
-        self.screen_rect = screen.get_rect()
+        self.resources = resources
 
         # All images are the same size, so set the rect to the first one
-        self.rect = images[0].get_rect()
+        self.rect = resources.images[0].get_rect()
+
+        # Hitbox of the current frame in screen space, see get_hitbox()
+        self.hitbox = pygame.Rect(0, 0, 0, 0)
+        self.hitbox_x = None
+        self.hitbox_y = None
+        self.hitbox_image_index = None
+
+        # Reused by collide_group() so a collision query doesn't allocate
+        self.collision_list = []
+
+        # Support contact cache - the blocks found by the last full collision query (empty when
+        # there were none), and the rows and block cells (columns) its hitbox covered, see has_support()
+        self.support_blocks = []
+        self.support_top = 0
+        self.support_bottom = 0
+        self.support_first_cell = 0
+        self.support_last_cell = 0
 
         # Initially not moving and not falling
         self.dx = 0.0
@@ -50,8 +78,12 @@ class AnimatedSprite(Sprite):
         self.dying = False
 
         # These are designed to be overridden by the parent class
-        self.animations = {}
+        # animations is the shared (per sprite type) table indexed by settings.anim_id_*
+        self.animations = ()
         self.current_animation = None
+        # Per-sprite playback cursor into the current animation
+        self.frame_index = 0
+        self.frames_delayed = 0
         self.facing_left = False
         self.margin_left = 0
         self.margin_right = 0
@@ -62,14 +94,97 @@ class AnimatedSprite(Sprite):
         self.bound_by_the_laws_of_physics = True
         self.bound_by_map = True
 
-        # Collision check callback (optional)
-        self.collision_check = None
-
     def set_current_animation(self, animation_id):
         """Update and reset the animation sequence - does nothing if id is the same as current, use reset() for that"""
         if (self.current_animation != animation_id):
             self.current_animation = animation_id
-            self.animations[self.current_animation].reset()
+            self.reset_animation()
+
+    def reset_animation(self):
+        """Rewind the cursor to the start of the current animation"""
+        self.frame_index = 0
+        self.frames_delayed = 0
+
+    def animate(self):
+        """Update the current frame if needed, or update the delay counter,
+        should be called once per frame when animating"""
+        animation = self.animations[self.current_animation]
+        if self.frames_delayed > animation.frames_per_update:
+            self.frames_delayed = 0
+            self.frame_index += 1
+            if self.frame_index > animation.last_frame_index:
+                self.frame_index = 0
+        else:
+            self.frames_delayed += 1
+
+    def get_current_image_index(self):
+        """Returns the index into images of the frame to render"""
+        return self.animations[self.current_animation].animation[self.frame_index]
+
+    @property
+    def settings(self):
+        """The game settings"""
+        return self.resources.settings
+
+    @property
+    def screen(self):
+        """The surface the sprite is drawn on"""
+        return self.resources.screen
+
+    @property
+    def images(self):
+        """The animation frames"""
+        return self.resources.images
+
+    @property
+    def hitboxes(self):
+        """The opaque bounds of each frame"""
+        return self.resources.hitboxes
+
+    @property
+    def masks(self):
+        """The collision mask of each frame, or None"""
+        return self.resources.masks
+
+    def get_hitbox(self):
+        """Returns the tight hitbox of the current frame at the current position.  It's cached and
+        only recalculated when the sprite has moved or changed frame since the last call"""
+        rect = self.rect
+        image_index = self.get_current_image_index()
+        if rect.x != self.hitbox_x or rect.y != self.hitbox_y or image_index != self.hitbox_image_index:
+            frame_hitbox = self.hitboxes[image_index]
+            hitbox = self.hitbox
+            hitbox.x = rect.x + frame_hitbox.x
+            hitbox.y = rect.y + frame_hitbox.y
+            hitbox.width = frame_hitbox.width
+            hitbox.height = frame_hitbox.height
+            self.hitbox_x = rect.x
+            self.hitbox_y = rect.y
+            self.hitbox_image_index = image_index
+
+        return self.hitbox
+
+    def collide_group(self, group):
+        """Returns the sprites in the group whose hitbox overlaps this sprite's hitbox, the same as
+        pygame.sprite.spritecollide but using the precomputed hitboxes.  The list is reused by the
+        next call, so copy it to keep it"""
+        colliderect = self.get_hitbox().colliderect
+        collision_list = self.collision_list
+        collision_list.clear()
+        # The group's own dict, iterating the group itself copies its sprites to a new list
+        for sprite in group.spritedict:
+            if colliderect(sprite.get_hitbox()):
+                collision_list.append(sprite)
+        return collision_list
+
+    def collide_mask(self, sprite):
+        """Pixel accurate check against another animated sprite, best used once the hitboxes overlap"""
+        if self.masks is None or sprite.masks is None:
+            return True
+
+        offset = (sprite.rect.x - self.rect.x, sprite.rect.y - self.rect.y)
+        own_mask = self.masks[self.get_current_image_index()]
+        return own_mask.overlap(sprite.masks[sprite.get_current_image_index()], offset) is not None
 
     def handle_collision(self, collision_list, group):
         """Should be implemented by the derived class"""
@@ -122,6 +237,44 @@ class AnimatedSprite(Sprite):
                 self.rect.left = tile_map.player_bounds_rect.left - self.margin_left
                 self.dx = 0.0
 
+    def get_hitbox_cells(self, tile_map):
+        """Returns the first and last block cell (column) covered by the hitbox"""
+        hitbox = self.get_hitbox()
+        left = tile_map.player_bounds_rect.left
+        return ((hitbox.left - left) // tile_map.block_width, (hitbox.right - 1 - left) // tile_map.block_width)
+
+    def has_support(self, group, tile_map):
+        """True if a collision query would find the blocks found by the last one.  The blocks sit
+        on the cell grid, so that's the case while the hitbox covers the same rows and block cells
+        and none of the blocks has been removed"""
+        if not self.support_blocks:
+            return False
+
+        hitbox = self.get_hitbox()
+        if hitbox.top != self.support_top or hitbox.bottom != self.support_bottom:
+            return False
+        first_cell, last_cell = self.get_hitbox_cells(tile_map)
+        if first_cell != self.support_first_cell or last_cell != self.support_last_cell:
+            return False
+
+        for block in self.support_blocks:
+            if not group.has_internal(block):
+                return False
+
+        return True
+
+    def update_support(self, collision_list, tile_map):
+        """Remember the blocks found by a full collision query and where the hitbox was for it,
+        called before handle_collision moves the sprite"""
+        # Copied into the sprite's own list, collision_list is reused by the next query
+        self.support_blocks.clear()
+        if collision_list:
+            self.support_blocks.extend(collision_list)
+            hitbox = self.get_hitbox()
+            self.support_top = hitbox.top
+            self.support_bottom = hitbox.bottom
+            self.support_first_cell, self.support_last_cell = self.get_hitbox_cells(tile_map)
+
     def update(self, tile_map, collision_check_group=None):
         """Updates the sprite's basic position, more detailed collision is left to the derived class"""
         if self.bound_by_the_laws_of_physics:
@@ -132,18 +285,45 @@ class AnimatedSprite(Sprite):
         
          # Sprite collision
         if collision_check_group:
-            intersected_sprites = pygame.sprite.spritecollide(self, collision_check_group, False, self.collision_check)
+            # Most frames a sprite stands on the same blocks as the last frame, so its hitbox
+            # is where it was for the last query and the query would find the same blocks.
+            # Only the query is skipped, everything else runs the same with or without the cache
+            if self.bound_by_the_laws_of_physics and self.has_support(collision_check_group, tile_map):
+                intersected_sprites = self.collision_list
+                intersected_sprites.clear()
+                intersected_sprites.extend(self.support_blocks)
+            else:
+                # The hitboxes already leave out the transparent margins of each frame
+                intersected_sprites = self.collide_group(collision_check_group)
+                if self.bound_by_the_laws_of_physics:
+                    self.update_support(intersected_sprites, tile_map)
+
             # This is required by the implementing class, this function will allow the sub-types of
-            # sprite objects to handle the collisions differently - just like the self.collision_check
-            # function allows them to alter the actual collision detection (e.g. based on transparent margins)
+            # sprite objects to handle the collisions differently
             self.handle_collision(intersected_sprites, collision_check_group)
 
     def finish_update(self):
         """Common code to close out a frame update"""
         self.update_current_animation()
-        self.animations[self.current_animation].animate()
+        self.animate()
+
+    def write_state(self, writer):
+        """Save the position, motion and animation cursor to a snapshot (see Tilemap.snapshot)"""
+        rect = self.rect
+        writer.write(SPRITE_STATE_FORMAT, rect.x, rect.y, self.dx, self.dy, self.falling, self.falling_frames,
+            self.dying, self.current_animation, self.frame_index, self.frames_delayed, self.facing_left)
+
+    def read_state(self, reader):
+        """Load the state saved by write_state, the cached hitbox and support blocks are dropped"""
+        (self.rect.x, self.rect.y, self.dx, self.dy, falling, self.falling_frames, dying, self.current_animation,
+            self.frame_index, self.frames_delayed, facing_left) = reader.read(SPRITE_STATE_FORMAT)
+        self.falling = bool(falling)
+        self.dying = bool(dying)
+        self.facing_left = bool(facing_left)
+        self.hitbox_x = None
+        self.support_blocks.clear()
 
-    def draw(self):
-        """Draws the animated sprite's current frame at its current position on the screen"""
-        frame_index = self.animations[self.current_animation].get_current_frame()
-        self.screen.blit(self.images[frame_index], self.rect)
\ No newline at end of file
+    def draw(self, camera):
+        """Draws the animated sprite's current frame at its current position, nothing is drawn when it's out of view"""
+        if camera.is_visible(self.rect):
+            self.screen.blit(self.images[self.get_current_image_index()], camera.apply(self.rect))
\ No newline at end of file
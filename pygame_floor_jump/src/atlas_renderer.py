@@ -0,0 +1,209 @@
+"""This module implements the batched renderer that draws many Floor-jumper games into one surface"""
+# Этот код определяет класс AtlasRenderer, который рисует N игр (Tilemap) уменьшенными в
+# клетках одной большой поверхности (атласа) - для стены мониторинга или для пиксельных
+# наблюдений сразу всех игр.
+
+# Вместо того, чтобы каждая игра заливала и рисовала свой экран 800x600, AtlasRenderer собирает
+# то, что видно в камере каждой игры, в слои (враги, плитки, блоки, игрок, осколки, выход,
+# табло уровня и таймера) и рисует каждый слой одним вызовом blits для всех игр сразу.
+# Порядок слоев тот же, что в Tilemap.draw. Картинки берутся уменьшенными из
+# ImageResources.get_scaled_images(), общие для всех игр; то, чего там нет (например,
+# кадры запеченных осколков), уменьшается при первом использовании и запоминается.
+# blits не обрезает по клеткам атласа, поэтому спрайт на краю экрана игры рисуется
+# с частью исходной картинки (area), чтобы не залезть в соседнюю клетку.
+
+# Частицы рисуются по одному пикселю записью в массив NumPy, на котором построен атлас
+# (pygame.image.frombuffer, BGRA). Тексты бонусов времени не рисуются - их нет среди
+# готовых картинок, а шрифт в уменьшенном виде все равно не читается.
+
+# get_observations() возвращает пиксели всех игр как массив [N, высота, ширина, 3] (RGB),
+# game_pixels - то же самое без копирования, как [ряды, колонки, высота, ширина, 3].
+
+import math
+import pygame
+from src.image_resources import scale_image
+from src.particle_system import ParticleSystem
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The layers, drawn in this order, the particles go between the player and the gibs
+LAYER_ENEMIES = 0
+LAYER_TILES = 1
+LAYER_BLOCKS = 2
+LAYER_PLAYER = 3
+LAYER_GIBS = 4
+LAYER_EXIT = 5
+LAYER_HUD = 6
+LAYER_COUNT = 7
+
+class AtlasRenderer():
+    """Draws the views of many games, scaled down, into the cells of one surface"""
+
+    # False when NumPy isn't installed, the atlas is a NumPy array
+    available = numpy is not None
+
+    def __init__(self, settings, image_res, game_count, scale=0.25, columns=None):
+        """An atlas with a cell per game, columns defaults to a square-ish grid"""
+        self.settings = settings
+        self.game_count = game_count
+        self.scale = scale
+        self.columns = columns if columns else math.ceil(math.sqrt(game_count))
+        self.rows = (game_count + self.columns - 1) // self.columns
+        self.cell_width = max(1, round(settings.screen_width * scale))
+        self.cell_height = max(1, round(settings.screen_height * scale))
+        width = self.columns * self.cell_width
+        height = self.rows * self.cell_height
+
+        self.pixels = numpy.zeros((height, width, 4), dtype=numpy.uint8)
+        self.surface = pygame.image.frombuffer(self.pixels, (width, height), 'BGRA')
+        self.pixels32 = self.pixels.view(numpy.uint32)[:, :, 0]
+        # RGB of each cell without a copy, indexed [row, column]
+        self.game_pixels = self.pixels[:, :, 2::-1].reshape(self.rows, self.cell_height, self.columns,
+            self.cell_width, 3).transpose(0, 2, 1, 3, 4)
+        self.observations = numpy.zeros((game_count, self.cell_height, self.cell_width, 3), dtype=numpy.uint8)
+        self.cell_rects = [pygame.Rect((index % self.columns) * self.cell_width, (index // self.columns) * self.cell_height,
+            self.cell_width, self.cell_height) for index in range(0, game_count)]
+
+        self.scaled_images = dict(image_res.get_scaled_images(scale))
+        # Images scaled on first use, kept alive so their ids can't be reused
+        self.scaled_originals = []
+        self.mapped_colors = {}
+
+    def get_scaled_image(self, image):
+        """The scaled copy of an image, made the first time it's seen"""
+        scaled = self.scaled_images.get(id(image))
+        if scaled is None:
+            scaled = scale_image(image, self.scale)
+            self.scaled_images[id(image)] = scaled
+            self.scaled_originals.append(image)
+        return scaled
+
+    def map_color(self, color):
+        """An RGB color as an atlas pixel"""
+        mapped = self.mapped_colors.get(color)
+        if mapped is None:
+            # map_rgb is signed when the format has an alpha channel in the top byte
+            mapped = self.surface.map_rgb(color) & 0xFFFFFFFF
+            self.mapped_colors[color] = mapped
+        return mapped
+
+    def add_image(self, layer, image, x, y, cell_rect):
+        """Add an image at screen position x, y of a game to a layer, cut to the game's cell"""
+        scaled = self.get_scaled_image(image)
+        left = cell_rect.left + math.floor(x * self.scale)
+        top = cell_rect.top + math.floor(y * self.scale)
+        width, height = scaled.get_size()
+        if (left >= cell_rect.left and top >= cell_rect.top and left + width <= cell_rect.right
+                and top + height <= cell_rect.bottom):
+            layer.append((scaled, (left, top)))
+            return
+
+        visible = pygame.Rect(left, top, width, height).clip(cell_rect)
+        if visible.width and visible.height:
+            layer.append((scaled, visible.topleft, visible.move(-left, -top)))
+
+    def add_sprite(self, layer, sprite, camera, cell_rect):
+        """Add an animated sprite's current frame, if it's in view"""
+        if camera.is_visible(sprite.rect):
+            self.add_image(layer, sprite.images[sprite.get_current_image_index()], sprite.rect.left,
+                sprite.rect.top + camera.get_y_offset(), cell_rect)
+
+    def add_game(self, tile_map, cell_rect, layers, particles):
+        """Add everything of one game that is in view to the layers, and its particles to the
+        particle list as (x array, y array, color array)"""
+        camera = tile_map.camera
+        y_offset = camera.get_y_offset()
+
+        for enemy in tile_map.enemies:
+            self.add_sprite(layers[LAYER_ENEMIES], enemy, camera, cell_rect)
+
+        tile_layer = layers[LAYER_TILES]
+        tile_width = self.settings.tile_width
+        tile_height = self.settings.tile_height
+        for tile_grid, top in tile_map.get_tile_grids():
+            first_row, end_row = tile_map.get_visible_tile_rows(tile_grid, top)
+            for row in range(first_row, end_row):
+                y = top + row * tile_height + y_offset
+                x = tile_map.x_offset
+                for index in tile_grid.get_row(row):
+                    if index >= 0:
+                        self.add_image(tile_layer, tile_map.images[index], x, y, cell_rect)
+                    x += tile_width
+
+        block_layer = layers[LAYER_BLOCKS]
+        for row in tile_map.get_visible_block_rows():
+            for block in tile_map.block_rows[row]:
+                self.add_image(block_layer, block.image, block.rect.left, block.rect.top + y_offset, cell_rect)
+
+        self.add_sprite(layers[LAYER_PLAYER], tile_map.player, camera, cell_rect)
+
+        blob_exit = tile_map.blob_exit
+        particle_gen = blob_exit.particle_gen
+        particles.append(self.get_particles(particle_gen, y_offset, cell_rect))
+        for burst in blob_exit.gib_bursts:
+            # A burst added this frame may not have its first frame baked yet
+            frame = burst[0].get_frame(burst[1])
+            if frame:
+                self.add_image(layers[LAYER_GIBS], frame[0], particle_gen.x + frame[1], particle_gen.y + y_offset + frame[2],
+                    cell_rect)
+        self.add_sprite(layers[LAYER_EXIT], blob_exit, camera, cell_rect)
+
+        hud_layer = layers[LAYER_HUD]
+        level_info = tile_map.level_info
+        for sprite in (level_info.level_sprite, level_info.digit_ones, level_info.digit_tens):
+            self.add_image(hud_layer, sprite.image, sprite.rect.left, sprite.rect.top, cell_rect)
+        level_timer = tile_map.level_timer
+        self.add_image(hud_layer, level_timer.frame_image, level_timer.rect.left, level_timer.rect.top, cell_rect)
+        for sprite in level_timer.digits:
+            self.add_image(hud_layer, sprite.image, sprite.rect.left, sprite.rect.top, cell_rect)
+
+    def get_particles(self, particle_gen, y_offset, cell_rect):
+        """(x, y, color) arrays of the particles of a generator that land in the cell, a pixel each"""
+        if isinstance(particle_gen, ParticleSystem):
+            count = particle_gen.count
+            x = particle_gen.pos_x[:count]
+            y = particle_gen.pos_y[:count]
+            # The system's colors are mapped to the game's screen, map them to the atlas instead
+            game_colors = particle_gen.mapped_color[:count]
+            colors = numpy.zeros(count, dtype=numpy.uint32)
+            for color, mapped in particle_gen.mapped_colors.items():
+                colors[game_colors == mapped] = self.map_color(color)
+        else:
+            x = numpy.array([particle.x for particle in particle_gen.particles], dtype=numpy.float64)
+            y = numpy.array([particle.y for particle in particle_gen.particles], dtype=numpy.float64)
+            colors = numpy.array([self.map_color(tuple(particle.color)) for particle in particle_gen.particles],
+                dtype=numpy.uint32)
+
+        pixel_x = numpy.floor(x * self.scale).astype(numpy.int64)
+        pixel_y = numpy.floor((y + y_offset) * self.scale).astype(numpy.int64)
+        in_cell = (pixel_x >= 0) & (pixel_x < cell_rect.width) & (pixel_y >= 0) & (pixel_y < cell_rect.height)
+        return (pixel_x[in_cell] + cell_rect.left, pixel_y[in_cell] + cell_rect.top, colors[in_cell])
+
+    def render(self, tile_maps):
+        """Draw the games (up to game_count of them) into their cells, returns the atlas surface"""
+        self.surface.fill(self.settings.bg_color)
+        layers = [[] for index in range(0, LAYER_COUNT)]
+        particles = []
+        for tile_map, cell_rect in zip(tile_maps, self.cell_rects):
+            self.add_game(tile_map, cell_rect, layers, particles)
+
+        blits = self.surface.blits
+        for layer_index in range(0, LAYER_GIBS):
+            blits(layers[layer_index], False)
+        if particles:
+            x, y, colors = [numpy.concatenate(arrays) for arrays in zip(*particles)]
+            self.pixels32[y, x] = colors
+        for layer_index in range(LAYER_GIBS, LAYER_COUNT):
+            blits(layers[layer_index], False)
+        return self.surface
+
+    def get_observations(self):
+        """The pixels of each game's cell as one [game_count, height, width, 3] RGB array, reused by each call"""
+        for row in range(0, self.rows):
+            first = row * self.columns
+            end = min(self.game_count, first + self.columns)
+            self.observations[first:end] = self.game_pixels[row, :end - first]
+        return self.observations
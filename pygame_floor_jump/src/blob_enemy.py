@@ -31,46 +31,63 @@
 
 import pygame
 from pygame.sprite import Sprite
-from src.animation import Animation
+from src.animation import create_animation_table
 from src.animated_sprite import AnimatedSprite
 
 class Blob(AnimatedSprite):
     """Blob enemy object"""
 
-    def __init__(self, settings, screen, images):
-        """Initialize the blob"""
-        super().__init__(settings, screen, images)
-        
-        # Override the start position
+    __slots__ = ()
+
+    # Animation table shared by all blobs, built by the first one created
+    shared_animations = None
+
+    def __init__(self, resources):
+        """Initialize the blob from the SpriteResources shared by all blobs"""
+        super().__init__(resources)
+        settings = resources.settings
+
+        # Set the blob-specific animations, the definitions are shared by every blob
+        # so spawning a new one only costs the per-sprite cursor
+        if Blob.shared_animations is None:
+            Blob.shared_animations = create_animation_table(settings.anim_id_count, {
+                settings.anim_id_walk_left: ([0, 1, 2, 1], 2),
+                settings.anim_id_walk_right: ([3, 4, 5, 4], 2),
+                settings.anim_id_jump_down_left: ([6], 1),
+                settings.anim_id_jump_down_right: ([6], 1),
+                settings.anim_id_dead: ([7], 60)})
+        self.animations = Blob.shared_animations
+        self.reset()
+
+    def reset(self):
+        """Put the blob back in its freshly spawned state, used when it's recycled by the pool"""
         self.dx = self.settings.enemy_blob_dx
-        
-        # Set the blob-specific animations
-        self.animations[self.settings.anim_name_walk_left] = Animation([0, 1, 2, 1], 2)
-        self.animations[self.settings.anim_name_walk_right] = Animation([3, 4, 5, 4], 2)
-        self.animations[self.settings.anim_name_jump_down_left] = Animation([6], 1)
-        self.animations[self.settings.anim_name_jump_down_right] = Animation([6], 1)
-        self.animations[self.settings.anim_name_dead] = Animation([7], 60)
-        self.current_animation = self.settings.anim_name_walk_right
+        self.dy = 0.0
+        self.falling = False
+        self.falling_frames = 0
+        self.dying = False
+        self.current_animation = self.settings.anim_id_walk_right
+        self.reset_animation()
         self.facing_left = False
 
     def update_current_animation(self):
         """Set the correct animation based on state"""
         # DYING
         if self.dying:
-            self.set_current_animation(self.settings.anim_name_dead)
+            self.set_current_animation(self.settings.anim_id_dead)
         # WALKING
         elif self.dy == 0:
             if self.dx < 0:
-                self.set_current_animation(self.settings.anim_name_walk_left)
+                self.set_current_animation(self.settings.anim_id_walk_left)
             else:
-                self.set_current_animation(self.settings.anim_name_walk_right)
+                self.set_current_animation(self.settings.anim_id_walk_right)
         # JUMPING
         else:
             if self.dy > 0:
                 if self.facing_left:
-                    self.set_current_animation(self.settings.anim_name_jump_down_left)
+                    self.set_current_animation(self.settings.anim_id_jump_down_left)
                 else:
-                    self.set_current_animation(self.settings.anim_name_jump_down_right)
+                    self.set_current_animation(self.settings.anim_id_jump_down_right)
 
     def update(self, tile_map):
         """Updates the blob sprite's position"""
@@ -98,8 +115,9 @@ class Blob(AnimatedSprite):
             self.rect.centery += self.dy
             self.falling_frames += 1
 
-            if self.rect.top > self.screen_rect.bottom:
-                self.kill()
+            if self.rect.top > tile_map.map_rect.bottom:
+                # Hand it back to the pool for the next spawn
+                tile_map.blob_pool.release(self)
 
         self.finish_update()
 
@@ -24,41 +24,73 @@
 
 
 from src.particle_generator import ParticleGenerator
-from src.animation import Animation
+from src.particle_system import ParticleSystem
+from src.gib_animation import GibAnimation
+from src.animation import create_animation_table
 from src.animated_sprite import AnimatedSprite
 import random
+import struct
+
+# burst count
+BURSTS_STATE_FORMAT = struct.Struct('<H')
+# animation index, frame index, index of the blob in the enemies (-1 for none)
+BURST_STATE_FORMAT = struct.Struct('<HHh')
 
 class BlobExit(AnimatedSprite):
     """This class encapsulates the animated blade and the gibbing 
     generator when an enemy sprite is dropped into the drain"""
 
-    def __init__(self, settings, screen, images, tile_map):
+    __slots__ = ('tile_map', 'particle_gen', 'particles_frames_max', 'gib_animations', 'gib_bursts')
+
+    # Animation table shared by all exits, built by the first one created
+    shared_animations = None
+
+    def __init__(self, resources, tile_map):
         """Initialize the animated blade and the particle generator for the map"""
         # AnimatedSprite init
-        super().__init__(settings, screen, images)
+        super().__init__(resources)
+        settings = resources.settings
+        screen = resources.screen
 
         # store the map
         self.tile_map = tile_map
 
         # Set the location - at the bottom, in the tile with the 'drain'
         self.rect.move_ip(0, 0)
-        self.rect.move_ip(self.screen_rect.width /2 - settings.tile_width, self.tile_map.player_bounds_rect.bottom + self.settings.tile_height)
+        screen_rect = self.tile_map.screen_rect
+        self.rect.move_ip(screen_rect.width /2 - settings.tile_width, self.tile_map.player_bounds_rect.bottom + self.settings.tile_height)
         
         # only 1 animation, could add a "bloody" one
-        self.animations[self.settings.anim_name_exit] = Animation([0, 1], 1)
-        self.current_animation = self.settings.anim_name_exit
+        if BlobExit.shared_animations is None:
+            BlobExit.shared_animations = create_animation_table(settings.anim_id_count, {
+                settings.anim_id_exit: ([0, 1], 1)})
+        self.animations = BlobExit.shared_animations
+        self.current_animation = self.settings.anim_id_exit
 
         # Blob gibs
         # Leaving the callback out of this call 'self.generate_particles' will take the default behavior
         # which is randomized differently.  Add a comment to see e.g.
         # ..., settings, settings.particle_gen_color, 0, 0)#, self.generate_particles)
-        self.particle_gen = ParticleGenerator(screen, settings, settings.particle_gen_color, 0, 0, self.generate_particles)
-        self.particle_gen.x = self.screen_rect.centerx - self.settings.tile_width / 2
-        self.particle_gen.y = self.screen_rect.bottom - self.settings.tile_width / 2
+        # The array backed system is used when NumPy is available, it has the same interface
+        if settings.particle_use_numpy and ParticleSystem.available:
+            self.particle_gen = ParticleSystem(screen, settings, settings.particle_gen_color, 0, 0, self.generate_particles)
+        else:
+            self.particle_gen = ParticleGenerator(screen, settings, settings.particle_gen_color, 0, 0, self.generate_particles)
+        self.particle_gen.x = screen_rect.centerx - self.settings.tile_width / 2
+        self.particle_gen.y = screen_rect.bottom - self.settings.tile_width / 2
 
         # This is the count of frames the generator will be active upon collision with a blob
         self.particles_frames_max = self.settings.particle_gen_max_frames
 
+        # In baked mode each burst plays back a pre-simulated animation instead of live particles,
+        # a burst is [animation, frame index, blob that caused it].  The animations are this game's
+        # own, they're baked from its settings (and only as they're played)
+        self.gib_animations = []
+        self.gib_bursts = []
+        if self.settings.particle_gen_baked:
+            self.gib_animations = [GibAnimation(settings, self.particle_gen.x, self.particle_gen.y, screen_rect.bottom, seed)
+                for seed in range(0, settings.particle_gen_baked_variants)]
+
         # Override default update handling in the base
         self.bound_by_the_laws_of_physics = False
         self.bound_by_map = False
@@ -81,24 +113,75 @@ class BlobExit(AnimatedSprite):
 
         return new_particle_data
 
-    def start_gibbing(self):
+    def start_gibbing(self, blob=None):
         """Activates the timed particle generator (in response to a blob collision)"""
-        self.particle_gen.start(self.particles_frames_max)
+        if not self.gib_animations:
+            self.particle_gen.start(self.particles_frames_max)
+            return
+
+        # A blob touches the blade for several frames, but only gets one burst
+        if blob:
+            for burst in self.gib_bursts:
+                if burst[2] is blob:
+                    return
+
+        # Bound the cost, the oldest burst makes way for the new one
+        if len(self.gib_bursts) >= self.settings.particle_gen_baked_max_bursts:
+            self.gib_bursts.pop(0)
+        self.gib_bursts.append([random.choice(self.gib_animations), 0, blob])
+
+    def forget_blob(self, blob):
+        """Drop the blob from the bursts it caused, called when the pool takes it back so that
+        it gets its own burst when it's spawned again"""
+        for burst in self.gib_bursts:
+            if burst[2] is blob:
+                burst[2] = None
 
     def stop_gibbing(self):
         """Stops generation, existing particles will live out whatever short life they have left"""
         self.particle_gen.stop()
 
-    def draw(self):
+    def write_state(self, writer, enemy_list):
+        """Save the blade, the particles and the baked bursts.  A burst's blob is saved as its index in
+        enemy_list, the blobs of the bursts are always live (forget_blob drops them when they're released)"""
+        super().write_state(writer)
+        self.particle_gen.write_state(writer)
+        writer.write(BURSTS_STATE_FORMAT, len(self.gib_bursts))
+        for animation, frame_index, blob in self.gib_bursts:
+            blob_index = enemy_list.index(blob) if blob is not None else -1
+            writer.write(BURST_STATE_FORMAT, self.gib_animations.index(animation), frame_index, blob_index)
+
+    def read_state(self, reader, enemy_list):
+        """Load the state saved by write_state, enemy_list must be the restored enemies in the same order"""
+        super().read_state(reader)
+        self.particle_gen.read_state(reader)
+        burst_count, = reader.read(BURSTS_STATE_FORMAT)
+        self.gib_bursts = []
+        for index in range(0, burst_count):
+            animation_index, frame_index, blob_index = reader.read(BURST_STATE_FORMAT)
+            blob = enemy_list[blob_index] if blob_index >= 0 else None
+            self.gib_bursts.append([self.gib_animations[animation_index], frame_index, blob])
+
+    def draw(self, camera):
         """Draw the generator (if needed) and the sprite (always)"""
         # Do this first so the sprite is drawn over the generator
-        self.particle_gen.draw()
-        super().draw()
+        self.particle_gen.draw(camera)
+        # One blit per baked burst
+        for burst in self.gib_bursts:
+            burst[0].draw(self.screen, burst[1], self.particle_gen.x, self.particle_gen.y + camera.get_y_offset())
+        super().draw(camera)
 
     def update(self, enemies):
         """Update - mostly look for new enemies to gib"""
         # Let the particle generator update itself
         self.particle_gen.update()
+
+        # Advance the baked bursts, dropping the ones that have finished
+        if self.gib_bursts:
+            for burst in self.gib_bursts:
+                burst[1] += 1
+            self.gib_bursts = [burst for burst in self.gib_bursts if burst[0].has_frame(burst[1])]
+
         super().update(self.tile_map, self.tile_map.enemies)
         # common animated sprite code
         self.finish_update()
@@ -109,9 +192,9 @@ class BlobExit(AnimatedSprite):
     
     def handle_collision(self, collision_list, group):
         """In this case, we are checking against enemies colliding with the blade"""
-        # Check for fresh meat to grind
+        # Check for fresh meat to grind, the hitboxes overlap so just check the pixels
         for blob in collision_list:
-            if blob.rect.colliderect(self.rect):
-                self.start_gibbing()
+            if self.collide_mask(blob):
+                self.start_gibbing(blob)
                 # Don't need to remove it from the group here, we could, but a future
                 # update to the blob will catch it
@@ -0,0 +1,84 @@
+"""This module implements a pool of recycled blob enemies for Floor-jumper"""
+# Этот код определяет класс BlobPool, который хранит заранее созданные
+# объекты Blob и переиспользует их вместо создания нового врага при каждом появлении.
+
+# Метод acquire() возвращает свободный блоб (или None, если достигнут предел
+# одновременно живых врагов), метод release() возвращает блоб в пул,
+# а release_all() возвращает все блобы группы, например при сбросе уровня.
+# Если задан on_release, он вызывается с каждым возвращенным блобом: тот, кто держит ссылку
+# на блоб (например, выброс осколков у лезвия), должен забыть ее до того, как блоб появится снова.
+
+# Пул также считает попадания (блоб взят из пула), промахи (пришлось создать новый)
+# и отказы (превышен предел), чтобы можно было оценить эффективность пула.
+
+from src.blob_enemy import Blob
+from src.sprite_resources import SpriteResources
+
+class BlobPool():
+    """Preallocated blob enemies which are recycled when they die instead of being thrown away"""
+
+    def __init__(self, settings, screen, images):
+        """Create the initial blobs and reset the statistics"""
+        self.settings = settings
+        # Shared by every blob, with the per-frame collision data precomputed with the images
+        self.resources = SpriteResources(settings, screen, images,
+            settings.image_res.enemy_blob_hitboxes, settings.image_res.enemy_blob_masks)
+        self.max_live = settings.enemy_max_live
+        self.live_count = 0
+        # Called with each blob released, before it can be spawned again
+        self.on_release = None
+
+        # Blobs waiting to be spawned
+        self.free_blobs = [Blob(self.resources) for index in range(0, settings.enemy_pool_size)]
+
+        # Statistics - a hit is a spawn served from the free list, a miss had to allocate,
+        # a rejection was skipped because the live population was at the cap
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def acquire(self):
+        """Returns a reset blob ready to be positioned, or None if the live population is at the cap"""
+        if self.live_count >= self.max_live:
+            self.rejected += 1
+            return None
+
+        if self.free_blobs:
+            blob = self.free_blobs.pop()
+            self.hits += 1
+        else:
+            blob = Blob(self.resources)
+            self.misses += 1
+
+        blob.reset()
+        self.live_count += 1
+        return blob
+
+    def release(self, blob):
+        """Remove the blob from all groups and make it available for the next spawn"""
+        # A blob not in any group was already released (or never added)
+        if not blob.alive():
+            return
+
+        blob.kill()
+        if self.on_release:
+            self.on_release(blob)
+        self.free_blobs.append(blob)
+        self.live_count -= 1
+
+    def release_all(self, group):
+        """Release every blob in the group, e.g. when the level is reset"""
+        for blob in group.sprites():
+            self.release(blob)
+
+    def get_hit_rate(self):
+        """Fraction of spawns served without allocating"""
+        spawns = self.hits + self.misses
+        if spawns == 0:
+            return 1.0
+        return self.hits / spawns
+
+    def get_stats_text(self):
+        """Human readable summary of the pool usage"""
+        return "blob pool: {} live / {} cap, {} free, hits {}, misses {}, rejected {}, hit rate {:.1%}".format(
+            self.live_count, self.max_live, len(self.free_blobs), self.hits, self.misses, self.rejected, self.get_hit_rate())
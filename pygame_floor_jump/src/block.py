@@ -4,11 +4,10 @@
 
 # Класс Block имеет метод __init__, 
 # который инициализирует свойства класса, 
-# включая настройки, экран, изображение, rect, screen_rect и dying. 
-# настройки и экран представляют собой настройки игры и поверхность дисплея соответственно. 
-# image - это изображение блока, а rect - прямоугольная область блока. 
-# screen_rect - это прямоугольная область поверхности дисплея, 
+# включая изображение, rect и dying. 
+# image - это изображение блока, а rect - прямоугольная область блока, 
 # а dying - логическое значение, указывающее, умирает блок или нет.
+# Класс использует __slots__, так как блоков на карте сотни.
 
 # Метод draw является обязательным методом для pygame.sprite.Класс Group, 
 # который отвечает за рисование спрайта на экране. 
@@ -22,18 +21,23 @@ from pygame.sprite import Sprite
 class Block(Sprite):
     """Block object"""
 
-    def __init__(self, settings, screen, image):
+    # There can be hundreds of blocks, so keep the layout compact - the settings
+    # and screen are owned by the tilemap and don't need a copy per block
+    __slots__ = ('image', 'rect', 'dying')
+
+    def __init__(self, image):
         """Initialize the block, not much to do other than save the params"""
         super().__init__()
-        self.settings = settings
-        self.screen = screen
         self.image = image
         self.rect = self.image.get_rect()
-        self.screen_rect = screen.get_rect()
         self.dying = False
 
-    # 'draw' is required by pygame.Sprite.Group for drawing in batches
-    def draw(self):
+    def get_hitbox(self):
+        """Blocks are solid and never move, so the hitbox is just the rect"""
+        return self.rect
+
+    # 'image' and 'rect' are all pygame.Sprite.Group needs for drawing in batches
+    def draw(self, screen):
         """Draws the block at its current position on the screen"""
-        self.screen.blit(self.image, self.rect)
+        screen.blit(self.image, self.rect)
         
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""This module implements the scrolling camera for Floor-jumper"""
+# Этот код определяет класс Camera - вертикально прокручиваемую область просмотра карты.
+
+# Все игровые объекты (плитки, блоки, игрок, враги, частицы, бонусы) хранят свои
+# координаты в системе координат мира (карты). Камера - это прямоугольник размером с экран
+# в этой же системе координат. Метод apply() переводит прямоугольник из мировых координат
+# в экранные, а is_visible() позволяет не рисовать объекты вне экрана.
+
+# Камера следует за игроком по вертикали (follow), но только когда он выходит из
+# "мертвой зоны" в центре экрана, чтобы экран не дергался при каждом прыжке.
+# Камера никогда не показывает ничего за пределами карты (clamp).
+
+# Интерфейс (уровень, таймер, подсказки) рисуется в экранных координатах, без камеры.
+
+class Camera():
+    """Screen sized view of the map in world coordinates, scrolls vertically"""
+
+    def __init__(self, settings, screen_rect):
+        """Start with the view over the screen, until the map bounds are known"""
+        self.settings = settings
+        self.rect = screen_rect.copy()
+        self.bounds = screen_rect.copy()
+
+    def set_bounds(self, map_rect):
+        """The view never scrolls past the top or bottom of map_rect"""
+        self.bounds = map_rect.copy()
+        self.clamp()
+
+    def clamp(self):
+        """Keep the view inside the bounds, a map shorter than the screen sits at the bottom"""
+        if self.rect.height >= self.bounds.height:
+            self.rect.bottom = self.bounds.bottom
+        elif self.rect.top < self.bounds.top:
+            self.rect.top = self.bounds.top
+        elif self.rect.bottom > self.bounds.bottom:
+            self.rect.bottom = self.bounds.bottom
+
+    def center_on(self, target_rect):
+        """Jump straight to the target, e.g. on a reset"""
+        self.rect.centery = target_rect.centery
+        self.clamp()
+
+    def follow(self, target_rect):
+        """Scroll just enough to keep the target within the dead zone around the center of the view"""
+        offset = target_rect.centery - self.rect.centery
+        dead_zone = self.settings.camera_dead_zone
+        if offset > dead_zone:
+            self.rect.centery += offset - dead_zone
+        elif offset < -dead_zone:
+            self.rect.centery += offset + dead_zone
+        self.clamp()
+
+    def get_y_offset(self):
+        """Add this to a world y coordinate to get the screen y coordinate"""
+        return -self.rect.top
+
+    def apply(self, rect):
+        """Returns the rect moved from world to screen coordinates"""
+        return rect.move(0, -self.rect.top)
+
+    def is_visible(self, rect):
+        """True if any part of the (world coordinate) rect is in view"""
+        return self.rect.colliderect(rect)
@@ -0,0 +1,183 @@
+"""This module implements chunked streaming of an endless tower for Floor-jumper"""
+# Этот код определяет классы Chunk и ChunkStreamer для бесконечного режима (endless_mode),
+# в котором башня не строится целиком заранее, а подгружается кусками (chunks).
+
+# Chunk - это chunk_floors этажей подряд: своя сетка плиток (TileGrid) и ряды блоков.
+# Чанк 0 содержит нижний этаж (с полом и сливом), остальные - только верхние этажи.
+# Раскладка блоков каждого чанка получается из seed башни и номера чанка,
+# поэтому один и тот же seed всегда дает одну и ту же башню.
+
+# ChunkStreamer каждый кадр (update) смотрит, в каком чанке находится игрок:
+#     - если над ним загружено меньше chunks_ahead чанков, загружает следующий,
+#     - если под ним больше chunks_behind чанков, выгружает самый нижний вместе с его
+#       блоками, плитками и врагами (враги возвращаются в BlobPool).
+# За один кадр загружается или выгружается не больше одного чанка.
+
+# Границы игрока (player_bounds_rect), карты (map_rect) и камеры всегда охватывают
+# только загруженные чанки: при выгрузке нижняя граница поднимается.
+# get_spawn_floor_range() выбирает этажи для новых врагов только в чанках, которые
+# не будут скоро выгружены, поэтому память и время кадра не растут с высотой.
+
+import random
+import struct
+from src.level_pack import generate_layout
+from src.tile_grid import TileGrid, FLOOR_ROWS
+
+# seed, index of the lowest loaded chunk, loaded chunk count, chunks loaded, chunks evicted
+STREAMER_STATE_FORMAT = struct.Struct('<IIHII')
+
+class Chunk():
+    """A run of floors of the tower, with its tiles and block rows"""
+
+    def __init__(self, index, tile_grid, top, block_rows):
+        """Save the pieces, the block rows are ordered top to bottom"""
+        self.index = index
+        self.tile_grid = tile_grid
+        self.top = top
+        self.block_rows = block_rows
+
+class ChunkStreamer():
+    """Loads the chunks of an endless tower ahead of the player and evicts the ones far below"""
+
+    def __init__(self, tile_map, number_of_subfloor_rows):
+        """The ground floor stays where generate_basic_map put it, the tower goes up from there"""
+        self.tile_map = tile_map
+        self.settings = tile_map.settings
+        self.number_of_subfloor_rows = number_of_subfloor_rows
+        self.floors_per_chunk = self.settings.chunk_floors
+        self.floor_height = self.settings.tile_height * FLOOR_ROWS
+        # The player stands here on the ground floor
+        self.base_bottom = tile_map.player_bounds_rect.bottom
+        # Loaded chunks, lowest first
+        self.chunks = []
+        self.seed = 0
+        self.chunks_loaded = 0
+        self.chunks_evicted = 0
+
+    def reset(self):
+        """Drop every chunk and start a new tower with a new seed"""
+        while self.chunks:
+            self.evict_chunk()
+        # Nothing but the tower's own blocks
+        self.tile_map.block_group.empty()
+        self.tile_map.block_rows = []
+        self.seed = random.getrandbits(32)
+        for index in range(0, 1 + self.settings.chunks_ahead):
+            self.load_chunk(index)
+
+    def get_chunk_top(self, index):
+        """World y of the top of a chunk"""
+        return self.base_bottom + self.settings.tile_height - (index + 1) * self.floors_per_chunk * self.floor_height
+
+    def get_chunk_floor_bottom(self, index):
+        """World y the player stands at on the lowest floor of a chunk"""
+        return self.base_bottom - index * self.floors_per_chunk * self.floor_height
+
+    def load_chunk(self, index):
+        """Build the tiles and blocks of the chunk and add it on top of the tower"""
+        settings = self.settings
+        ground = index == 0
+        tile_grid = TileGrid(settings.map_width, settings.map_playable_width, self.floors_per_chunk,
+            self.number_of_subfloor_rows if ground else 0, settings.map_drain_col, ground)
+        top = self.get_chunk_top(index)
+
+        # Every chunk's layout comes from the tower seed, the ground floor has no blocks
+        rng = random.Random(self.seed * 1000003 + index)
+        row_count = self.floors_per_chunk - 1 if ground else self.floors_per_chunk
+        layout = generate_layout(settings.map_playable_width, row_count, rng)
+        block_rows = [self.tile_map.build_platform_row(layout, row, top) for row in range(0, row_count)]
+
+        for row_group in block_rows:
+            self.tile_map.block_group.add(row_group.sprites())
+        self.tile_map.block_rows = block_rows + self.tile_map.block_rows
+        self.chunks.append(Chunk(index, tile_grid, top, block_rows))
+        self.chunks_loaded += 1
+        self.update_bounds()
+
+    def evict_chunk(self):
+        """Remove the lowest chunk, with its blocks and any blobs in or below it"""
+        chunk = self.chunks.pop(0)
+        for row_group in chunk.block_rows:
+            for block in row_group.sprites():
+                block.kill()
+        self.tile_map.block_rows = self.tile_map.block_rows[:len(self.tile_map.block_rows) - len(chunk.block_rows)]
+
+        for enemy in self.tile_map.enemies.sprites():
+            if enemy.rect.bottom > chunk.top:
+                self.tile_map.blob_pool.release(enemy)
+
+        self.chunks_evicted += 1
+        if self.chunks:
+            self.update_bounds()
+
+    def update_bounds(self):
+        """Fit the player bounds, map rect and camera to the loaded chunks"""
+        tile_map = self.tile_map
+        top = self.chunks[-1].top
+        lowest = self.chunks[0]
+        bottom = lowest.top + lowest.tile_grid.height * self.settings.tile_height
+
+        tile_map.player_bounds_rect.height = self.get_chunk_floor_bottom(lowest.index) - top
+        tile_map.player_bounds_rect.top = top
+        tile_map.map_rect.height = bottom - top
+        tile_map.map_rect.top = top
+        tile_map.camera.set_bounds(tile_map.map_rect)
+
+    def get_tile_grids(self):
+        """(grid, world y of its top) for each loaded chunk"""
+        return [(chunk.tile_grid, chunk.top) for chunk in self.chunks]
+
+    def get_player_chunk(self):
+        """Index of the chunk the player is in"""
+        floor = (self.base_bottom - self.tile_map.player.rect.bottom) // self.floor_height
+        return max(0, floor) // self.floors_per_chunk
+
+    def get_spawn_floor_range(self):
+        """First and last floor (counted down from the top of the player bounds) where blobs can spawn.
+        Only the player's chunk and the ones above, so a blob is never spawned into a chunk about to go"""
+        current = min(self.get_player_chunk(), self.chunks[-1].index)
+        current = max(current, self.chunks[0].index)
+        floors_above = (self.get_chunk_floor_bottom(current) - self.tile_map.player_bounds_rect.top) // self.floor_height
+        # Floors are counted from 0 at the top, the ground floor has no pipes to spawn from
+        last = floors_above if current > 0 else floors_above - 1
+        return (0, last)
+
+    def update(self):
+        """Load the next chunk ahead of the player or evict one far below, at most one a frame"""
+        current = self.get_player_chunk()
+        if self.chunks[-1].index < current + self.settings.chunks_ahead:
+            self.load_chunk(self.chunks[-1].index + 1)
+        elif self.chunks[0].index < current - self.settings.chunks_behind:
+            self.evict_chunk()
+
+    def set_block_rows(self, block_rows):
+        """Hand each chunk its part of the tower's block rows (ordered top to bottom), e.g. after a restore"""
+        end = len(block_rows)
+        for chunk in self.chunks:
+            start = end - len(chunk.block_rows)
+            chunk.block_rows = block_rows[start:end]
+            end = start
+
+    def get_block_rows_in_load_order(self):
+        """The block rows in the order their blocks were added to the map's block group"""
+        return [row_group for chunk in self.chunks for row_group in chunk.block_rows]
+
+    def write_state(self, writer):
+        """Save the tower seed and which chunks are loaded, the chunks themselves are rebuilt from the seed"""
+        writer.write(STREAMER_STATE_FORMAT, self.seed, self.chunks[0].index, len(self.chunks),
+            self.chunks_loaded, self.chunks_evicted)
+
+    def read_state(self, reader):
+        """Load the state saved by write_state, only reloading the chunks if they differ from the loaded ones"""
+        seed, first_index, chunk_count, chunks_loaded, chunks_evicted = reader.read(STREAMER_STATE_FORMAT)
+        indices = [chunk.index for chunk in self.chunks]
+        if seed != self.seed or indices != list(range(first_index, first_index + chunk_count)):
+            while self.chunks:
+                self.evict_chunk()
+            self.tile_map.block_group.empty()
+            self.tile_map.block_rows = []
+            self.seed = seed
+            for index in range(first_index, first_index + chunk_count):
+                self.load_chunk(index)
+        self.chunks_loaded = chunks_loaded
+        self.chunks_evicted = chunks_evicted
@@ -24,19 +24,24 @@
 
 
 from src.flyin_sprite import FlyInSprite
+import struct
+
+# image_index
+DIGIT_STATE_FORMAT = struct.Struct('<B')
 
 class DigitSprite(FlyInSprite):
     """Digit sprite object which can also flyin to position"""
 
-    def __init__(self, settings, screen, images, digit=0):
+    __slots__ = ('images', 'image_index')
+
+    def __init__(self, resources, images, digit=0):
         """Init the sprite"""
-        super().__init__(settings, screen, images[0])
+        super().__init__(resources, images[0])
 
         # cache these objects
         self.images = images
         self.image_index = 0
         self.set_digit(digit)
-        self.screen_rect = screen.get_rect()
         self.rect = self.images[self.image_index].get_rect()
 
 
@@ -65,6 +70,17 @@ class DigitSprite(FlyInSprite):
         self.set_image()
         return carry
 
+    def write_state(self, writer):
+        """Save the position and the digit shown"""
+        super().write_state(writer)
+        writer.write(DIGIT_STATE_FORMAT, self.image_index)
+
+    def read_state(self, reader):
+        """Load the state saved by write_state"""
+        super().read_state(reader)
+        self.image_index, = reader.read(DIGIT_STATE_FORMAT)
+        self.set_image()
+
     def draw(self):
         """Draw the current digit"""
         self.screen.blit(self.image, self.rect)
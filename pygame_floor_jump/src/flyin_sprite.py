@@ -6,9 +6,9 @@
 
 # Вот краткое описание того, что делает каждый метод в этом классе:
 
-# __init__(self, настройки, экран, изображение): 
-#     инициализирует базовый класс Sprite и кэширует некоторые важные объекты, 
-#     такие как настройки игры, экран, изображение, 
+# __init__(self, ресурсы, изображение): 
+#     инициализирует базовый класс Sprite и сохраняет ссылку на общий SpriteResources
+#     (настройки игры и экран), изображение,
 #     а также некоторые значения начальной позиции и скорости.
 # set_start_position(self, top, left, dx, dy, frames): 
 #     Задает начальную позицию и состояние спрайта.
@@ -25,29 +25,43 @@
 
 
 from pygame.sprite import Sprite
+import struct
+
+# left, top, frame_current
+FLYIN_STATE_FORMAT = struct.Struct('<iiH')
 
 
 class FlyInSprite(Sprite):
     """A static image sprite that moves to a final position over a number of frames"""
-    def __init__(self, settings, screen, image):
-        """Init the sprite base class"""
+
+    __slots__ = ('resources', 'image', 'rect', 'dx', 'dy', 'start_top', 'start_left',
+        'frames_max', 'frame_current')
+
+    def __init__(self, resources, image):
+        """Init the sprite base class, resources is the SpriteResources holding the settings and screen"""
         super().__init__()
 
         # cache these objects
-        self.settings = settings
-        self.screen = screen
-        self.screen_rect = self.screen.get_rect()
+        self.resources = resources
         self.image = image
         self.rect = self.image.get_rect()
         self.dx = 0.0
         self.dy = 0.0
-        self.target_top = 0
-        self.target_left = 0
         self.start_top = 0
         self.start_left = 0
         self.frames_max = 0
         self.frame_current = 0
 
+    @property
+    def settings(self):
+        """The game settings"""
+        return self.resources.settings
+
+    @property
+    def screen(self):
+        """The surface the sprite is drawn on"""
+        return self.resources.screen
+
     def set_start_position(self, top, left, dx, dy, frames):
         """Sets the initial position and state of the sprite.  It can be off-screen"""
         self.start_left = left
@@ -72,6 +86,14 @@ class FlyInSprite(Sprite):
             self.rect.top += self.dy
             self.frame_current += 1
 
+    def write_state(self, writer):
+        """Save how far along its path the sprite is"""
+        writer.write(FLYIN_STATE_FORMAT, self.rect.left, self.rect.top, self.frame_current)
+
+    def read_state(self, reader):
+        """Load the state saved by write_state"""
+        self.rect.left, self.rect.top, self.frame_current = reader.read(FLYIN_STATE_FORMAT)
+
     def draw(self):
         """Draws the image at the sprite's current location"""
         self.screen.blit(self.image, self.rect)
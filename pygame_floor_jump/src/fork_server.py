@@ -0,0 +1,65 @@
+"""This module implements the fork server that starts Floor-jumper environment workers from a ready game"""
+# Этот код определяет класс ForkServer. Обычно каждый рабочий процесс сам инициализирует
+# pygame, создает Settings, загружает ImageResources (с хитбоксами и масками) и строит Tilemap -
+# это долго и каждый процесс держит свою копию всего этого. ForkServer делает все это один раз
+# в родительском процессе (создает готовую среду GameEnv), а рабочие процессы запускаются
+# через fork и получают готовую среду сразу, страницы памяти общие (копирование при записи).
+
+# Перед fork вызывается gc.freeze(): все уже созданные объекты переносятся в постоянное
+# поколение, и сборщик мусора в рабочих процессах их не обходит и не пишет в их заголовки,
+# поэтому страницы с ними остаются общими. Счетчики ссылок при этом все равно меняются у
+# объектов, которые процесс трогает (например, экран, на котором рисует игра) - эти страницы
+# копируются, остальные (картинки, маски, таблицы) остаются общими.
+
+# Используется так: SharedMemoryVectorEnv(n, fork_server=ForkServer(observation='symbolic')).
+# Параметры среды задаются при создании ForkServer, все рабочие процессы получают ее копию.
+# read_memory_usage(pid) возвращает память процесса из /proc (только Linux): RSS, PSS
+# (общие страницы делятся между процессами, которые их используют) и собственную память.
+
+import gc
+import multiprocessing
+import os
+import time
+from src.game_env import GameEnv
+
+def read_memory_usage(pid):
+    """(rss, pss, private) of a process in KB, None where /proc/<pid>/smaps_rollup isn't available"""
+    try:
+        with open('/proc/{}/smaps_rollup'.format(pid)) as file:
+            lines = file.readlines()
+    except OSError:
+        return None
+
+    values = {}
+    for line in lines:
+        fields = line.split()
+        if len(fields) == 3 and fields[2] == 'kB':
+            values[fields[0].rstrip(':')] = int(fields[1])
+    return (values.get('Rss', 0), values.get('Pss', 0), values.get('Private_Clean', 0) + values.get('Private_Dirty', 0))
+
+class ForkServer():
+    """A fully initialized GameEnv that worker processes are forked from"""
+
+    # False where processes can't be forked (Windows)
+    available = 'fork' in multiprocessing.get_all_start_methods()
+
+    def __init__(self, **env_options):
+        """Create the environment every worker starts with, env_options are the GameEnv arguments"""
+        self.context = multiprocessing.get_context('fork')
+        self.pid = os.getpid()
+        start_time = time.perf_counter()
+        self.env = GameEnv(**env_options)
+        self.init_seconds = time.perf_counter() - start_time
+        # Nothing created so far is touched by the collector in the workers
+        gc.collect()
+        gc.freeze()
+
+    def create_env(self):
+        """The environment of a forked worker, its own copy-on-write copy of the server's"""
+        if os.getpid() == self.pid:
+            raise RuntimeError("The fork server's environment is only for its forked workers")
+        return self.env
+
+    def get_memory_usage(self):
+        """(rss, pss, private) of the server process in KB, or None"""
+        return read_memory_usage(self.pid)
@@ -0,0 +1,230 @@
+"""This module implements a Gym-style environment around Floor-jumper, for agents to play the game"""
+# Этот код определяет класс GameEnv - программный интерфейс к игре в стиле Gym/Gymnasium:
+#     reset(seed)  - начать игру заново (новая раскладка блоков), возвращает (наблюдение, info)
+#     step(action) - один кадр игры, возвращает (наблюдение, награда, terminated, truncated, info)
+
+# Действия дискретные (ACTION_*): ничего, влево, вправо, прыжок, влево с прыжком, вправо с прыжком.
+# Они переводятся в те же биты маски ввода (INPUT_*), что и клавиатура, и применяются
+# через gf.apply_input, поэтому агент управляет игроком так же, как человек: направление
+# "удерживается", пока действие его содержит, а прыжок срабатывает в каждом кадре с прыжком
+# (второй подряд - прыжок в воздухе). В info - кадр, уровень и примененная маска.
+
+# Награда: +1 в кадре, когда игрок добрался до верха (эпизод завершается, terminated),
+# -1 в кадре, когда игрок погиб. Эпизод обрезается (truncated) через max_steps кадров.
+
+# Наблюдение - пиксели экрана после gf.update_screen. Экран игры - поверхность, созданная
+# pygame.image.frombuffer поверх заранее выделенного массива NumPy (BGRA), поэтому игра рисует
+# прямо в массив. Без обработки наблюдение - представление (view) этого массива в порядке RGB,
+# [высота, ширина, 3], без копирования. (pygame.surfarray.pixels3d тоже не копирует, но
+# блокирует поверхность, пока представление существует, и агент, державший предыдущее
+# наблюдение, не дал бы нарисовать следующий кадр.) Наблюдение меняется при следующем step() -
+# скопируйте его, если нужно сохранить.
+# С grayscale, downsample (каждый N-й пиксель) или frame_stack (несколько последних кадров)
+# кадр обрабатывается в заранее выделенные буферы. Кадры стопки хранятся в кольцевом буфере
+# двойной длины (каждый кадр пишется дважды), так что последние frame_stack кадров по порядку
+# всегда лежат подряд и выдаются срезом без копирования.
+
+# С observation='symbolic' наблюдение - символьное состояние (src/observation_encoder.py),
+# и draw_game_objects не вызывается вовсе: шаг стоит только симуляции.
+
+# Игра создается без окна (src/headless.py), изображения - поверх общей памяти, если
+# передан shared_sprites (src/shared_sprites.py). Начальное состояние сохраняется снимком
+# (Tilemap.snapshot), reset() восстанавливает его, поэтому эпизод с тем же seed повторяется
+# кадр в кадр.
+
+import random
+from src.headless import create_headless_game
+import src.game_functions as gf
+from src.observation_encoder import ObservationEncoder
+import pygame
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The discrete actions
+ACTION_NOOP = 0
+ACTION_LEFT = 1
+ACTION_RIGHT = 2
+ACTION_JUMP = 3
+ACTION_LEFT_JUMP = 4
+ACTION_RIGHT_JUMP = 5
+# (walk direction, jump) of each action
+ACTION_INPUTS = ((0, False), (-1, False), (1, False), (0, True), (-1, True), (1, True))
+ACTION_COUNT = len(ACTION_INPUTS)
+
+# Integer grayscale weights, they add up to 256
+GRAY_WEIGHTS = (77, 150, 29)
+
+class GameEnv():
+    """A Floor-jumper game driven one frame per step by discrete actions, observed as pixels or symbolic state"""
+
+    # False when NumPy isn't installed, pixel observations are NumPy arrays
+    available = numpy is not None
+
+    def __init__(self, observation='pixels', grayscale=False, downsample=1, frame_stack=1, max_steps=10000,
+            setting_overrides=None, shared_sprites=None, image_res=None):
+        """Create the game without a window.  observation is 'pixels' or 'symbolic', for pixels
+        downsample keeps every Nth pixel in both directions and frame_stack > 1 stacks the last
+        frames on a new first axis.  With shared_sprites the images are built over its shared pixels,
+        environments in one process can share one image_res instead"""
+        if observation not in ('pixels', 'symbolic'):
+            raise ValueError("Unknown observation {}, expected 'pixels' or 'symbolic'".format(observation))
+        self.symbolic = observation == 'symbolic'
+        # Nothing is drawn for symbolic observations, so they don't need a screen of their own
+        self.tile_map = create_headless_game(setting_overrides, None if self.symbolic else self.create_screen, image_res,
+            shared_sprites)
+        self.settings = self.tile_map.settings
+        self.screen = self.tile_map.screen
+        self.start_snapshot = self.tile_map.snapshot()
+        self.grayscale = grayscale
+        self.downsample = downsample
+        self.frame_stack = frame_stack
+        self.max_steps = max_steps
+        self.action_count = ACTION_COUNT
+
+        # Episode state
+        self.steps = 0
+        self.walk = 0
+        self.was_dying = False
+        self.was_at_top = False
+
+        # The screen as RGB, a view of the screen's BGRA pixels
+        self.pixels = None if self.symbolic else self.screen_pixels[:, :, 2::-1]
+        self.observation_dtype = numpy.dtype(numpy.float32 if self.symbolic else numpy.uint8)
+        self.processed = not self.symbolic and (grayscale or downsample > 1 or frame_stack > 1)
+        if self.processed:
+            self.allocate_buffers()
+        elif self.symbolic:
+            self.encoder = ObservationEncoder(self.tile_map)
+            self.observation_shape = (self.encoder.size,)
+        else:
+            self.observation_shape = self.pixels.shape
+
+    def create_screen(self, settings):
+        """The surface the game draws on, backed by a NumPy array so the pixels are read without a copy or a lock"""
+        self.screen_pixels = numpy.zeros((settings.screen_height, settings.screen_width, 4), dtype=numpy.uint8)
+        return pygame.image.frombuffer(self.screen_pixels, (settings.screen_width, settings.screen_height), 'BGRA')
+
+    def allocate_buffers(self):
+        """The buffers the processed observations are written to, allocated once"""
+        height = (self.settings.screen_height + self.downsample - 1) // self.downsample
+        width = (self.settings.screen_width + self.downsample - 1) // self.downsample
+        frame_shape = (height, width) if self.grayscale else (height, width, 3)
+        if self.grayscale:
+            self.gray_sum = numpy.empty((height, width), dtype=numpy.uint16)
+            self.gray_channel = numpy.empty((height, width), dtype=numpy.uint16)
+        # Ring of 2 * frame_stack frames, each frame is written at index and index + frame_stack
+        self.frames = numpy.zeros((2 * self.frame_stack,) + frame_shape, dtype=numpy.uint8)
+        self.frame_index = 0
+        self.observation_shape = frame_shape if self.frame_stack == 1 else (self.frame_stack,) + frame_shape
+
+    def reset(self, seed=None):
+        """Start a new game from the start state with a new block layout, seeded if seed is given.
+        Returns (observation, info)"""
+        rng_state = random.getstate()
+        self.tile_map.restore(self.start_snapshot)
+        if seed is None:
+            random.setstate(rng_state)
+        else:
+            random.seed(seed)
+        gf.reset_game(self.tile_map)
+
+        self.steps = 0
+        self.walk = 0
+        self.was_dying = False
+        self.was_at_top = False
+        if not self.symbolic:
+            self.draw()
+        return (self.get_observation(True), self.get_info(0))
+
+    def get_input_mask(self, action):
+        """The input bits for an action, (release mask, press mask): a walk direction that
+        changes has to be released before the new one is pressed"""
+        walk, jump = ACTION_INPUTS[action]
+        release_mask = 0
+        if walk != self.walk:
+            if self.walk < 0:
+                release_mask |= gf.INPUT_LEFT_UP
+            elif self.walk > 0:
+                release_mask |= gf.INPUT_RIGHT_UP
+            self.walk = walk
+
+        # Pressed again every frame it's held, it only takes effect while the player stands still
+        press_mask = 0
+        if walk < 0:
+            press_mask |= gf.INPUT_LEFT_DOWN
+        elif walk > 0:
+            press_mask |= gf.INPUT_RIGHT_DOWN
+        if jump:
+            press_mask |= gf.INPUT_JUMP
+        return (release_mask, press_mask)
+
+    def step(self, action):
+        """Apply the action and simulate one frame.  Returns (observation, reward, terminated, truncated, info)"""
+        release_mask, press_mask = self.get_input_mask(action)
+        gf.apply_input(self.settings, self.screen, self.tile_map, release_mask)
+        gf.apply_input(self.settings, self.screen, self.tile_map, press_mask)
+        self.update()
+        self.steps += 1
+
+        player = self.tile_map.player
+        reward = 0.0
+        if player.dying and not self.was_dying:
+            reward -= 1.0
+        terminated = player.at_top and not self.was_at_top
+        if terminated:
+            reward += 1.0
+        self.was_dying = player.dying
+        self.was_at_top = player.at_top
+        truncated = not terminated and self.steps >= self.max_steps
+        return (self.get_observation(False), reward, terminated, truncated, self.get_info(release_mask | press_mask))
+
+    def update(self):
+        """Simulate a frame and draw it, unless the observation doesn't need pixels"""
+        if self.symbolic:
+            gf.update_game_objects(self.settings, self.tile_map)
+        else:
+            gf.update_screen(self.settings, self.screen, self.tile_map)
+
+    def draw(self):
+        """Draw the current state without simulating, for the first observation"""
+        self.screen.fill(self.settings.bg_color)
+        gf.draw_game_objects(self.settings, self.screen, self.tile_map)
+
+    def get_info(self, input_mask):
+        """The info dict returned with each observation"""
+        return {'frame': self.tile_map.sim_clock.frame, 'level': self.tile_map.level_info.level,
+            'input_mask': input_mask}
+
+    def get_observation(self, first):
+        """The configured observation, first fills the whole frame stack"""
+        if self.symbolic:
+            return self.encoder.encode()
+
+        pixels = self.pixels
+        if not self.processed:
+            return pixels
+
+        if self.downsample > 1:
+            pixels = pixels[::self.downsample, ::self.downsample]
+        self.frame_index = (self.frame_index + 1) % self.frame_stack
+        frame = self.frames[self.frame_index]
+        if self.grayscale:
+            numpy.multiply(pixels[:, :, 0], GRAY_WEIGHTS[0], out=self.gray_sum, dtype=numpy.uint16)
+            for channel in (1, 2):
+                numpy.multiply(pixels[:, :, channel], GRAY_WEIGHTS[channel], out=self.gray_channel, dtype=numpy.uint16)
+                self.gray_sum += self.gray_channel
+            numpy.right_shift(self.gray_sum, 8, out=frame, casting='unsafe')
+        else:
+            frame[...] = pixels
+
+        if self.frame_stack == 1:
+            return frame
+        if first:
+            self.frames[:] = frame
+        else:
+            self.frames[self.frame_index + self.frame_stack] = frame
+        # The oldest frame is the one after the newest, the newest is last
+        return self.frames[self.frame_index + 1:self.frame_index + 1 + self.frame_stack]
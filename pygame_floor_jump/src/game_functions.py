@@ -16,24 +16,23 @@
 # Если пользователь нажимает клавиши со стрелками "ВЛЕВО" или "ВПРАВО", 
 # функция вызовет функцию check_keydown_events, чтобы проверить, идет ли игрок влево или вправо.
 
+# Нажатия клавиш, влияющие на игру, не применяются сразу: check_events собирает их за кадр
+# в битовую маску ввода (INPUT_*), а apply_input применяет ее. Эту же маску записывает
+# и воспроизводит повтор (src/replay.py), поэтому воспроизведение повторяет игру кадр в кадр.
+
 # Функция reset_game сбрасывает игру, вызывая функцию reset объекта tile_map.
 
-# Функция check_keydown_events реагирует на события нажатия клавиши, 
-# вызывая другие функции в зависимости от того, какая клавиша была нажата.
-# Например, если пользователь нажмет клавишу "a", 
-# функция вызовет функцию generate_new_random_blob для создания нового врага. 
-# Если пользователь нажмет клавиши со стрелками "ВЛЕВО" или "ВПРАВО", 
-# функция проверит, находится ли проигрыватель в режиме ожидания, 
-# и соответствующим образом установит атрибут dx проигрывателя. 
-# Если пользователь нажмет клавишу "F9", функция переключит полноэкранный режим.
-
-# Функция check_keyup_events реагирует на события key up, 
-# устанавливая для атрибута dx игрока значение 0, 
-# если отпущены клавиши со стрелками "ВЛЕВО" или "ВПРАВО", 
-# и проверяя, падает ли игрок и использовал ли он уже прыжок в воздух, 
-# если отпущена клавиша "ПРОБЕЛ".
-
-# Функция generate_new_random_blob генерирует нового врага, 
+# Функции check_keydown_events и check_keyup_events переводят нажатия и отпускания клавиш
+# в биты маски ввода. Клавиши ESC (выход) и F9 (полноэкранный режим) не относятся к игре
+# и обрабатываются сразу.
+
+# Функция apply_input применяет маску ввода: клавиша "a" создает нового врага,
+# "r" сбрасывает игру, нажатие стрелок "ВЛЕВО" или "ВПРАВО" задает атрибут dx игрока
+# (если он не ждет наверху), отпускание стрелок останавливает его, а отпускание
+# клавиши "ПРОБЕЛ" - прыжок (или прыжок в воздухе, если он еще не использован).
+
+# Функция generate_new_random_blob берет врага из пула (BlobPool) и, 
+# если предел живых врагов не достигнут, размещает его на карте, 
 # выбирая случайный этаж и сторону, устанавливая начальную позицию противника, 
 # скорость и флаги "лицом к лицу" и добавляя врага в список врагов объекта tile_map.
 
@@ -51,47 +50,73 @@
 
 import sys
 import random
-from src.blob_enemy import Blob
 import pygame
 import pygame.freetype
+from src.tile_grid import FLOOR_ROWS
+
+# The keys that affect the game, one bit each in a frame's input mask
+INPUT_LEFT_DOWN = 1
+INPUT_LEFT_UP = 2
+INPUT_RIGHT_DOWN = 4
+INPUT_RIGHT_UP = 8
+INPUT_JUMP = 16
+INPUT_ADD_BLOB = 32
+INPUT_RESET = 64
+INPUT_WALK_DOWN = INPUT_LEFT_DOWN | INPUT_RIGHT_DOWN
+INPUT_WALK_UP = INPUT_LEFT_UP | INPUT_RIGHT_UP
 
 def check_events(settings, screen, tile_map):
-    """Watch for keyboard and mouse events"""
+    """Watch for keyboard and mouse events, returns the frame's input mask for apply_input()"""
+    # apply_input() applies the walk key releases before the presses, so the mask keeps only the
+    # presses that came after the last release, which is what handling the events in order does
+    input_mask = 0
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
-            sys.exit()
+            exit_game(tile_map)
 
         elif event.type == pygame.KEYDOWN:
-            check_keydown_events(settings, event, screen, tile_map)
+            event_mask = check_keydown_events(settings, event, screen, tile_map)
+            # Once the player walks the next press does nothing, so only the first one counts
+            if input_mask & INPUT_WALK_DOWN:
+                event_mask &= ~INPUT_WALK_DOWN
+            input_mask |= event_mask
         elif event.type == pygame.KEYUP:
-        	check_keyup_events(settings, event, screen, tile_map)
+            event_mask = check_keyup_events(settings, event, screen, tile_map)
+            # A release stops the player, so the presses before it are undone
+            if event_mask & INPUT_WALK_UP:
+                input_mask &= ~INPUT_WALK_DOWN
+            input_mask |= event_mask
+
+    return input_mask
 
 def reset_game(tile_map):
     tile_map.reset()
 
+def exit_game(tile_map):
+    """Report the session statistics and quit"""
+    print(tile_map.blob_pool.get_stats_text())
+    print(tile_map.sim_clock.get_stats_text())
+    if tile_map.telemetry:
+        print(tile_map.telemetry.get_stats_text())
+    sys.exit()
+
 def check_keydown_events(settings, event, screen, tile_map):
-    """Respond to key down events"""
-    player = tile_map.player
+    """Respond to key down events, the keys that affect the game are returned as input bits"""
     if event.key == pygame.K_ESCAPE:
-        sys.exit()
+        exit_game(tile_map)
 
+    input_mask = 0
     if event.key == pygame.K_a:
-        generate_new_random_blob(settings, screen, settings.image_res.enemy_blob_images, tile_map)
+        input_mask |= INPUT_ADD_BLOB
         
     if event.key == pygame.K_r:
-        reset_game(tile_map)
+        input_mask |= INPUT_RESET
     
     if event.key == pygame.K_LEFT:
-        if not player.idle_top:
-            if player.dx == 0.0:
-                player.dx = -1 * settings.player_dx
-                player.facing_left = True
+        input_mask |= INPUT_LEFT_DOWN
     
     if event.key == pygame.K_RIGHT:
-        if not player.idle_top:
-            if player.dx == 0.0:
-                player.dx = settings.player_dx
-                player.facing_left = False
+        input_mask |= INPUT_RIGHT_DOWN
         
     if event.key == pygame.K_F9:
         if settings.fullscreen == True:
@@ -101,50 +126,101 @@ def check_keydown_events(settings, event, screen, tile_map):
             settings.fullscreen = True
             pygame.display.set_mode((800, 600), pygame.FULLSCREEN)
 
+    return input_mask
+
 def check_keyup_events(settings, event, screen, tile_map):
-    player = tile_map.player
+    """Respond to key up events, returns the input bits"""
+    input_mask = 0
     if event.key == pygame.K_SPACE:
-        if not player.idle_top:
-            if player.falling == False:
-                player.dy = settings.player_jump_velocity
-                player.falling = True
-            elif player.air_jumps < player.max_air_jumps:
-                player.dy = settings.player_air_jump_velocity
-                player.air_jumps += 1
+        input_mask |= INPUT_JUMP
 
     if event.key == pygame.K_LEFT:
+        input_mask |= INPUT_LEFT_UP
+        
+    if event.key == pygame.K_RIGHT:
+        input_mask |= INPUT_RIGHT_UP
+
+    return input_mask
+
+def apply_input(settings, screen, tile_map, input_mask):
+    """Apply one frame's input mask (INPUT_* bits) to the game, walk key releases before presses.
+    check_events() builds the mask so this gives the same result as the frame's events in order,
+    except that a walk key pressed and released within the frame doesn't turn the player"""
+    if not input_mask:
+        return
+
+    if input_mask & INPUT_ADD_BLOB:
+        generate_new_random_blob(settings, screen, settings.image_res.enemy_blob_images, tile_map)
+
+    if input_mask & INPUT_RESET:
+        reset_game(tile_map)
+
+    player = tile_map.player
+    if input_mask & INPUT_LEFT_UP:
         if not player.idle_top:
             if player.dx != 0.0:
                 player.dx = 0.0
         
-    if event.key == pygame.K_RIGHT:
+    if input_mask & INPUT_RIGHT_UP:
         if not player.idle_top:
             if player.dx != 0.0:
                 player.dx = 0.0
 
-def generate_new_random_blob(settings, screen, images, tile_map):
-    """Generate a new blob enemy and add it to the list"""
+    if input_mask & INPUT_LEFT_DOWN:
+        if not player.idle_top:
+            if player.dx == 0.0:
+                player.dx = -1 * settings.player_dx
+                player.facing_left = True
+
+    if input_mask & INPUT_RIGHT_DOWN:
+        if not player.idle_top:
+            if player.dx == 0.0:
+                player.dx = settings.player_dx
+                player.facing_left = False
+
+    if input_mask & INPUT_JUMP:
+        if not player.idle_top:
+            if player.falling == False:
+                player.dy = settings.player_jump_velocity
+                player.falling = True
+            elif player.air_jumps < player.max_air_jumps:
+                player.dy = settings.player_air_jump_velocity
+                player.air_jumps += 1
+
+def pick_blob_spawn(settings, tile_map):
+    """Pick a random (floor_number, facing_left) for a new blob"""
     # How this should work:  First pick a floor, this is the middle_row of the triad created
-    # when generating the map, e.g. not the floor and not a level where blocks can appear
-    floor_number = random.randint(0, settings.map_number_floors - 2)
+    # when generating the map, e.g. not the floor and not a level where blocks can appear.
+    # The map knows which floors are safe, in endless mode only some of the tower is loaded
+    first_floor, last_floor = tile_map.get_spawn_floor_range()
+    floor_number = random.randint(first_floor, last_floor)
 
     # Secondly pick a side, left or right (this will affect placement and initial velocity, etc)
     facing_left = random.choice([True, False])
+    return (floor_number, facing_left)
+
+def generate_new_random_blob(settings, screen, images, tile_map):
+    """Generate a new blob enemy and add it to the list"""
+    # Blobs come from the pool, if the live population is at the cap there's nothing to spawn
+    enemy = tile_map.blob_pool.acquire()
+    if enemy is None:
+        return
+
+    floor_number, facing_left = pick_blob_spawn(settings, tile_map)
 
     # Calculate initial position / velocity / facing flags
-    enemy = Blob(settings, screen, images)
-    enemy.rect.bottom = settings.tile_height * ( 2 + (3 * floor_number))
-    enemy.rect.left = 3 * settings.tile_width + tile_map.x_offset
+    enemy.rect.bottom = tile_map.player_bounds_rect.top + settings.tile_height * ( 2 + (FLOOR_ROWS * floor_number))
+    enemy.rect.left = tile_map.player_bounds_rect.left
     enemy.dx = settings.enemy_blob_dx
 
     if facing_left:
-        enemy.rect.left += 10 * settings.tile_width
+        enemy.rect.left = tile_map.player_bounds_rect.right
         enemy.dx *= -1.0
         enemy.facing_left = True
-        enemy.set_current_animation(settings.anim_name_walk_left)
+        enemy.set_current_animation(settings.anim_id_walk_left)
     else:
         enemy.facing_left = False
-        enemy.set_current_animation(settings.anim_name_walk_right)
+        enemy.set_current_animation(settings.anim_id_walk_right)
 
     # Add it to the list
     tile_map.enemies.add(enemy)
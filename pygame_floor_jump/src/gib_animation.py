@@ -0,0 +1,134 @@
+"""This module implements a pre-baked gib effect for Floor-jumper"""
+# Этот код определяет класс GibAnimation - заранее просчитанную анимацию
+# брызг, которые появляются, когда блоб попадает в слив.
+
+# Вместо того чтобы каждый кадр моделировать и рисовать сотни частиц,
+# выброс частиц один раз моделируется по настройкам particle_gen_*
+# (с собственным генератором случайных чисел и заданным seed),
+# и каждый кадр сохраняется как отдельная поверхность, обрезанная по границам частиц.
+
+# Кадры запекаются лениво - когда выброс впервые доходит до кадра, а не при загрузке:
+# все три варианта вместе занимают около 7.5MB, и их не стоит строить, пока блоб не
+# попал в слив. Результат от этого не зависит - у анимации свой генератор случайных чисел.
+
+# Во время игры каждый выброс воспроизводится как один анимированный спрайт:
+# один blit на кадр, независимо от количества частиц.
+
+# Метод bake_frame() моделирует и запекает следующий кадр, has_frame() запекает кадры
+# до указанного и проверяет, что выброс еще не закончился, get_frame() возвращает кадр (запекая
+# его при необходимости) - через него кадры читают и другие рисовальщики (atlas_renderer.py),
+# get_frame_count() запекает оставшиеся кадры и возвращает их число, а draw() рисует указанный
+# кадр относительно точки выброса.
+
+import random
+import pygame
+
+class GibAnimation():
+    """A gib burst simulated once from the particle_gen_* settings and stored as a list of frames,
+    each frame is baked the first time the burst reaches it"""
+
+    def __init__(self, settings, origin_x, origin_y, bottom, seed):
+        """Prepare the animation for a burst at the given origin, particles die below 'bottom'"""
+        self.settings = settings
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.bottom = bottom
+        # Each frame is a (surface, x offset, y offset) from the origin, or None when empty
+        self.frames = []
+
+        # Simulation state of the frames not baked yet
+        self.rng = random.Random(seed)
+        self.particles = []
+        # The generator emits on every update until it's been active for more than the max frames
+        self.frames_to_emit = settings.particle_gen_max_frames + 1
+        self.finished = False
+
+    def generate_particles(self, rng):
+        """Same initial velocities as BlobExit.generate_particles, but from the baking generator"""
+        new_particles = []
+        for particle_index in range(0, self.settings.particle_gen_per_frame):
+            dx = rng.randint(self.settings.particle_gen_dx_range[0], self.settings.particle_gen_dx_range[1])
+            dy = rng.randint(self.settings.particle_gen_dy_range[0], self.settings.particle_gen_dy_range[1]) * -1
+            # [x, y, dx, dy, size]
+            new_particles.append([self.origin_x, self.origin_y, dx, dy, 0])
+
+        # The generator picks the sizes after the callback returns its velocities
+        for particle in new_particles:
+            particle[4] = rng.randint(1, 4)
+
+        return new_particles
+
+    def bake_frame(self):
+        """Run one step of the particle simulation and store its frame, the burst is finished
+        once every particle is dead"""
+        settings = self.settings
+        if len(self.frames) < self.frames_to_emit:
+            self.particles.extend(self.generate_particles(self.rng))
+
+        # Same physics as Particle.update
+        for particle in self.particles:
+            particle[0] += particle[2]
+            particle[3] += settings.gravity
+            if particle[3] > settings.terminal_velocity:
+                particle[3] = settings.terminal_velocity
+            particle[1] += particle[3]
+        self.particles = [particle for particle in self.particles if particle[1] <= self.bottom]
+
+        self.frames.append(self.render_frame(self.particles))
+        if len(self.frames) >= self.frames_to_emit and not self.particles:
+            self.finished = True
+            self.rng = None
+
+    def has_frame(self, frame_index):
+        """True if the burst lasts to frame_index, baking the frames up to it"""
+        while len(self.frames) <= frame_index and not self.finished:
+            self.bake_frame()
+        return frame_index < len(self.frames)
+
+    def get_frame(self, frame_index):
+        """The frame at frame_index as (surface, x offset, y offset) from the origin, baking it if needed.
+        None if the frame is empty or the burst is over by then"""
+        if not self.has_frame(frame_index):
+            return None
+        return self.frames[frame_index]
+
+    def render_frame(self, particles):
+        """Draw the particles onto a surface just big enough to hold them"""
+        if not particles:
+            return None
+
+        # Integer pixel positions, the same truncation the live particles get when drawn
+        rects = [pygame.Rect(int(particle[0]), int(particle[1]), particle[4], particle[4]) for particle in particles]
+        bounds = rects[0].unionall(rects[1:])
+
+        # The gibs are a single color, so an 8 bit surface with a 2 color palette is enough
+        # and takes a quarter of the memory of a full color one
+        surface = pygame.Surface(bounds.size, 0, 8)
+        surface.set_palette([self.settings.color_key, self.settings.particle_gen_color])
+        surface.fill(0)
+        surface.set_colorkey(0)
+        for rect in rects:
+            rect.move_ip(-bounds.left, -bounds.top)
+            surface.fill(1, rect)
+
+        return (surface, bounds.left - self.origin_x, bounds.top - self.origin_y)
+
+    def get_frame_count(self):
+        """Number of frames in the burst, baking the rest of them"""
+        while not self.finished:
+            self.bake_frame()
+        return len(self.frames)
+
+    def get_memory_bytes(self):
+        """Pixel memory used by the frames baked so far"""
+        total = 0
+        for frame in self.frames:
+            if frame:
+                total += frame[0].get_height() * frame[0].get_pitch()
+        return total
+
+    def draw(self, screen, frame_index, x, y):
+        """Draw one frame of the burst with its origin at x, y"""
+        frame = self.get_frame(frame_index)
+        if frame:
+            screen.blit(frame[0], (x + frame[1], y + frame[2]))
@@ -0,0 +1,45 @@
+"""This module sets up Floor-jumper without a window, for tools that run the simulation"""
+# Эта функция создает игру без окна (драйвер SDL "dummy"): настройки, изображения, экран
+# и карту (Tilemap), как это делает floor_jumper.py, но без игрового цикла.
+
+# Ее используют инструменты, которые сами вызывают Tilemap.update(): загрузчик данных из
+# повторов, среда для обучения агентов и т.п. Изображения все равно загружаются, потому что
+# из них вычисляются хитбоксы и маски столкновений.
+
+import os
+
+# Must be set before pygame opens the display
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+# SDL would turn SIGTERM into a QUIT event, so worker processes couldn't be stopped
+os.environ.setdefault('SDL_NO_SIGNAL_HANDLERS', '1')
+
+import pygame
+import src.game_functions as gf
+from src.image_resources import ImageResources
+from src.settings import Settings
+from src.tilemap import Tilemap
+
+def create_headless_game(setting_overrides=None, create_screen=None, image_res=None, shared_sprites=None):
+    """Returns a reset Tilemap drawing to an off-screen display, setting_overrides is a dict of
+    Settings attributes to change before anything is built.  create_screen(settings), if given,
+    returns the surface to draw on instead of the display.  Several games can share one
+    image_res, it's loaded if not given (over the pixels of shared_sprites, if given)"""
+    pygame.init()
+    settings = Settings()
+    if setting_overrides:
+        for name, value in setting_overrides.items():
+            setattr(settings, name, value)
+    settings.image_res = image_res if image_res else ImageResources(settings, shared_sprites)
+    # gf.update_screen flips the display, so there has to be one
+    screen = pygame.display.set_mode((settings.screen_width, settings.screen_height))
+    if create_screen:
+        screen = create_screen(settings)
+
+    tile_map = Tilemap(settings, screen, settings.map_indicies, settings.image_res.tile_images,
+        settings.image_res.block_image, settings.image_res.blob_exit_images, settings.image_res.player_sprite_images,
+        settings.image_res.enemy_blob_images)
+    tile_map.generate_basic_map(settings.map_number_floors, settings.map_number_subfloors)
+    gf.reset_game(tile_map)
+    return tile_map
@@ -11,6 +11,17 @@
 # Поверхность и pygame.Методы Surface.blit() для создания новой поверхности
 # размером с плитку и копирования подраздела изображения на поверхность.
 
+# Для кадров спрайтов также заранее вычисляются хитбоксы (прямоугольник вокруг
+# непрозрачных пикселей) и маски столкновений pygame.mask.Mask.
+
+# С shared_sprites (src/shared_sprites.py) изображения не загружаются с диска, а строятся
+# поверх пикселей в общей памяти, которые подготовил родительский процесс. loaded_images -
+# все загруженные кадры по именам файлов, из них SharedSprites и строит общую память.
+# get_memory_usage() возвращает, сколько байт пикселей изображений у процесса свои, а сколько общие.
+
+# get_scaled_images() делает уменьшенные копии всех изображений (один раз на масштаб),
+# их общими используют все игры, которые рисует AtlasRenderer.
+
 # В целом, этот код показывает, как загрузить и сохранить необходимые изображения 
 # для игры с помощью Pygame, а также как разделить изображение на плитки заданного размера.
 
@@ -18,36 +29,52 @@
 
 import pygame
 
+def scale_image(image, scale):
+    """A copy of the image scaled by scale, at least 1 pixel each way"""
+    width, height = image.get_size()
+    return pygame.transform.scale(image, (max(1, round(width * scale)), max(1, round(height * scale))))
+
 class ImageResources():
     """Hold all of the loaded image data to be shared"""
 
-    def __init__(self, settings):
-        """Load and store the images we need"""
+    def __init__(self, settings, shared_sprites=None):
+        """Load and store the images we need, from the pixels in shared_sprites if given"""
 
         self.settings = settings
+        self.shared_sprites = shared_sprites
+        # The images loaded from each file, for SharedSprites
+        self.loaded_images = {}
         # Load the tile frames
         self.tile_images = []
         tile_images = self.tile_images
         self.load_image_to_tiles('images/tiles.bmp', self.settings.tile_width, self.settings.tile_height, tile_images)
 
-        # Load the sprite frames
+        # Load the sprite frames, along with the hitbox and collision mask of each frame
         self.player_sprite_images = []
+        self.player_sprite_hitboxes = []
+        self.player_sprite_masks = []
         player_images = self.player_sprite_images
-        self.load_image_to_tiles('images/sprite_player.bmp', self.settings.player_width, self.settings.player_height, player_images)
+        self.load_image_to_tiles('images/sprite_player.bmp', self.settings.player_width, self.settings.player_height, player_images,
+            self.player_sprite_hitboxes, self.player_sprite_masks)
 
         # Load the enemy blob frames
         self.enemy_blob_images = []
+        self.enemy_blob_hitboxes = []
+        self.enemy_blob_masks = []
         blob_images = self.enemy_blob_images
-        self.load_image_to_tiles('images/sprite_blob.bmp', self.settings.enemy_blob_width, self.settings.enemy_blob_height, blob_images)
+        self.load_image_to_tiles('images/sprite_blob.bmp', self.settings.enemy_blob_width, self.settings.enemy_blob_height, blob_images,
+            self.enemy_blob_hitboxes, self.enemy_blob_masks)
 
         # Load the platform block image
-        self.block_image = pygame.image.load('images/block.bmp')
-        self.block_image.set_colorkey(self.settings.color_key)
+        self.block_image = self.load_image('images/block.bmp', self.settings.color_key)
 
         # Load the exit sprite (blade)
         self.blob_exit_images = []
+        self.blob_exit_hitboxes = []
+        self.blob_exit_masks = []
         exit_images = self.blob_exit_images
-        self.load_image_to_tiles('images/sprite_exit.bmp', self.settings.tile_width, self.settings.tile_height, exit_images)
+        self.load_image_to_tiles('images/sprite_exit.bmp', self.settings.tile_width, self.settings.tile_height, exit_images,
+            self.blob_exit_hitboxes, self.blob_exit_masks)
 
         # Load digits
         self.digit_images = []
@@ -60,16 +87,57 @@ class ImageResources():
         self.load_image_to_tiles('images/timer_digits.bmp', self.settings.lcd_digit_width, self.settings.lcd_digit_height, lcd_digit_images)
 
         # Load timer frames - no need for a color key on this one
-        self.lcd_frame_image = pygame.image.load('images/timer_frame.bmp')
+        self.lcd_frame_image = self.load_image('images/timer_frame.bmp')
 
         # Load 'LEVEL' text
-        self.level_image = pygame.image.load('images/level_text.bmp')
-        self.level_image.set_colorkey(self.settings.color_key)
-        
-
-    def load_image_to_tiles(self, file_name, tile_width, tile_height, images):
+        self.level_image = self.load_image('images/level_text.bmp', self.settings.color_key)
+
+        # Scaled copies of the images for each scale asked for, see get_scaled_images()
+        self.scaled_images = {}
+
+    def get_scaled_images(self, scale):
+        """A dict from id() of each loaded image to a copy scaled by scale (nearest pixel, the color
+        key is kept), made once per scale and shared by everything that draws at that scale"""
+        scaled_images = self.scaled_images.get(scale)
+        if scaled_images is None:
+            scaled_images = {}
+            for image in self.get_all_images():
+                scaled_images[id(image)] = scale_image(image, scale)
+            self.scaled_images[scale] = scaled_images
+        return scaled_images
+
+    def get_all_images(self):
+        """Every loaded image"""
+        return [image for images in self.loaded_images.values() for image in images]
+
+    def get_memory_usage(self):
+        """(own, shared) bytes of image pixels, own is held by this process alone and shared is
+        in the shared memory block, not counting the scaled copies"""
+        pixel_bytes = sum([image.get_pitch() * image.get_height() for image in self.get_all_images()])
+        if self.shared_sprites:
+            return (0, pixel_bytes)
+        return (pixel_bytes, 0)
+
+    def load_image(self, file_name, color_key=None):
+        """Load a single image, transparent where it's color_key if given"""
+        if self.shared_sprites:
+            # The color key is part of the shared image
+            image = self.shared_sprites.get_images(file_name)[0]
+        else:
+            image = pygame.image.load(file_name)
+            if color_key is not None:
+                image.set_colorkey(color_key)
+        self.loaded_images[file_name] = [image]
+        return image
+
+    def load_image_to_tiles(self, file_name, tile_width, tile_height, images, hitboxes=None, masks=None):
         """Load the specified image and attempt to split it into tiles
-        of the specified width and height."""
+        of the specified width and height.  Optionally also store the hitbox
+        (tight rect around the opaque pixels) and the collision mask of each tile"""
+        if self.shared_sprites:
+            self.add_tiles(self.shared_sprites.get_images(file_name), file_name, images, hitboxes, masks)
+            return
+
         image = pygame.image.load(file_name)
         image_rect = image.get_rect()
 
@@ -82,6 +150,7 @@ class ImageResources():
         tiles_per_col = image_height // tile_height
 
         # The index for the row is over the number of cols in a row and vice versa
+        tiles = []
         for row_index in range(0, tiles_per_col):
             for col_index in range(0, tiles_per_row):
                 # Create a new surface the size of the tile
@@ -90,5 +159,19 @@ class ImageResources():
                 new_surface.set_colorkey(self.settings.color_key)
                 # Copy just the sub-section of the image onto the surface
                 new_surface.blit(image, (0, 0), (col_index * tile_width, row_index * tile_height, tile_width, tile_height))
-                # Now add it to our list of surfaces, these will be index-addressed for now
-                images.append(new_surface)
\ No newline at end of file
+                tiles.append(new_surface)
+
+        self.add_tiles(tiles, file_name, images, hitboxes, masks)
+
+    def add_tiles(self, tiles, file_name, images, hitboxes=None, masks=None):
+        """Add the tiles cut from file_name to images, with their hitboxes and masks if asked for"""
+        self.loaded_images[file_name] = tiles
+        for new_surface in tiles:
+            # Now add it to our list of surfaces, these will be index-addressed for now
+            images.append(new_surface)
+
+            # The colorkey border is transparent, so collisions should only use the opaque part
+            if hitboxes is not None:
+                hitboxes.append(new_surface.get_bounding_rect())
+            if masks is not None:
+                masks.append(pygame.mask.from_surface(new_surface))
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""This module implements the incremental builder for the next level"""
+# Этот код определяет класс LevelBuilder, который заранее строит блоки следующего уровня.
+
+# Когда игрок добирается до верхнего этажа, он три секунды "празднует" (idle_top).
+# В это время Tilemap каждый кадр вызывает step(), который создает блоки одного ряда
+# следующего уровня - все четыре возможных блока каждой клетки (два верхних есть всегда,
+# нижние зависят от раскладки).
+
+# Раскладка и место появления первого врага здесь не выбираются: они случайные, и если
+# выбрать их заранее, вызовы random сдвинутся относительно появления врагов и брызг,
+# которые идут во время празднования. Поэтому при смене уровня (Tilemap.start_next_level)
+# они выбираются в том же порядке, что и при построении всего уровня за один кадр, и
+# записи игр с заданным seed не меняются. Дорогая часть - создание блоков - уже сделана:
+# assemble() только раскладывает готовые блоки по группам.
+
+# Метод finish() достраивает оставшиеся ряды сразу (если празднование было прервано),
+# а discard() отбрасывает построенное, например при сбросе игры.
+
+from pygame.sprite import Group
+import struct
+
+# rows built
+BUILDER_STATE_FORMAT = struct.Struct('<H')
+
+class LevelBuilder():
+    """Creates the next level's candidate blocks a row at a time, so the level switch only has to pick them"""
+
+    def __init__(self, tile_map):
+        """Nothing is built until the first step"""
+        self.tile_map = tile_map
+        self.settings = tile_map.settings
+        self.discard()
+
+    def discard(self):
+        """Throw away anything built so far"""
+        # For each row, the (top left, top right, bottom left, bottom right) blocks of each column
+        self.candidate_rows = []
+
+    def is_ready(self):
+        """True once every row of blocks has been built"""
+        return len(self.candidate_rows) == self.tile_map.get_block_row_count()
+
+    def step(self):
+        """Build the blocks of the next row, returns True when the level is ready"""
+        if not self.is_ready():
+            self.candidate_rows.append(self.tile_map.build_candidate_row(len(self.candidate_rows)))
+
+        return self.is_ready()
+
+    def finish(self):
+        """Build whatever is left in one go"""
+        while not self.step():
+            pass
+
+    def assemble(self, layout):
+        """Returns (block rows, block group) for the layout from the built blocks, the builder is emptied"""
+        self.finish()
+        row_width = self.settings.map_playable_width
+        block_rows = []
+        block_group = Group()
+        for row, candidates in enumerate(self.candidate_rows):
+            blocks = []
+            for col, (top_left, top_right, bottom_left, bottom_right) in enumerate(candidates):
+                placement = layout[row * row_width + col]
+                blocks.append(top_left)
+                blocks.append(top_right)
+                if placement & 1:
+                    blocks.append(bottom_left)
+                if placement & 2:
+                    blocks.append(bottom_right)
+            block_rows.append(Group(blocks))
+            block_group.add(blocks)
+
+        self.discard()
+        return (block_rows, block_group)
+
+    def write_state(self, writer):
+        """Save how far the build got, nothing random is built ahead so the blocks are simply rebuilt"""
+        writer.write(BUILDER_STATE_FORMAT, len(self.candidate_rows))
+
+    def read_state(self, reader):
+        """Load the state saved by write_state, rebuilding the rows that were built"""
+        self.discard()
+        row_count, = reader.read(BUILDER_STATE_FORMAT)
+        while len(self.candidate_rows) < row_count:
+            self.step()
@@ -28,6 +28,11 @@
 
 from src.digit_sprite import DigitSprite
 from src.level_sprite import LevelSprite
+from src.sprite_resources import SpriteResources
+import struct
+
+# level
+LEVEL_INFO_STATE_FORMAT = struct.Struct('<I')
 
 class LevelInfo():
     """Container for the sprites that fly in for the current level display"""
@@ -37,14 +42,18 @@ class LevelInfo():
         self.settings = settings
         self.screen = screen
         self.screen_rect = self.screen.get_rect()
+        # Shared by the sprites
+        self.resources = SpriteResources(settings, screen)
+        # Current level number, the digits only show the last 2
+        self.level = 1
 
         # LEVEL text
-        self.level_sprite = LevelSprite(self.settings, self.screen)
+        self.level_sprite = LevelSprite(self.resources)
         # 10s digit
-        self.digit_tens = DigitSprite(self.settings, self.screen, self.settings.image_res.digit_images, 0)
+        self.digit_tens = DigitSprite(self.resources, self.settings.image_res.digit_images, 0)
         self.digit_tens.set_start_position(self.screen_rect.top - 64, self.screen_rect.left + self.settings.tile_width, 0, 15, 22)
         # 1s digit
-        self.digit_ones = DigitSprite(self.settings, self.screen, self.settings.image_res.digit_images, 1)
+        self.digit_ones = DigitSprite(self.resources, self.settings.image_res.digit_images, 1)
         self.digit_ones.set_start_position(self.screen_rect.top + self.screen_rect.height/2 - 35, self.screen_rect.right, -37, 0, 20)
 
     def update(self):
@@ -63,11 +72,26 @@ class LevelInfo():
         """Raise the level by one and update the sprites as needed"""
         # We only have 2 digits, so this will wrap if the player can get to level 100
         # But that seems unlikely with the current logic and increases
+        self.level += 1
         if self.digit_ones.increase():
             self.digit_tens.increase()
 
         self.reset()
 
+    def write_state(self, writer):
+        """Save the level number and where each sprite is on its way in"""
+        writer.write(LEVEL_INFO_STATE_FORMAT, self.level)
+        self.level_sprite.write_state(writer)
+        self.digit_ones.write_state(writer)
+        self.digit_tens.write_state(writer)
+
+    def read_state(self, reader):
+        """Load the state saved by write_state"""
+        self.level, = reader.read(LEVEL_INFO_STATE_FORMAT)
+        self.level_sprite.read_state(reader)
+        self.digit_ones.read_state(reader)
+        self.digit_tens.read_state(reader)
+
     def draw(self):
         """Draw all owned sprites at their current positions"""
         self.level_sprite.draw()
@@ -0,0 +1,92 @@
+"""This module implements the level pack file format for Floor-jumper"""
+# Этот код определяет формат файла с набором уровней (level pack) и класс LevelPack для его чтения.
+
+# Уровень в игре - это раскладка блоков: по одному байту на каждую колонку каждого ряда блоков
+# (бит 0 - нижний левый блок, бит 1 - нижний правый, верхние блоки есть всегда).
+
+# Файл состоит из заголовка фиксированного размера и записей фиксированного размера:
+#     заголовок: магическое число, версия, ширина ряда, число рядов, размер записи, число записей
+#     запись:    seed (uint32), число ударов по блокам (uint8), байты раскладки
+
+# Поскольку все записи одинакового размера, уровень с номером N находится по смещению
+# header_size + (N - 1) * record_size, и LevelPack читает его из отображенного в память
+# (mmap) файла за O(1), не загружая весь файл.
+
+# Функция generate_layout() создает случайную раскладку (ее же использует Tilemap),
+# а write_level_pack() записывает проверенные раскладки в файл.
+
+import mmap
+import struct
+
+# magic, version, row width, row count, record size, record count
+HEADER_FORMAT = struct.Struct('<4sHHHHI')
+# seed, hits
+RECORD_PREFIX_FORMAT = struct.Struct('<IB')
+LEVEL_PACK_MAGIC = b'FJLP'
+LEVEL_PACK_VERSION = 1
+
+def generate_layout(row_width, row_count, rng):
+    """Pick the random block placements for a level using the given random generator.  There is one
+    value per column of each block row: bit 0 adds the bottom left block and bit 1 the bottom right one"""
+    layout = bytearray()
+    for index in range(0, row_count * row_width):
+        bottom_left = rng.choice([True, False])
+        bottom_right = rng.choice([True, False])
+        layout.append(bottom_left | (bottom_right << 1))
+    return layout
+
+def write_level_pack(path, row_width, row_count, records):
+    """Write a level pack, records is a list of (seed, hits, layout)"""
+    record_size = RECORD_PREFIX_FORMAT.size + row_width * row_count
+    with open(path, 'wb') as pack_file:
+        pack_file.write(HEADER_FORMAT.pack(LEVEL_PACK_MAGIC, LEVEL_PACK_VERSION, row_width, row_count,
+            record_size, len(records)))
+        for seed, hits, layout in records:
+            if len(layout) != row_width * row_count:
+                raise ValueError("Layout for seed {} has {} entries, expected {}".format(
+                    seed, len(layout), row_width * row_count))
+            pack_file.write(RECORD_PREFIX_FORMAT.pack(seed, hits))
+            pack_file.write(layout)
+
+class LevelPack():
+    """Read only view of a level pack file, levels are numbered from 1"""
+
+    def __init__(self, path):
+        """Map the file and check its header"""
+        self.path = path
+        with open(path, 'rb') as pack_file:
+            self.data = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.data) < HEADER_FORMAT.size:
+            self.close()
+            raise ValueError("{} is too small to be a level pack".format(path))
+
+        magic, version, self.row_width, self.row_count, self.record_size, self.level_count = HEADER_FORMAT.unpack_from(self.data, 0)
+        if magic != LEVEL_PACK_MAGIC or version != LEVEL_PACK_VERSION:
+            self.close()
+            raise ValueError("{} is not a version {} level pack".format(path, LEVEL_PACK_VERSION))
+
+        if len(self.data) < HEADER_FORMAT.size + self.record_size * self.level_count:
+            self.close()
+            raise ValueError("{} is truncated".format(path))
+
+    def close(self):
+        """Unmap the file"""
+        self.data.close()
+
+    def get_level_count(self):
+        """Number of levels in the pack"""
+        return self.level_count
+
+    def get_record_offset(self, level_number):
+        """File offset of a level's record, numbers past the end wrap back around to level 1"""
+        return HEADER_FORMAT.size + ((level_number - 1) % self.level_count) * self.record_size
+
+    def get_level_info(self, level_number):
+        """Returns the (seed, hits) stored for the level"""
+        return RECORD_PREFIX_FORMAT.unpack_from(self.data, self.get_record_offset(level_number))
+
+    def get_layout(self, level_number):
+        """Returns the level's block layout, in the same format as generate_layout()"""
+        start = self.get_record_offset(level_number) + RECORD_PREFIX_FORMAT.size
+        return self.data[start:start + self.row_width * self.row_count]
@@ -7,9 +7,9 @@
 # Класс LevelSprite используется для создания статического графического спрайта
 # для отображения текста "LEVEL" на экране.
 
-# Метод __init__() инициализирует спрайт и принимает два параметра: настройки и экран. 
+# Метод __init__() инициализирует спрайт и принимает один параметр: общие ресурсы (настройки и экран). 
 # Строка super().__init__() вызывает конструктор родительского класса FlyInSprite 
-# и передает три аргумента: settings, screen и settings.image_res.level_image. 
+# и передает два аргумента: resources и settings.image_res.level_image. 
 # Атрибут level_image в settings.image_res, вероятно, содержит изображение, которое будет отображаться.
 
 # Метод self.set_start_position() вызывается для установки начальной позиции спрайта. 
@@ -24,8 +24,11 @@ from src.flyin_sprite import FlyInSprite
 
 class LevelSprite(FlyInSprite):
     """Static image sprite for 'LEVEL' text"""
-    
-    def __init__(self, settings, screen):
+
+    __slots__ = ()
+
+    def __init__(self, resources):
         """Init the sprite"""
-        super().__init__(settings, screen, settings.image_res.level_image)
-        self.set_start_position(self.screen_rect.bottom, self.screen_rect.left + self.settings.tile_width, 0, -20, 20)
+        super().__init__(resources, resources.settings.image_res.level_image)
+        screen_rect = self.screen.get_rect()
+        self.set_start_position(screen_rect.bottom, screen_rect.left + self.settings.tile_width, 0, -20, 20)
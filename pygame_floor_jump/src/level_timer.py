@@ -11,6 +11,9 @@
 
 # Метод reset() сбрасывает таймер на ноль, а метод stop() останавливает таймер.
 
+# Время уровня идет по часам симуляции (SimulationClock): каждое обновление добавляет
+# фиксированный шаг. Реальное время хранится отдельно в wall_elapsed_time_ms.
+
 # Метод position_frame() перемещает базовый фрейм в заданное местоположение,
 # а position_digits() перемещает каждый цифровой спрайт на основе положения фрейма.
 
@@ -32,18 +35,28 @@
 
 
 from src.digit_sprite import DigitSprite
+from src.sprite_resources import SpriteResources
 from pygame.sprite import Group
 import pygame
+import struct
+
+# elapsed_time_ms, running
+LEVEL_TIMER_STATE_FORMAT = struct.Struct('<dB')
 
 class LevelTimer():
     """The LevelTimer class represents a digital LCD style timer composed of a frame image and several DigitSprites"""
 
-    def __init__(self, settings, screen):
-        """Initialize the level timer state"""
+    def __init__(self, settings, screen, sim_clock):
+        """Initialize the level timer state, the time advances by the simulation clock's step each update"""
         self.settings = settings
         self.screen = screen
         self.screen_rect = self.screen.get_rect()
-        self.clock = pygame.time.Clock()
+        # Shared by the digits
+        self.resources = SpriteResources(settings, screen)
+        self.sim_clock = sim_clock
+        # Real time is only kept as a metric, it doesn't affect the level time
+        self.wall_clock = pygame.time.Clock()
+        self.wall_elapsed_time_ms = 0
         self.frame_image = self.settings.image_res.lcd_frame_image
         self.rect = self.frame_image.get_rect()
         self.digits = Group()
@@ -65,7 +78,8 @@ class LevelTimer():
     def reset(self):
         """Resets the counter to 0"""
         self.elapsed_time_ms = 0
-        self.clock = pygame.time.Clock()
+        self.wall_elapsed_time_ms = 0
+        self.wall_clock.tick()
         self.running = True
         
     def stop(self):
@@ -74,7 +88,7 @@ class LevelTimer():
 
     def create_and_add_digit(self, digit_group):
         """Make a new digit and add it to the group"""
-        digit_object = DigitSprite(self.settings, self.screen, self.settings.image_res.lcd_digit_images, 0)
+        digit_object = DigitSprite(self.resources, self.settings.image_res.lcd_digit_images, 0)
         digit_group.add(digit_object)
         return digit_object
 
@@ -123,8 +137,14 @@ class LevelTimer():
     def update(self):
         """Update the clock"""
         if self.running:
-            self.elapsed_time_ms += self.clock.tick()
+            # A fixed step per update, so fast-forwarded and replayed runs time the same
+            self.elapsed_time_ms += self.sim_clock.step_ms
+            self.wall_elapsed_time_ms += self.wall_clock.tick()
+
+        self.update_digits()
 
+    def update_digits(self):
+        """Show the elapsed time on the digits"""
         # copy the time and define some "constants"
         total_ms = self.elapsed_time_ms
         ms_per_second = 1000
@@ -150,6 +170,16 @@ class LevelTimer():
             self.last_rect = self.rect
             self.position_digits()
 
+    def write_state(self, writer):
+        """Save the level time, the real time metric isn't part of the simulation"""
+        writer.write(LEVEL_TIMER_STATE_FORMAT, self.elapsed_time_ms, self.running)
+
+    def read_state(self, reader):
+        """Load the state saved by write_state and show it"""
+        self.elapsed_time_ms, running = reader.read(LEVEL_TIMER_STATE_FORMAT)
+        self.running = bool(running)
+        self.update_digits()
+
     def draw(self):
         """Draw the visual representation of the clock"""
         self.screen.blit(self.frame_image, self.rect)
@@ -0,0 +1,137 @@
+"""This module implements the offline reachability check for Floor-jumper level layouts"""
+# Этот код определяет класс LevelValidator, который проверяет, можно ли пройти уровни
+# при текущей физике прыжка из Settings, и оценивает сложность раскладки блоков.
+
+# Игрок поднимается с этажа на этаж, разбивая блоки снизу головой: каждый удар
+# убирает блоки над хитбоксом (сначала нижние, если они есть, потом верхние),
+# после чего игрок прыгает в образовавшуюся дыру и в воздухе сдвигается на соседний блок.
+
+# Валидатор моделирует прыжок кадр за кадром по тем же правилам, что и AnimatedSprite.apply_physics
+# (player_jump_velocity, player_air_jump_velocity в лучший момент, gravity, terminal_velocity),
+# и проверяет (can_climb), что:
+#     - голова достает до блоков ряда выше,
+#     - прыжок поднимает игрока выше следующего ряда и держит его там достаточно кадров,
+#       чтобы сдвинуться на соседний блок.
+# Высота головы и ширина игрока берутся из хитбоксов кадров прыжка (ImageResources).
+
+# От раскладки это не зависит: верхние блоки есть в каждой клетке, а удар головой убирает
+# все блоки над хитбоксом, так что дыру можно пробить в любом месте любого ряда. Поэтому
+# проверка физики делается один раз, а для каждой раскладки (validate) считается только
+# наименьшее число ударов, нужное чтобы пробить в каждом ряду дыру шириной с хитбокс игрока.
+# Сумма по рядам служит оценкой сложности уровня.
+
+# Класс хранит только числа, поэтому его можно передавать в рабочие процессы (multiprocessing).
+
+import math
+from src.player import create_player_animations
+from src.tile_grid import FLOOR_ROWS
+
+class LevelValidator():
+    """Checks the levels can be climbed with the jump physics in settings, and rates block layouts"""
+
+    def __init__(self, settings, player_hitboxes):
+        """Copy the numbers needed from settings and the player's frame hitboxes (from ImageResources),
+        so the validator can be sent to worker processes"""
+        self.gravity = settings.gravity
+        self.terminal_velocity = settings.terminal_velocity
+        self.jump_velocity = settings.player_jump_velocity
+        self.air_jump_velocity = settings.player_air_jump_velocity
+        self.max_air_jumps = settings.player_max_air_jumps
+        self.player_dx = settings.player_dx
+        self.row_width = settings.map_playable_width
+        self.row_count = settings.map_number_floors - 1
+
+        # Blocks are 1/4 the size of a tile, 2 cells wide and 2 rows high per tile
+        self.block_width = settings.tile_width // 2
+        self.block_height = settings.tile_height // 2
+        # Every floor is FLOOR_ROWS tile rows high, the blocks sit in the top one
+        self.floor_height = settings.tile_height * FLOOR_ROWS
+
+        # The player hits the blocks with the hitbox of the jump frames, the transparent margins aren't part of it
+        animations = create_player_animations(settings)
+        jump_up_frames = (animations[settings.anim_id_jump_up_left].animation
+            + animations[settings.anim_id_jump_up_right].animation)
+        jump_frames = jump_up_frames + (animations[settings.anim_id_jump_down_left].animation
+            + animations[settings.anim_id_jump_down_right].animation)
+        # From the feet (the bottom of the sprite) to the lowest head of the frames going up
+        self.head_height = settings.player_height - max([player_hitboxes[frame].top for frame in jump_up_frames])
+        self.hitbox_width = max([player_hitboxes[frame].width for frame in jump_frames])
+        # Fewest block cells the hitbox covers, this is the narrowest hole the player fits through
+        self.cells_per_hole = math.ceil(self.hitbox_width / self.block_width)
+
+        self.max_rise, self.frames_above_floor = self.simulate_best_jump()
+
+    def simulate_jump(self, air_jump_frames):
+        """Returns the height above the start for each frame of a jump, with air jumps on the given frames"""
+        heights = []
+        height = 0.0
+        dy = self.jump_velocity
+        frame = 0
+        # The jump is over once it falls back to where it started
+        while height >= 0:
+            if frame in air_jump_frames:
+                dy = self.air_jump_velocity
+            if dy < self.terminal_velocity:
+                dy += self.gravity
+            height -= dy
+            heights.append(height)
+            frame += 1
+        return heights
+
+    def simulate_best_jump(self):
+        """Try every air jump timing, returns the highest rise and the most frames a jump keeps
+        the player's feet above the next floor (not necessarily from the same timing)"""
+        max_rise = 0.0
+        max_frames_above_floor = 0
+        # Air jumps are only worth taking one after the other, once the upwards speed has dropped
+        ground_jump = self.simulate_jump(())
+        for first_frame in range(0, len(ground_jump)):
+            air_jump_frames = set()
+            frame = first_frame
+            for air_jump in range(0, self.max_air_jumps):
+                air_jump_frames.add(frame)
+                frame += 1
+            heights = self.simulate_jump(air_jump_frames)
+            frames_above_floor = len([height for height in heights if height > self.floor_height])
+            max_rise = max(max_rise, max(heights))
+            max_frames_above_floor = max(max_frames_above_floor, frames_above_floor)
+        return (max_rise, max_frames_above_floor)
+
+    def can_break_blocks(self):
+        """True if a jump reaches the top blocks of the row above, the higher of the two block rows"""
+        top_block_bottom = self.floor_height - self.block_height
+        return self.max_rise + self.head_height >= top_block_bottom
+
+    def can_climb_through(self):
+        """True if a jump clears the next floor long enough to move onto a block next to the hole"""
+        return self.frames_above_floor * self.player_dx >= self.block_width
+
+    def can_climb(self):
+        """True if the levels can be climbed, this doesn't depend on the layout"""
+        return self.can_break_blocks() and self.can_climb_through()
+
+    def has_bottom_block(self, layout, row, cell):
+        """True if the block cell in the row has a bottom block, top blocks are always present"""
+        return bool(layout[row * self.row_width + cell // 2] & (1 << (cell % 2)))
+
+    def get_row_hits(self, layout, row):
+        """Fewest head hits to open a hole the player fits through in one row of blocks"""
+        cell_count = self.row_width * 2
+        best = None
+        for first_cell in range(0, cell_count - self.cells_per_hole + 1):
+            # One hit for the top blocks, and one more if any bottom blocks are in the way
+            hits = 1
+            for cell in range(first_cell, first_cell + self.cells_per_hole):
+                if self.has_bottom_block(layout, row, cell):
+                    hits = 2
+                    break
+            if best is None or hits < best:
+                best = hits
+        return best
+
+    def validate(self, layout):
+        """Returns the fewest hits needed to climb to the top, check can_climb() once for whether it can be climbed"""
+        if len(layout) != self.row_width * self.row_count:
+            raise ValueError("Layout has {} entries, expected {}".format(len(layout), self.row_width * self.row_count))
+
+        return sum(self.get_row_hits(layout, row) for row in range(0, self.row_count))
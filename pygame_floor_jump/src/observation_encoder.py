@@ -0,0 +1,97 @@
+"""This module implements the symbolic observation encoder for agents playing Floor-jumper"""
+# Этот код определяет класс ObservationEncoder, который записывает состояние игры в заранее
+# выделенный массив float32 - наблюдение для агентов, которым не нужны пиксели. Ничего не
+# рисуется, поэтому шаг среды (GameEnv с observation='symbolic') стоит только симуляции.
+
+# Наблюдение (размеры в плитках, скорости относительно скорости ходьбы и прыжка игрока):
+#     игрок  - прямоугольник (x, y, ширина, высота от левого верхнего угла поля игрока),
+#              dx, dy, падает ли, число прыжков в воздухе, смотрит ли влево, погибает ли
+#     враги  - blob_count ближайших: есть ли, x и y относительно игрока, dx, dy, погибает ли
+#              (ближайшие первыми, недостающие - нули)
+#     таймер - время уровня в секундах
+#     блоки  - сетка занятости: grid_rows рядов блоков, в каждой клетке 4 блока (0 или 1,
+#              см. Tilemap.get_block_row_cells). Перед сеткой - номер ее первого ряда
+#              относительно ряда под игроком. На обычной карте сетка по умолчанию - вся карта,
+#              в бесконечном режиме - окно вокруг игрока.
+# Срезы частей наблюдения: player_slice, blob_slice, timer_index, grid_slice.
+
+# Биты клетки переводятся в значения таблицей (NIBBLE_VALUES) сразу для всей сетки,
+# numpy.take пишет прямо в массив наблюдения.
+
+from src.tile_grid import FLOOR_ROWS
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+PLAYER_FEATURES = 10
+BLOB_FEATURES = 6
+
+if numpy is not None:
+    # The 4 block values of a cell, indexed by the cell's bits
+    NIBBLE_VALUES = ((numpy.arange(16)[:, None] >> numpy.arange(4)) & 1).astype(numpy.float32)
+
+class ObservationEncoder():
+    """Writes the game state into a preallocated float32 array, without drawing anything"""
+
+    # False when NumPy isn't installed
+    available = numpy is not None
+
+    def __init__(self, tile_map, blob_count=8, grid_rows=None):
+        """grid_rows is the number of block rows in the occupancy grid, all of them by default"""
+        self.tile_map = tile_map
+        self.settings = tile_map.settings
+        self.blob_count = blob_count
+        self.grid_rows = grid_rows if grid_rows is not None else tile_map.get_block_row_count()
+
+        row_size = self.settings.map_playable_width * 4
+        self.player_slice = slice(0, PLAYER_FEATURES)
+        self.blob_slice = slice(self.player_slice.stop, self.player_slice.stop + blob_count * BLOB_FEATURES)
+        self.timer_index = self.blob_slice.stop
+        self.grid_offset_index = self.timer_index + 1
+        self.grid_slice = slice(self.grid_offset_index + 1, self.grid_offset_index + 1 + self.grid_rows * row_size)
+        self.size = self.grid_slice.stop
+        self.buffer = numpy.zeros(self.size, dtype=numpy.float32)
+        self.empty_row = bytes(self.settings.map_playable_width)
+
+    def encode(self, out=None):
+        """Write the observation of the current state to out (a float32 array of size values),
+        or to the encoder's own buffer.  Returns the array written to"""
+        if out is None:
+            out = self.buffer
+        tile_map = self.tile_map
+        settings = self.settings
+        player = tile_map.player
+        tile_width = settings.tile_width
+        tile_height = settings.tile_height
+        walk_speed = settings.player_dx
+        jump_speed = -settings.player_jump_velocity
+        bounds = tile_map.player_bounds_rect
+
+        out[self.player_slice] = ((player.rect.left - bounds.left) / tile_width, (player.rect.top - bounds.top) / tile_height,
+            player.rect.width / tile_width, player.rect.height / tile_height, player.dx / walk_speed, player.dy / jump_speed,
+            player.falling, player.air_jumps, player.facing_left, player.dying)
+
+        blobs = [((enemy.rect.centerx - player.rect.centerx) / tile_width, (enemy.rect.bottom - player.rect.bottom) / tile_height,
+            enemy.dx / walk_speed, enemy.dy / jump_speed, enemy.dying) for enemy in tile_map.enemies]
+        blobs.sort(key=lambda blob: blob[0] * blob[0] + blob[1] * blob[1])
+        blob_values = out[self.blob_slice].reshape(self.blob_count, BLOB_FEATURES)
+        blob_values[:] = 0
+        for index, blob in enumerate(blobs[:self.blob_count]):
+            blob_values[index] = (1.0,) + blob
+
+        out[self.timer_index] = tile_map.level_timer.elapsed_time_ms / 1000
+
+        # The grid is centered on the row under the player, kept inside the rows there are
+        floor_height = tile_height * FLOOR_ROWS
+        first_top = bounds.top + tile_height * 2
+        player_row = (player.rect.bottom - first_top + floor_height // 2) // floor_height
+        row_count = len(tile_map.block_rows)
+        first_row = max(0, min(player_row - self.grid_rows // 2, row_count - self.grid_rows))
+        out[self.grid_offset_index] = first_row - player_row
+        cells = b''.join([tile_map.get_block_row_cells(row) if row < row_count else self.empty_row
+            for row in range(first_row, first_row + self.grid_rows)])
+        numpy.take(NIBBLE_VALUES, numpy.frombuffer(cells, dtype=numpy.uint8), axis=0,
+            out=out[self.grid_slice].reshape(-1, 4))
+        return out
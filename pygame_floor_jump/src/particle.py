@@ -5,9 +5,9 @@
 # Класс Particle имеет несколько методов, 
 # которые определяют его поведение и внешний вид на экране:
 
-# __init__(self, screen, settings, x, y, dx, dy, width, color): 
+# __init__(self, generator, x, y, dx, dy, width, color): 
 #     метод конструктора класса Particle, который принимает несколько аргументов, 
-#     включая экранный объект для рисования, настройки системы частиц,
+#     включая генератор-владелец (через него доступны экран и настройки),
 #     начальное положение и скорость частицы, его ширина и цвет.
 # update(self): Этот метод обновляет скорость и положение частицы на основе физики системы. 
 #     Он обновляет координаты x и y частицы на основе ее текущей скорости, 
@@ -29,31 +29,35 @@ import pygame
 
 class Particle():
     """A single particle object which is owned by the generator"""
-    def __init__(self, screen, settings, x, y, dx, dy, width, color):
+
+    # Thousands of these can be alive, so keep them compact.  The screen and settings
+    # are shared through the owning generator instead of being copied to each particle
+    __slots__ = ('generator', 'x', 'y', 'dx', 'dy', 'width', 'color')
+
+    def __init__(self, generator, x, y, dx, dy, width, color):
         """Save the initial state"""
+        self.generator = generator
         self.x = x
         self.y = y
         self.dx = dx
         self.dy = dy
         self.color = color
-        self.screen = screen
-        self.screen_rect = self.screen.get_rect()
-        self.settings = settings
         self.width = width
 
     def update(self):
         """Update the particle's velocity and position"""
+        settings = self.generator.settings
         self.x += self.dx
-        self.dy += self.settings.gravity
-        if self.dy > self.settings.terminal_velocity:
-            self.dy = self.settings.terminal_velocity
+        self.dy += settings.gravity
+        if self.dy > settings.terminal_velocity:
+            self.dy = settings.terminal_velocity
         self.y += self.dy
 
     def alive(self):
         """Once the particle has left the screen, it's not useful, so consider it dead"""
-        return self.y <= self.screen_rect.bottom
+        return self.y <= self.generator.screen_rect.bottom
 
-    def draw(self):
-        """Draw the particle at its current location"""
+    def draw(self, y_offset):
+        """Draw the particle at its current location, y_offset moves it to screen coordinates"""
         # We're not a sprite, so just draw a simple filled rect
-        pygame.draw.rect(self.screen, self.color, (self.x, self.y, self.width, self.width))
\ No newline at end of file
+        pygame.draw.rect(self.generator.screen, self.color, (self.x, self.y + y_offset, self.width, self.width))
\ No newline at end of file
@@ -31,6 +31,12 @@
 
 from src.particle import Particle
 import random
+import struct
+
+# active, active_frames, frames_to_generate, particle count
+GENERATOR_STATE_FORMAT = struct.Struct('<BIII')
+# x, y, dx, dy, width, color
+PARTICLE_STATE_FORMAT = struct.Struct('<ddddBBBB')
 
 class ParticleGenerator():
     """The ParticleGenerator class is responsible for creating and tracking Particle
@@ -80,11 +86,11 @@ class ParticleGenerator():
                 self.stop()
 
         # For any particles still alive, we need to update them, even if the 
-        # generator is stopped.  Once a particle is 'dead', remove it
+        # generator is stopped.  Once a particle is 'dead', remove it - the list is
+        # rebuilt rather than removing while iterating, which would skip particles
         for particle in self.particles:
             particle.update()
-            if not particle.alive():
-                self.particles.remove(particle)
+        self.particles = [particle for particle in self.particles if particle.alive()]
 
     def generate_particles(self, number_of_new_particles):
         """Create a new particle at the generator's location and give it an initial velocity"""
@@ -103,14 +109,33 @@ class ParticleGenerator():
         # Callback or not, at this point we should have a list of particle data
         for particle_info in particle_data:
             # Create a new particle object
-            new_particle = Particle(self.screen, self.settings, self.x, self.y, particle_info[0], particle_info[1], random.randint(1, 4), particle_info[2])
+            new_particle = Particle(self, self.x, self.y, particle_info[0], particle_info[1], random.randint(1, 4), particle_info[2])
             
             # Add it to the list to track/draw
             self.particles.append(new_particle)
 
-    def draw(self):
-        """Draw all of the particles"""
+    def write_state(self, writer):
+        """Save the generation state and every live particle"""
+        writer.write(GENERATOR_STATE_FORMAT, self.active, self.active_frames, self.frames_to_generate, len(self.particles))
+        for particle in self.particles:
+            writer.write(PARTICLE_STATE_FORMAT, particle.x, particle.y, particle.dx, particle.dy, particle.width, *particle.color)
+
+    def read_state(self, reader):
+        """Load the state saved by write_state"""
+        active, self.active_frames, self.frames_to_generate, count = reader.read(GENERATOR_STATE_FORMAT)
+        self.active = bool(active)
+        self.particles = []
+        for index in range(0, count):
+            x, y, dx, dy, width, red, green, blue = reader.read(PARTICLE_STATE_FORMAT)
+            self.particles.append(Particle(self, x, y, dx, dy, width, (red, green, blue)))
+
+    def draw(self, camera):
+        """Draw all of the particles that are in view"""
         # Since the are not pygame.sprites, can't just use the Group as with the blobs
         # Just another way to do things
+        y_offset = camera.get_y_offset()
+        view_top = camera.rect.top
+        view_bottom = camera.rect.bottom
         for particle in self.particles:
-            particle.draw()
+            if view_top - particle.width < particle.y < view_bottom:
+                particle.draw(y_offset)
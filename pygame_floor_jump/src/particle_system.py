@@ -0,0 +1,232 @@
+"""Array backed particle system for Floor-jumper"""
+# Этот код определяет класс ParticleSystem - замену ParticleGenerator,
+# которая хранит частицы не в виде отдельных объектов Particle,
+# а в массивах NumPy фиксированной емкости (x, y, dx, dy, размер, цвет).
+
+# Интерфейс совпадает с ParticleGenerator: start(), stop(), update(), draw()
+# и необязательный обратный вызов, который возвращает список (dx, dy, цвет).
+
+# update() обновляет все частицы сразу (векторно) с учетом гравитации и
+# предельной скорости. Мертвые частицы удаляются перестановкой с конца массива
+# (swap-remove), поэтому живые частицы всегда занимают первые count элементов.
+
+# draw() рисует все частицы за один проход: записью в представление surfarray
+# экрана, либо (если формат экрана не подходит) пакетными вызовами fill().
+
+# NumPy не является обязательной зависимостью игры: если он не установлен,
+# ParticleSystem.available равно False и используется ParticleGenerator.
+
+import random
+import pygame
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# active, active_frames, frames_to_generate, particle count
+SYSTEM_STATE_FORMAT = struct.Struct('<BIII')
+
+class ParticleSystem():
+    """Tracks particles in fixed capacity NumPy arrays instead of a list of Particle objects.
+    This is a drop-in replacement for the ParticleGenerator, including the callback"""
+
+    # False when NumPy isn't installed, callers should use the ParticleGenerator instead
+    available = numpy is not None
+
+    def __init__(self, screen, settings, color, x, y, generator_callback=None):
+        """Init the position, color and the particle arrays"""
+        self.screen = screen
+        self.screen_rect = self.screen.get_rect()
+        self.settings = settings
+        self.x = x
+        self.y = y
+        self.color = color
+        self.active = False
+        self.active_frames = 0
+        self.frames_to_generate = 0
+        self.callback = generator_callback
+
+        # Live particles always occupy the first 'count' slots of each array
+        self.capacity = settings.particle_system_capacity
+        self.count = 0
+        self.pos_x = numpy.zeros(self.capacity, dtype=numpy.float64)
+        self.pos_y = numpy.zeros(self.capacity, dtype=numpy.float64)
+        self.vel_x = numpy.zeros(self.capacity, dtype=numpy.float64)
+        self.vel_y = numpy.zeros(self.capacity, dtype=numpy.float64)
+        self.size = numpy.zeros(self.capacity, dtype=numpy.int32)
+        # Colors are stored already mapped to the screen's pixel format
+        self.mapped_color = numpy.zeros(self.capacity, dtype=numpy.uint32)
+        self.mapped_colors = {}
+
+        # Particles that didn't fit in the arrays
+        self.dropped = 0
+
+    def start(self, frames_to_generate):
+        """Tells the generator to start generating particles"""
+        self.active = True
+        self.active_frames = 0
+        self.frames_to_generate = frames_to_generate
+
+    def stop(self):
+        """Tells the generator to stop generating particles"""
+        self.active = False
+        self.active_frames = 0
+        # start() dictates the duration
+        self.frames_to_generate = 0
+
+    def clear(self):
+        """Remove every particle"""
+        self.count = 0
+
+    def map_color(self, color):
+        """Convert an RGB color to the screen's pixel format, cached since there are only a few colors"""
+        mapped = self.mapped_colors.get(color)
+        if mapped is None:
+            # map_rgb is signed when the format has an alpha channel in the top byte
+            mapped = self.screen.map_rgb(color) & 0xFFFFFFFF
+            self.mapped_colors[color] = mapped
+        return mapped
+
+    def update(self):
+        """Update the position of all alive particles"""
+        # As with the ParticleGenerator, 'active' only controls the generation,
+        # particles in flight always finish out their lives
+        if self.active:
+            self.generate_particles(self.settings.particle_gen_per_frame)
+            self.active_frames += 1
+            if self.active_frames > self.frames_to_generate:
+                self.stop()
+
+        count = self.count
+        if count == 0:
+            return
+
+        # Same physics as Particle.update, just for every particle at once
+        pos_x = self.pos_x[:count]
+        pos_y = self.pos_y[:count]
+        vel_y = self.vel_y[:count]
+        pos_x += self.vel_x[:count]
+        vel_y += self.settings.gravity
+        numpy.minimum(vel_y, self.settings.terminal_velocity, out=vel_y)
+        pos_y += vel_y
+
+        # Once a particle has left the screen it's dead
+        dead = numpy.flatnonzero(pos_y > self.screen_rect.bottom)
+        if dead.size:
+            self.remove_particles(dead)
+
+    def remove_particles(self, dead):
+        """Swap-remove the particles at the (sorted) dead indices, the live ones from the end fill the holes"""
+        new_count = self.count - dead.size
+        # Holes below the new count need filling, live particles above it are moved down
+        holes = dead[dead < new_count]
+        if holes.size:
+            tail_alive = numpy.ones(self.count - new_count, dtype=bool)
+            tail_alive[dead[dead >= new_count] - new_count] = False
+            sources = numpy.flatnonzero(tail_alive) + new_count
+            for array in (self.pos_x, self.pos_y, self.vel_x, self.vel_y, self.size, self.mapped_color):
+                array[holes] = array[sources]
+
+        self.count = new_count
+
+    def generate_particles(self, number_of_new_particles):
+        """Create new particles at the generator's location and give them an initial velocity"""
+        if self.callback:
+            # We have a callback, so delegate all of the work....
+            particle_data = self.callback()
+        else:
+            # No callback, so make some random ones by default (same as the ParticleGenerator)
+            particle_data = []
+            for particle_index in range(0, number_of_new_particles):
+                new_data = (random.randint(-2, 2), random.randint(5, 20) * -1, (random.randint(0,255), random.randint(0,255), random.randint(0,255)))
+                particle_data.append(new_data)
+
+        # Fill the free slots, anything past the capacity is dropped
+        start = self.count
+        for particle_info in particle_data:
+            # Still roll the size so the random sequence matches the ParticleGenerator
+            size = random.randint(1, 4)
+            if self.count >= self.capacity:
+                self.dropped += 1
+                continue
+            index = self.count
+            self.vel_x[index] = particle_info[0]
+            self.vel_y[index] = particle_info[1]
+            self.size[index] = size
+            self.mapped_color[index] = self.map_color(particle_info[2])
+            self.count += 1
+
+        self.pos_x[start:self.count] = self.x
+        self.pos_y[start:self.count] = self.y
+
+    def get_arrays(self):
+        """Every per-particle array, in a fixed order"""
+        return (self.pos_x, self.pos_y, self.vel_x, self.vel_y, self.size, self.mapped_color)
+
+    def write_state(self, writer):
+        """Save the generation state and the live part of each array, the colors stay mapped to the screen format"""
+        count = self.count
+        writer.write(SYSTEM_STATE_FORMAT, self.active, self.active_frames, self.frames_to_generate, count)
+        for array in self.get_arrays():
+            writer.write_bytes(array[:count].tobytes())
+
+    def read_state(self, reader):
+        """Load the state saved by write_state"""
+        active, self.active_frames, self.frames_to_generate, count = reader.read(SYSTEM_STATE_FORMAT)
+        if count > self.capacity:
+            raise ValueError("Snapshot has {} particles, the capacity is {}".format(count, self.capacity))
+        self.active = bool(active)
+        self.count = count
+        for array in self.get_arrays():
+            array[:count] = numpy.frombuffer(reader.read_bytes(), dtype=array.dtype)
+
+    def draw(self, camera):
+        """Draw all of the particles in one pass, the ones out of view are clipped"""
+        if self.count == 0:
+            return
+
+        # surfarray can only give a 2D pixel view of 8, 16 and 32 bit surfaces
+        if self.screen.get_bytesize() == 3:
+            self.draw_filled(camera)
+        else:
+            self.draw_pixels(camera.get_y_offset())
+
+    def draw_pixels(self, y_offset):
+        """Write every particle straight into a pixel view of the screen"""
+        count = self.count
+        pixel_x = self.pos_x[:count].astype(numpy.int32)
+        pixel_y = (self.pos_y[:count] + y_offset).astype(numpy.int32)
+        sizes = self.size[:count]
+        colors = self.mapped_color[:count]
+        width = self.screen_rect.width
+        height = self.screen_rect.height
+
+        # The view locks the screen until it's deleted below
+        pixels = pygame.surfarray.pixels2d(self.screen)
+
+        # A particle is a size x size square, so stamp each pixel offset of the
+        # square for all particles big enough to cover it
+        covers = [sizes > offset for offset in range(0, 4)]
+        for offset_y in range(0, 4):
+            for offset_x in range(0, 4):
+                covered = covers[max(offset_x, offset_y)]
+                x = pixel_x[covered] + offset_x
+                y = pixel_y[covered] + offset_y
+                on_screen = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+                pixels[x[on_screen], y[on_screen]] = colors[covered][on_screen]
+
+        del pixels
+
+    def draw_filled(self, camera):
+        """Draw every particle in view with a filled rect, used when a pixel view isn't available"""
+        count = self.count
+        fill = self.screen.fill
+        y_offset = camera.get_y_offset()
+        view_top = camera.rect.top
+        view_bottom = camera.rect.bottom
+        for x, y, size, color in zip(self.pos_x[:count].tolist(), self.pos_y[:count].tolist(),
+                self.size[:count].tolist(), self.mapped_color[:count].tolist()):
+            if view_top - size < y < view_bottom:
+                fill(color, (x, y + y_offset, size, size))
@@ -4,14 +4,17 @@
 # Объект Player - это спрайтовый объект, представляющий главного героя игры.
 
 # Конструктор проигрывателя инициализирует объект несколькими атрибутами, 
-# такими как настройки, экран, изображения, initial_bounding_rect и tile_map. 
+# такими как общие ресурсы (настройки, экран, изображения), initial_bounding_rect и tile_map. 
 # Он вызывает конструктор AnimatedSprite, используя метод super().
 
+# Таблица анимаций игрока строится функцией create_player_animations(), ее же использует
+# LevelValidator, чтобы найти кадры прыжка.
+
 # Класс Player имеет несколько других методов, таких как reset(),
 # который сбрасывает объект Player для карты, update_current_animation(), 
-# который устанавливает правильную анимацию на основе состояния игрока, и collided(), 
-# который является обратным вызовом, используемым для изменения базовой 
-# проверки столкновения для спрайта player.
+# который устанавливает правильную анимацию на основе состояния игрока, и hit_by_enemy(), 
+# который проверяет столкновение игрока с врагами по заранее вычисленным хитбоксам 
+# и маскам кадров.
 
 # Метод update() обновляет позицию спрайта игрока. 
 # Он проверяет, находится ли игрок в верхнем ряду, 
@@ -25,18 +28,41 @@
 # анимации игрока. Поведение объекта Player можно изменить, изменив значения его атрибутов.
 
 
-from src.animation import Animation
+from src.animation import create_animation_table
 from src.animated_sprite import AnimatedSprite
 from src.time_bonus import TimeBonus
-import pygame
+import struct
+
+# air_jumps, idle_top, idle_counter, won_level, at_top
+PLAYER_STATE_FORMAT = struct.Struct('<BBiBB')
+
+def create_player_animations(settings):
+    """The player's animation table, also used by the level validator to find the jump frames"""
+    return create_animation_table(settings.anim_id_count, {
+        settings.anim_id_idle_left: ([0, 1, 2, 3, 2, 1], 5),
+        settings.anim_id_idle_right: ([5, 6, 7, 8, 7, 6], 5),
+        settings.anim_id_walk_left: ([0, 10, 11, 10], 2),
+        settings.anim_id_walk_right: ([5, 12, 13, 12], 2),
+        settings.anim_id_jump_up_left: ([15], 5),
+        settings.anim_id_jump_down_left: ([16], 5),
+        settings.anim_id_jump_up_right: ([17], 5),
+        settings.anim_id_jump_down_right: ([18], 5),
+        settings.anim_id_dead: ([4], 5)})
 
 class Player(AnimatedSprite):
     """Player object"""
 
-    def __init__(self, settings, screen, images, initial_bounding_rect, tile_map):
+    __slots__ = ('tile_map', 'initial_bounding_rect', 'air_jumps', 'max_air_jumps', 'idle_top', 'idle_counter',
+        'won_level', 'at_top', 'enemies')
+
+    # Animation table shared by all players, built by the first one created
+    shared_animations = None
+
+    def __init__(self, resources, initial_bounding_rect, tile_map):
         """Initialize the player sprite"""
         # Calls AnimatedSprite, which in turn will call pygame.Sprite __init_()
-        super().__init__(settings, screen, images)
+        super().__init__(resources)
+        settings = resources.settings
 
         self.tile_map = tile_map
 
@@ -50,9 +76,6 @@ class Player(AnimatedSprite):
         self.margin_right = self.settings.player_sprite_horz_margin
         self.margin_top = self.settings.player_sprite_top_margin
 
-        # set the optional collision check callback
-        self.collision_check = self.collided
-
         # These are specific to the player object
         self.air_jumps = 0
         self.max_air_jumps = settings.player_max_air_jumps
@@ -60,18 +83,13 @@ class Player(AnimatedSprite):
         self.idle_counter = 0
         self.won_level = False
         self.at_top = False
+        self.enemies = None
 
-        # Add the animations for the player
-        self.animations[self.settings.anim_name_idle_left] = Animation([0, 1, 2, 3, 2, 1], 5)
-        self.animations[self.settings.anim_name_idle_right] = Animation([5, 6, 7, 8, 7, 6], 5)
-        self.animations[self.settings.anim_name_walk_left] = Animation([0, 10, 11, 10], 2)
-        self.animations[self.settings.anim_name_walk_right] = Animation([5, 12, 13, 12], 2)
-        self.animations[self.settings.anim_name_jump_up_left] = Animation([15], 5)
-        self.animations[self.settings.anim_name_jump_down_left] = Animation([16], 5)
-        self.animations[self.settings.anim_name_jump_up_right] = Animation([17], 5)
-        self.animations[self.settings.anim_name_jump_down_right] = Animation([18], 5)
-        self.animations[self.settings.anim_name_dead] = Animation([4], 5)
-        self.current_animation = self.settings.anim_name_idle_left
+        # The animation definitions are shared by every player, only the cursor is per-sprite
+        if Player.shared_animations is None:
+            Player.shared_animations = create_player_animations(settings)
+        self.animations = Player.shared_animations
+        self.current_animation = self.settings.anim_id_idle_left
         self.facing_left = True
 
     def reset(self):
@@ -86,50 +104,59 @@ class Player(AnimatedSprite):
         player.won_level = False
         player.at_top = False
 
+    def write_state(self, writer):
+        """Save the sprite state and the player's own flags"""
+        super().write_state(writer)
+        writer.write(PLAYER_STATE_FORMAT, self.air_jumps, self.idle_top, self.idle_counter, self.won_level, self.at_top)
+
+    def read_state(self, reader):
+        """Load the state saved by write_state"""
+        super().read_state(reader)
+        self.air_jumps, idle_top, self.idle_counter, won_level, at_top = reader.read(PLAYER_STATE_FORMAT)
+        self.idle_top = bool(idle_top)
+        self.won_level = bool(won_level)
+        self.at_top = bool(at_top)
+
     def update_current_animation(self):
         """Set the correct animation based on state"""
         # DEAD
         if self.idle_top:
-            self.set_current_animation(self.settings.anim_name_idle_left)
+            self.set_current_animation(self.settings.anim_id_idle_left)
         elif self.dying:
-            self.set_current_animation(self.settings.anim_name_dead)
+            self.set_current_animation(self.settings.anim_id_dead)
         # IDLE
         elif self.dx == 0 and self.dy == 0:
             if self.facing_left:
-                self.set_current_animation(self.settings.anim_name_idle_left)
+                self.set_current_animation(self.settings.anim_id_idle_left)
             else:
-                self.set_current_animation(self.settings.anim_name_idle_right)
+                self.set_current_animation(self.settings.anim_id_idle_right)
         # WALKING
         elif self.dy == 0:
             if self.dx < 0:
-                self.set_current_animation(self.settings.anim_name_walk_left)
+                self.set_current_animation(self.settings.anim_id_walk_left)
             else:
-                self.set_current_animation(self.settings.anim_name_walk_right)
+                self.set_current_animation(self.settings.anim_id_walk_right)
         # JUMPING
         else:
             if self.dy < 0:
                 if self.facing_left:
-                    self.set_current_animation(self.settings.anim_name_jump_up_left)
+                    self.set_current_animation(self.settings.anim_id_jump_up_left)
                 else:
-                    self.set_current_animation(self.settings.anim_name_jump_up_right)
+                    self.set_current_animation(self.settings.anim_id_jump_up_right)
             else:
                 if self.facing_left:
-                    self.set_current_animation(self.settings.anim_name_jump_down_left)
+                    self.set_current_animation(self.settings.anim_id_jump_down_left)
                 else:
-                    self.set_current_animation(self.settings.anim_name_jump_down_right)
-
-    def collided(self, player, sprite):
-        """This callback is used to modify the basic collision check for the player sprite"""
-        if sprite.dying:
-            return False
-        
-        player_rect = player.rect.copy()
-        # shrink the player rect based on the margins
-        player_rect.height -= player.settings.player_sprite_top_margin
-        player_rect.width -= (player.settings.player_sprite_horz_margin * 2)
-        player_rect.midbottom = player.rect.midbottom
-        # Now do a standard check with the adjusted Rect
-        return player_rect.colliderect(sprite.rect)
+                    self.set_current_animation(self.settings.anim_id_jump_down_right)
+
+    def hit_by_enemy(self, enemies):
+        """Check for a live enemy touching the player, hitboxes first, then pixel accurate"""
+        colliderect = self.get_hitbox().colliderect
+        for enemy in enemies:
+            if not enemy.dying and colliderect(enemy.get_hitbox()) and self.collide_mask(enemy):
+                return True
+
+        return False
 
     def update(self, tile_map, enemies):
         """Updates the player sprite's position"""
@@ -148,21 +175,20 @@ class Player(AnimatedSprite):
                     self.air_jumps = 0
 
                 # The player needs to also check against the group of enemy sprites
-                intersected_blobs = pygame.sprite.spritecollide(self, enemies, False, self.collision_check)
-                if intersected_blobs:
+                if self.hit_by_enemy(enemies):
                     self.dying = True
                     self.dy = -15
                     self.falling = True
                     self.falling_frames = 1
                     
-                player_idle = ((self.current_animation == self.settings.anim_name_idle_left) or (self.current_animation == self.settings.anim_name_idle_right))
-                player_walking = ((self.current_animation == self.settings.anim_name_walk_left) or (self.current_animation == self.settings.anim_name_walk_right))
-                if (self.rect.bottom <= tile_map.player_bounds_rect.top + 2 * self.settings.tile_height) and (player_idle or player_walking):
+                # The idle and walking ids are contiguous, so this is a simple range check on the id
+                player_idle_or_walking = self.settings.anim_id_idle_left <= self.current_animation <= self.settings.anim_id_walk_right
+                if (self.rect.bottom <= tile_map.player_bounds_rect.top + 2 * self.settings.tile_height) and player_idle_or_walking:
                     self.idle_top = True
                     self.at_top = True
                     self.idle_counter = 0
         else:
-            if self.rect.top > self.screen_rect.bottom:
+            if self.rect.top > tile_map.map_rect.bottom:
                 # For now, just reset the player position, but nothing else
                 self.rect.bottom = tile_map.player_bounds_rect.bottom
                 self.dx = 0.0
@@ -196,9 +222,12 @@ class Player(AnimatedSprite):
             elif self.dy < 0:
                 if self.rect.bottom > block.rect.bottom:
                     self.dy = 0
-                    self.rect.top = block.rect.bottom - self.settings.player_sprite_top_margin
-                    # remove blocks struck from the bottom
-                    group.remove(collision_list)
+                    # Move the head (the top of the frame's hitbox) to just below the block
+                    self.rect.y += block.rect.bottom - self.get_hitbox().top
+                    # remove blocks struck from the bottom, from every group (the map keeps one per row too)
+                    for struck_block in collision_list:
+                        struck_block.kill()
+                    self.tile_map.blocks_removed += len(collision_list)
 
                     # remove enemies above those blocks
                     self.remove_enemies_above_blocks(collision_list)
@@ -207,11 +236,12 @@ class Player(AnimatedSprite):
             elif self.dx > 0:
                 if side_collision:
                     self.dx = 0
-                    self.rect.right = block.rect.left + self.settings.player_sprite_horz_margin
+                    # The clamps use the frame's hitbox, the one the collision was found with
+                    self.rect.x += block.rect.left - self.get_hitbox().right
             elif self.dx < 0:
                 if side_collision:
                     self.dx = 0
-                    self.rect.left = block.rect.right - self.settings.player_sprite_horz_margin
+                    self.rect.x += block.rect.right - self.get_hitbox().left
 
     def remove_enemies_above_blocks(self, collision_list):
         # build a kill rect to check against the enemies
@@ -225,6 +255,8 @@ class Player(AnimatedSprite):
         # Now see if any enemies are in this block
         for enemy in self.enemies:
             if kill_rect.colliderect(enemy.rect):
+                if not enemy.dying:
+                    self.tile_map.kills += 1
                 enemy.dying = True
                 enemy.dy = self.settings.enemy_death_dy
                 bonus = TimeBonus(enemy.rect, "-0.5 seconds", 500, self.tile_map.level_timer, self.settings.bonus_font)
@@ -0,0 +1,168 @@
+"""This module implements the replay file format for Floor-jumper"""
+# Этот код определяет формат файла повтора (replay) и классы ReplayWriter и ReplayReader.
+
+# Игра полностью детерминирована: состояние в следующем кадре зависит только от текущего
+# состояния (Tilemap.snapshot, включая random) и ввода игрока за кадр (маска INPUT_* из
+# game_functions). Поэтому повтор хранит не кадры, а:
+#     - ключевой кадр (keyframe) - снимок состояния каждые keyframe_interval кадров,
+#     - по одному байту маски ввода на каждый кадр.
+# Маска не хранит порядок нажатий внутри кадра: gf.check_events оставляет в ней только нажатия
+# после последнего отпускания, а gf.apply_input применяет отпускания раньше нажатий. Движение
+# от этого не меняется, но если клавишу направления нажали и отпустили в одном кадре, игрок
+# не поворачивается в ее сторону, как было бы при обработке событий по порядку.
+# Ключевой кадр и маски до следующего ключевого кадра образуют сегмент, который сжимается zlib.
+
+# Файл:
+#     заголовок: магическое число, версия, интервал ключевых кадров
+#     сегменты:  zlib(длина снимка, снимок, маски ввода)
+#     индекс:    для каждого сегмента - первый кадр, число кадров, смещение и длина в файле
+#     окончание: смещение индекса, число сегментов, магическое число индекса
+# Индекс пишется в конце, поэтому запись идет потоком и ничего не держится в памяти,
+# кроме текущего сегмента.
+
+# ReplayReader читает файл через mmap: индекс не загружается целиком, нужный сегмент находится
+# двоичным поиском прямо в отображенном файле. Чтобы перейти к кадру N (seek), он
+# восстанавливает ближайший ключевой кадр перед N и досчитывает симуляцию вперед,
+# это не больше keyframe_interval обновлений.
+
+import mmap
+import struct
+import zlib
+import src.game_functions as gf
+
+# magic, version, keyframe interval
+REPLAY_HEADER_FORMAT = struct.Struct('<4sHH')
+# first frame, frame count, file offset, compressed length
+REPLAY_INDEX_FORMAT = struct.Struct('<IIQI')
+# index offset, segment count, magic
+REPLAY_FOOTER_FORMAT = struct.Struct('<QI4s')
+# snapshot length, at the start of each (uncompressed) segment
+SEGMENT_PREFIX_FORMAT = struct.Struct('<I')
+REPLAY_MAGIC = b'FJRP'
+REPLAY_INDEX_MAGIC = b'FJRI'
+REPLAY_VERSION = 2
+
+class ReplayWriter():
+    """Records a game as keyframes and per-frame inputs"""
+
+    def __init__(self, path, keyframe_interval):
+        """Start the file, nothing else is written until the first segment is full"""
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.replay_file = open(path, 'wb')
+        self.replay_file.write(REPLAY_HEADER_FORMAT.pack(REPLAY_MAGIC, REPLAY_VERSION, keyframe_interval))
+        # The segment being recorded
+        self.first_frame = 0
+        self.keyframe = None
+        self.inputs = bytearray()
+        # (first frame, frame count, offset, length) of each segment written
+        self.index = []
+
+    def record_frame(self, tile_map, input_mask):
+        """Call once a frame, before the input is applied and the map updated"""
+        frame = tile_map.sim_clock.frame
+        # A new segment every keyframe_interval frames, or if frames were skipped
+        if (self.keyframe is None or len(self.inputs) >= self.keyframe_interval
+                or frame != self.first_frame + len(self.inputs)):
+            self.write_segment()
+            self.first_frame = frame
+            self.keyframe = tile_map.snapshot()
+        self.inputs.append(input_mask)
+
+    def write_segment(self):
+        """Compress and write the segment being recorded"""
+        if self.keyframe is None:
+            return
+
+        data = zlib.compress(SEGMENT_PREFIX_FORMAT.pack(len(self.keyframe)) + self.keyframe + self.inputs)
+        self.index.append((self.first_frame, len(self.inputs), self.replay_file.tell(), len(data)))
+        self.replay_file.write(data)
+        self.keyframe = None
+        self.inputs = bytearray()
+
+    def close(self):
+        """Write the last segment and the index"""
+        self.write_segment()
+        index_offset = self.replay_file.tell()
+        for entry in self.index:
+            self.replay_file.write(REPLAY_INDEX_FORMAT.pack(*entry))
+        self.replay_file.write(REPLAY_FOOTER_FORMAT.pack(index_offset, len(self.index), REPLAY_INDEX_MAGIC))
+        self.replay_file.close()
+
+class ReplayReader():
+    """Reads a replay through a memory map, segments are only decompressed when needed"""
+
+    def __init__(self, path):
+        """Map the file and check the header and footer"""
+        self.path = path
+        self.replay_file = open(path, 'rb')
+        self.data = mmap.mmap(self.replay_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.keyframe_interval = REPLAY_HEADER_FORMAT.unpack_from(self.data, 0)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            self.close()
+            raise ValueError("{} is not a version {} replay".format(path, REPLAY_VERSION))
+
+        self.index_offset, self.segment_count, index_magic = REPLAY_FOOTER_FORMAT.unpack_from(
+            self.data, len(self.data) - REPLAY_FOOTER_FORMAT.size)
+        if index_magic != REPLAY_INDEX_MAGIC:
+            self.close()
+            raise ValueError("{} has no index, the recording wasn't closed".format(path))
+
+    def close(self):
+        """Unmap and close the file"""
+        self.data.close()
+        self.replay_file.close()
+
+    def get_segment_info(self, segment):
+        """(first frame, frame count, offset, length) of a segment"""
+        return REPLAY_INDEX_FORMAT.unpack_from(self.data, self.index_offset + segment * REPLAY_INDEX_FORMAT.size)
+
+    def get_first_frame(self):
+        """The simulation frame the recording starts at"""
+        return self.get_segment_info(0)[0]
+
+    def get_end_frame(self):
+        """One past the last recorded frame"""
+        first_frame, frame_count, offset, length = self.get_segment_info(self.segment_count - 1)
+        return first_frame + frame_count
+
+    def find_segment(self, frame):
+        """The segment holding the frame, a binary search of the index"""
+        low = 0
+        high = self.segment_count - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.get_segment_info(middle)[0] <= frame:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def read_segment(self, segment):
+        """Returns (first frame, keyframe snapshot, input masks) of a segment"""
+        first_frame, frame_count, offset, length = self.get_segment_info(segment)
+        data = zlib.decompress(self.data[offset:offset + length])
+        keyframe_length, = SEGMENT_PREFIX_FORMAT.unpack_from(data, 0)
+        keyframe_end = SEGMENT_PREFIX_FORMAT.size + keyframe_length
+        return (first_frame, data[SEGMENT_PREFIX_FORMAT.size:keyframe_end], data[keyframe_end:])
+
+    def get_inputs(self):
+        """Yields (frame, input mask) for the whole recording, a segment at a time"""
+        for segment in range(0, self.segment_count):
+            first_frame, keyframe, inputs = self.read_segment(segment)
+            for frame_offset, input_mask in enumerate(inputs):
+                yield (first_frame + frame_offset, input_mask)
+
+    def seek(self, tile_map, frame):
+        """Put the map in the state it had at the start of the frame: restore the keyframe
+        before it and simulate forward from there"""
+        if frame < self.get_first_frame() or frame >= self.get_end_frame():
+            raise ValueError("Frame {} isn't in the replay ({} to {})".format(frame, self.get_first_frame(),
+                self.get_end_frame() - 1))
+
+        first_frame, keyframe, inputs = self.read_segment(self.find_segment(frame))
+        tile_map.restore(keyframe)
+        for input_mask in inputs[:frame - first_frame]:
+            gf.apply_input(tile_map.settings, tile_map.screen, tile_map, input_mask)
+            tile_map.update()
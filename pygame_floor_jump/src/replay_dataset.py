@@ -0,0 +1,176 @@
+"""This module implements the streaming (observation, action) dataset decoded from Floor-jumper replays"""
+# Этот код определяет класс ReplayDataset, который превращает записанные повторы (src/replay.py)
+# в пачки (batches) для обучения агента подражанием (behavior cloning):
+#     наблюдения - символьное состояние игры (ObservationEncoder), массив float32 [B, F],
+#     действия   - записанная маска ввода за кадр (INPUT_* из game_functions), массив uint8 [B].
+
+# Повтор хранит только ключевые кадры и ввод, поэтому состояние каждого кадра получается
+# повторной симуляцией: для сегмента повтора восстанавливается ключевой кадр, затем для каждого
+# кадра сохраняется наблюдение, применяется записанный ввод и вызывается Tilemap.update()
+# (без рисования). Сегменты независимы, поэтому их декодируют рабочие процессы
+# (multiprocessing.Pool, в каждом своя игра без окна, см. src/headless.py). Заранее запрашивается
+# не больше prefetch сегментов, чтобы память не росла, если обучение медленнее декодирования.
+
+# Соседние кадры почти одинаковы, поэтому перед выдачей пачек кадры перемешиваются в буфере
+# ограниченного размера (shuffle_buffer): пачка - случайные строки буфера, освободившиеся
+# места заполняются новыми кадрами. Порядок сегментов тоже перемешивается.
+# Последняя неполная пачка отбрасывается, все пачки одного размера.
+
+# get_stats_text() сообщает число кадров, пачек и скорость (кадров в секунду).
+
+# NumPy не является обязательной зависимостью игры: без него ReplayDataset.available равно False.
+
+import collections
+import itertools
+import multiprocessing
+import time
+# First, it sets up SDL without a window before pygame is imported
+from src.headless import create_headless_game
+import src.game_functions as gf
+from src.observation_encoder import ObservationEncoder
+from src.replay import ReplayReader
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The game a worker process simulates in and its observation encoder, made by init_worker()
+worker_tile_map = None
+worker_encoder = None
+
+def init_worker(setting_overrides):
+    """Pool initializer, each worker process gets its own game without a window"""
+    global worker_tile_map, worker_encoder
+    worker_tile_map = create_headless_game(setting_overrides)
+    worker_encoder = ObservationEncoder(worker_tile_map)
+
+def decode_segment(task):
+    """Re-simulate one replay segment in the worker's game.  task is (path, segment),
+    returns (observations [N, F] float32, actions [N] uint8)"""
+    path, segment = task
+    tile_map = worker_tile_map
+    reader = ReplayReader(path)
+    first_frame, keyframe, inputs = reader.read_segment(segment)
+    reader.close()
+
+    tile_map.restore(keyframe)
+    observations = numpy.empty((len(inputs), worker_encoder.size), dtype=numpy.float32)
+    for frame_offset, input_mask in enumerate(inputs):
+        worker_encoder.encode(observations[frame_offset])
+        gf.apply_input(tile_map.settings, tile_map.screen, tile_map, input_mask)
+        tile_map.update()
+    return (observations, numpy.frombuffer(inputs, dtype=numpy.uint8).copy())
+
+class ReplayDataset():
+    """Yields shuffled fixed-size (observations, actions) batches decoded from replay files"""
+
+    # False when NumPy isn't installed
+    available = numpy is not None
+
+    def __init__(self, paths, batch_size=256, workers=2, prefetch=4, shuffle_buffer=8192, seed=0,
+            setting_overrides=None):
+        """The replays have to be recorded with the same settings, setting_overrides are the
+        Settings attributes that differ from the defaults.  workers=0 decodes in this process"""
+        self.paths = list(paths)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.prefetch = max(1, prefetch)
+        self.shuffle_buffer = max(shuffle_buffer, batch_size)
+        self.rng = numpy.random.default_rng(seed)
+        self.setting_overrides = setting_overrides
+
+        # Statistics
+        self.frames_decoded = 0
+        self.samples = 0
+        self.batches = 0
+        self.start_time = None
+        self.end_time = None
+
+    def get_tasks(self):
+        """(path, segment) of every segment of every replay, in a random order"""
+        tasks = []
+        for path in self.paths:
+            reader = ReplayReader(path)
+            tasks += [(path, segment) for segment in range(0, reader.segment_count)]
+            reader.close()
+        return [tasks[index] for index in self.rng.permutation(len(tasks))]
+
+    def get_segments(self):
+        """Yields the decoded segments, at most prefetch of them are requested ahead"""
+        tasks = self.get_tasks()
+        if self.workers == 0:
+            init_worker(self.setting_overrides)
+            for task in tasks:
+                yield decode_segment(task)
+            return
+
+        with multiprocessing.Pool(self.workers, initializer=init_worker, initargs=(self.setting_overrides,)) as pool:
+            tasks = iter(tasks)
+            pending = collections.deque(pool.apply_async(decode_segment, (task,))
+                for task in itertools.islice(tasks, self.prefetch))
+            while pending:
+                result = pending.popleft().get()
+                task = next(tasks, None)
+                if task is not None:
+                    pending.append(pool.apply_async(decode_segment, (task,)))
+                yield result
+
+    def __iter__(self):
+        """One pass over the replays, yields (observations [B, F] float32, actions [B] uint8)"""
+        self.start_time = time.perf_counter()
+        observations = None
+        actions = numpy.empty(self.shuffle_buffer, dtype=numpy.uint8)
+        count = 0
+        for segment_observations, segment_actions in self.get_segments():
+            self.frames_decoded += len(segment_actions)
+            if observations is None:
+                observations = numpy.empty((self.shuffle_buffer, segment_observations.shape[1]), dtype=numpy.float32)
+
+            start = 0
+            while start < len(segment_actions):
+                added = min(self.shuffle_buffer - count, len(segment_actions) - start)
+                observations[count:count + added] = segment_observations[start:start + added]
+                actions[count:count + added] = segment_actions[start:start + added]
+                count += added
+                start += added
+                if count == self.shuffle_buffer:
+                    yield self.take_batch(observations, actions, count)
+                    count -= self.batch_size
+
+        # Drain what's left as shuffled full batches
+        if count >= self.batch_size:
+            order = self.rng.permutation(count)
+            for batch_start in range(0, count - self.batch_size + 1, self.batch_size):
+                indices = order[batch_start:batch_start + self.batch_size]
+                yield self.count_batch((observations[indices], actions[indices]))
+        self.end_time = time.perf_counter()
+
+    def take_batch(self, observations, actions, count):
+        """A batch of random rows of the first count rows of the buffer, the rows after it are
+        moved into the holes so the buffer stays packed at count - batch_size rows"""
+        indices = self.rng.choice(count, self.batch_size, replace=False)
+        batch = (observations[indices], actions[indices])
+        end = count - self.batch_size
+        # The rows past the new end that weren't taken fill the holes before it
+        taken = numpy.zeros(self.batch_size, dtype=bool)
+        taken[indices[indices >= end] - end] = True
+        holes = indices[indices < end]
+        kept = end + numpy.flatnonzero(~taken)
+        observations[holes] = observations[kept]
+        actions[holes] = actions[kept]
+        return self.count_batch(batch)
+
+    def count_batch(self, batch):
+        """Update the statistics for a batch about to be yielded"""
+        self.samples += len(batch[1])
+        self.batches += 1
+        return batch
+
+    def get_stats_text(self):
+        """Human readable summary of the decoding speed"""
+        end_time = self.end_time if self.end_time is not None else time.perf_counter()
+        seconds = max(1e-9, end_time - self.start_time) if self.start_time is not None else 0
+        samples_per_second = self.samples / seconds if seconds else 0
+        return "replay dataset: {} frames decoded, {} batches of {}, {:.1f}s, {:.0f} samples/s with {} workers".format(
+            self.frames_decoded, self.batches, self.batch_size, seconds, samples_per_second, self.workers)
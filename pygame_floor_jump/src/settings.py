@@ -8,7 +8,7 @@
 # как screen_width, screen_height, caption (заголовок окна), 
 # bg_color (цвет фона) и полноэкранный режим. 
 # Он также включает в себя настройки шрифта, 
-# настройки спрайтов для игрока и врагов, названия анимации, 
+# настройки спрайтов для игрока и врагов, идентификаторы анимаций, 
 # настройки плитки, настройки карты и настройки генератора частиц.
 
 # Пигмейская игра.модуль freetype импортирован,
@@ -41,6 +41,9 @@ class Settings():
         self.color_key = (255, 0, 255)
         self.fullscreen = False
 
+        # The simulation always advances this much per update, whatever the real frame rate
+        self.simulation_step_ms = 1000 / 30
+
         # quick font
         self.font = pygame.freetype.SysFont(None, 16)
         self.font_color = (255, 255, 255)
@@ -64,17 +67,18 @@ class Settings():
         # transparent pixels to offset for vertical collision (e.g. jumps)
         self.player_sprite_top_margin = 9
 
-        # Animation names
-        self.anim_name_idle_left = 'IDLE.L'
-        self.anim_name_idle_right = 'IDLE.R'
-        self.anim_name_walk_left = 'WALK.L'
-        self.anim_name_walk_right = 'WALK.R'
-        self.anim_name_jump_up_left = 'JUMPUP.L'
-        self.anim_name_jump_down_left = 'JUMPDOWN.L'
-        self.anim_name_jump_up_right = 'JUMPUP.R'
-        self.anim_name_jump_down_right = 'JUMPDOWN.R'
-        self.anim_name_dead = 'DEAD'
-        self.anim_name_exit = 'EXIT'
+        # Animation ids - each sprite type shares one table of animations indexed by these
+        self.anim_id_idle_left = 0
+        self.anim_id_idle_right = 1
+        self.anim_id_walk_left = 2
+        self.anim_id_walk_right = 3
+        self.anim_id_jump_up_left = 4
+        self.anim_id_jump_down_left = 5
+        self.anim_id_jump_up_right = 6
+        self.anim_id_jump_down_right = 7
+        self.anim_id_dead = 8
+        self.anim_id_exit = 9
+        self.anim_id_count = 10
 
         # level digit sizes
         self.digit_width = 36
@@ -106,6 +110,12 @@ class Settings():
         self.enemy_generation_rate = self.enemy_generation_base_rate
         # amount to decrease rate per level
         self.enemy_generation_level_rate = 5
+        # the rate never drops below this, otherwise late levels spawn every frame
+        self.enemy_generation_min_rate = 20
+        # number of blobs preallocated by the pool
+        self.enemy_pool_size = 32
+        # most blobs alive at once, spawns past this are skipped
+        self.enemy_max_live = 32
         
         # Tile settings
         self.tile_width = 24
@@ -117,6 +127,16 @@ class Settings():
         self.particle_gen_dy_range = (5, 20)
         self.particle_gen_max_frames = 40
         self.particle_gen_per_frame = 5
+        # Use the NumPy ParticleSystem when NumPy is installed
+        self.particle_use_numpy = True
+        # Most particles the ParticleSystem tracks at once
+        self.particle_system_capacity = 1024
+        # Play pre-simulated gib animations instead of live particles, bounds the cost on slow hardware
+        self.particle_gen_baked = False
+        # Number of differently seeded baked gib animations
+        self.particle_gen_baked_variants = 3
+        # Most baked bursts playing at once, a new burst replaces the oldest
+        self.particle_gen_baked_max_bursts = 4
         
         # Map settings
         self.map_width = 16
@@ -125,4 +145,25 @@ class Settings():
         self.map_indicies = [-1]
         self.map_number_floors = 8
         self.map_number_subfloors = 1
+        # Map column of the drain in the bottom floor, blobs fall through it
+        self.map_drain_col = 7
+        # The camera scrolls once the player is this far above or below the center of the screen
+        self.camera_dead_zone = self.tile_height * 3
+        # Endless tower mode, the floors are streamed in chunks of chunk_floors as the player climbs
+        self.endless_mode = False
+        self.chunk_floors = 8
+        # Chunks kept loaded above and below the player's chunk
+        self.chunks_ahead = 2
+        self.chunks_behind = 1
+        # Optional level pack made by build_level_pack.py, levels are random without one
+        self.level_pack_file = None
+        # Record the game to this replay file (see src/replay.py), with a full keyframe every so many frames
+        self.replay_record_file = None
+        self.replay_keyframe_interval = 300
+        # Log a telemetry record every frame to this file (see src/telemetry.py), the records are
+        # queued for a writer thread, and dropped if more than telemetry_queue_size are waiting
+        self.telemetry_file = None
+        self.telemetry_queue_size = 4096
+        self.telemetry_batch_size = 256
+        self.telemetry_flush_seconds = 1.0
 
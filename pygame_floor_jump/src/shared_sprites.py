@@ -0,0 +1,87 @@
+"""This module implements the shared memory copy of the Floor-jumper sprite pixels, for many worker processes"""
+# Этот код определяет класс SharedSprites, который кладет пиксели всех кадров, нарезанных
+# ImageResources, в один блок общей памяти (multiprocessing.shared_memory). Рабочие процессы
+# создают ImageResources(settings, shared_sprites) - кадры в них строятся поверх этого блока
+# через pygame.image.frombuffer, и у каждого процесса нет своей копии пикселей: при 64 процессах
+# пиксели хранятся один раз, а не 64.
+
+# В листах спрайтов меньше 256 цветов (в самом пестром - 34), поэтому кадры хранятся
+# в 8-битном виде: индексы в палитру своего листа, по байту на пиксель вместо четырех. Это
+# без потерь - палитра составлена из цветов листа, и такие поверхности рисуются не медленнее
+# обычных (как и запеченные осколки, gib_animation.py). Ключ цвета прозрачности хранится
+# как индекс в палитре.
+
+# Описание блока (имя и таблица кадров: для каждого файла - палитра, индекс ключа цвета и
+# смещения и размеры кадров) передается в рабочие процессы вместе с объектом: при fork он
+# просто наследуется, при spawn SharedMemory сериализуется по имени. Хитбоксы и маски
+# столкновений каждый процесс вычисляет сам из общих кадров.
+
+# Блок создается в родительском процессе из уже загруженных ImageResources и освобождается
+# close() там же, после того как рабочие процессы завершились.
+
+from multiprocessing import resource_tracker, shared_memory
+import pygame
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def get_palette_frames(images):
+    """(palette, colorkey index or -1, [8 bit pixel bytes of each image]) for images sharing one palette"""
+    rgb = [numpy.frombuffer(pygame.image.tobytes(image, 'RGB'), dtype=numpy.uint8).reshape(-1, 3).astype(numpy.uint32)
+        for image in images]
+    packed = [(pixels[:, 0] << 16) | (pixels[:, 1] << 8) | pixels[:, 2] for pixels in rgb]
+    colors = numpy.unique(numpy.concatenate(packed))
+    if len(colors) > 256:
+        raise ValueError("{} colors don't fit in an 8 bit palette".format(len(colors)))
+    palette = [((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF) for color in colors.tolist()]
+
+    colorkey_index = -1
+    colorkey = images[0].get_colorkey()
+    if colorkey is not None and tuple(colorkey[:3]) in palette:
+        colorkey_index = palette.index(tuple(colorkey[:3]))
+    return (palette, colorkey_index, [numpy.searchsorted(colors, pixels).astype(numpy.uint8).tobytes() for pixels in packed])
+
+class SharedSprites():
+    """The frames of an ImageResources as 8 bit pixels in one shared memory block"""
+
+    # False when NumPy isn't installed, it's needed to build the palettes (not to use them)
+    available = numpy is not None
+
+    def __init__(self, image_res):
+        """Copy the frames image_res loaded into a new shared memory block"""
+        # Otherwise each worker starts its own tracker when it opens the block, which unlinks it when the worker exits
+        resource_tracker.ensure_running()
+        self.layout = {}
+        chunks = []
+        offset = 0
+        for file_name, images in image_res.loaded_images.items():
+            palette, colorkey_index, frames = get_palette_frames(images)
+            frame_layout = []
+            for image, pixels in zip(images, frames):
+                frame_layout.append((offset, image.get_width(), image.get_height()))
+                chunks.append(pixels)
+                offset += len(pixels)
+            self.layout[file_name] = (palette, colorkey_index, frame_layout)
+
+        self.memory = shared_memory.SharedMemory(create=True, size=max(1, offset))
+        self.memory.buf[:offset] = b''.join(chunks)
+        self.size = offset
+
+    def get_images(self, file_name):
+        """New surfaces over the shared pixels of the frames loaded from file_name"""
+        palette, colorkey_index, frame_layout = self.layout[file_name]
+        images = []
+        for offset, width, height in frame_layout:
+            image = pygame.image.frombuffer(self.memory.buf[offset:offset + width * height], (width, height), 'P')
+            image.set_palette(palette)
+            if colorkey_index >= 0:
+                image.set_colorkey(colorkey_index)
+            images.append(image)
+        return images
+
+    def close(self):
+        """Free the block, in the process that created it once nothing uses it"""
+        self.memory.close()
+        self.memory.unlink()
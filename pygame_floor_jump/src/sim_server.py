@@ -0,0 +1,404 @@
+"""This module implements the asyncio simulation server that lets remote controllers play Floor-jumper"""
+# Этот код определяет сервер SimulationServer, который держит много игр (сессий) сразу и дает
+# управлять ими по сокету (TCP или Unix) вместо клавиатуры, клиент SimulationClient и
+# генератор нагрузки run_load_test.
+
+# У каждого соединения своя сессия - среда GameEnv (src/game_env.py, по умолчанию с символьным
+# наблюдением), изображения у всех сессий общие. Игра зависит от модуля random, поэтому у каждой
+# сессии свое состояние random: оно подставляется на время каждого ее запроса и сохраняется после,
+# и reset с тем же seed повторяет игру, сколько бы других сессий ни играло между запросами.
+
+# Создание среды занимает около 20 мс, поэтому serve() заранее создает env_pool_size сред, новое
+# соединение берет среду из этого запаса, а закрытое возвращает (следующая сессия все равно
+# начинает с reset). Только если запас кончился, среда создается сразу, останавливая цикл
+# событий. В отдельном потоке среду создавать нельзя: создание тоже тратит общий random.
+
+# Протокол двоичный, каждое сообщение - длина (uint32) и данные:
+#     запрос - код (OP_*), номер запроса (uint32) и аргументы:
+#         OP_RESET   - seed (int64, -1 - без seed), ответ - наблюдение
+#         OP_STEP    - действие (uint8, ACTION_* из game_env), ответ - награда (float32),
+#                      terminated, truncated (uint8), кадр (uint32) и наблюдение
+#         OP_OBSERVE - без аргументов, ответ - текущее наблюдение
+#     ответ  - статус (STATUS_*), номер запроса и данные. При STATUS_ERROR данные - текст ошибки,
+#              при STATUS_BUSY запрос отброшен из-за нагрузки и его можно повторить. Отброшенные
+#              и ошибочные запросы отвечаются сразу, раньше ждущих в очереди, поэтому ответы
+#              сопоставляются с запросами по номеру.
+# Наблюдение - массив наблюдения GameEnv как есть (float32 или uint8, little-endian).
+
+# Запросы не выполняются сразу, а встают в очередь своей сессии. Один раз за проход цикла
+# событий (run_tick, через loop.call_soon) выполняется пачка запросов всех сессий, по одному
+# от каждой сессии по кругу, так что клиент, шлющий много запросов подряд, не задерживает
+# остальных. Если пачка не вместила всех, остаток ждет следующего прохода, а между проходами
+# читаются новые запросы.
+
+# Сброс нагрузки справедливый: у сессии в очереди не больше max_queued запросов, а когда во
+# всех очередях вместе max_pending запросов, отбрасываются только запросы сессий, у которых
+# уже что-то ждет - сессия с пустой очередью обслуживается всегда. Медленный клиент, не
+# читающий ответы, перестает читаться сам (writer.drain).
+
+# run_load_test подключает N клиентов, каждый держит pipeline запросов step в работе, и
+# считает запросы в секунду и процентили задержки. Запуск - sim_server.py в корне.
+
+import asyncio
+import random
+import struct
+import time
+from collections import deque
+from src.game_env import ACTION_COUNT, GameEnv
+
+# Length of the message that follows
+MESSAGE_PREFIX_FORMAT = struct.Struct('<I')
+# Opcode, request id
+REQUEST_HEADER_FORMAT = struct.Struct('<BI')
+# Status, request id
+RESPONSE_HEADER_FORMAT = struct.Struct('<BI')
+# Seed
+RESET_FORMAT = struct.Struct('<q')
+# Action
+STEP_FORMAT = struct.Struct('<B')
+# Reward, terminated, truncated, frame
+STEP_RESULT_FORMAT = struct.Struct('<fBBI')
+# Requests are only a few bytes, anything longer is a broken client
+MAX_REQUEST_SIZE = 1024
+
+OP_RESET = 1
+OP_STEP = 2
+OP_OBSERVE = 3
+
+STATUS_OK = 0
+STATUS_BUSY = 1
+STATUS_ERROR = 2
+
+class ServerError(Exception):
+    """An error response from the server"""
+    pass
+
+class ServerBusy(Exception):
+    """The server shed the request, it can be sent again"""
+    pass
+
+class Session():
+    """One connection's game and its queued requests"""
+
+    __slots__ = ('env', 'writer', 'rng_state', 'observation', 'requests', 'scheduled', 'closed')
+
+    def __init__(self, env, writer):
+        """A session with nothing queued"""
+        self.env = env
+        self.writer = writer
+        # The session's own state of the random module, seeded from the OS until a seeded reset
+        self.rng_state = random.Random().getstate()
+        # Bytes of the last observation sent, None until the first reset
+        self.observation = None
+        # (opcode, request id, body) waiting for a tick
+        self.requests = deque()
+        self.scheduled = False
+        self.closed = False
+
+class SimulationServer():
+    """Hosts a game per connection and runs the queued requests of all of them in batches"""
+
+    def __init__(self, max_sessions=256, batch_size=64, max_queued=4, max_pending=1024, env_pool_size=16, **env_options):
+        """env_options are the GameEnv arguments, symbolic observations by default"""
+        self.max_sessions = max_sessions
+        self.batch_size = batch_size
+        self.max_queued = max_queued
+        self.max_pending = max_pending
+        self.env_pool_size = env_pool_size
+        self.env_options = dict(env_options)
+        self.env_options.setdefault('observation', 'symbolic')
+        self.image_res = None
+        # Games ready for new sessions, made before serving and given back by closed sessions
+        self.env_pool = []
+        self.sessions = set()
+        # Sessions with queued requests, served one request at a time in turn
+        self.ready = deque()
+        self.pending = 0
+        self.tick_scheduled = False
+
+        # Stats
+        self.request_count = 0
+        self.shed_count = 0
+        self.tick_count = 0
+        self.session_count = 0
+        self.env_count = 0
+
+    def create_env(self):
+        """A new game for a session, the images are loaded by the first one and shared"""
+        env = GameEnv(image_res=self.image_res, **self.env_options)
+        self.image_res = env.settings.image_res
+        self.env_count += 1
+        return env
+
+    def fill_env_pool(self):
+        """Create games until env_pool_size are ready, so new connections don't wait for one"""
+        while len(self.env_pool) < self.env_pool_size:
+            self.env_pool.append(self.create_env())
+
+    def take_env(self):
+        """A game for a new session from the pool, only created now (holding up the loop) if the pool is empty"""
+        if self.env_pool:
+            return self.env_pool.pop()
+        return self.create_env()
+
+    async def serve(self, host='127.0.0.1', port=7777, path=None):
+        """Accept connections on a TCP port, or on a Unix socket if path is given, until cancelled"""
+        self.fill_env_pool()
+        if path:
+            server = await asyncio.start_unix_server(self.handle_connection, path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        """Read the requests of one connection into its session until it closes"""
+        if len(self.sessions) >= self.max_sessions:
+            writer.write(encode_message(RESPONSE_HEADER_FORMAT.pack(STATUS_ERROR, 0) + b'Too many sessions'))
+            writer.close()
+            return
+
+        session = Session(self.take_env(), writer)
+        self.sessions.add(session)
+        self.session_count += 1
+        try:
+            while True:
+                size, = MESSAGE_PREFIX_FORMAT.unpack(await reader.readexactly(MESSAGE_PREFIX_FORMAT.size))
+                if size < REQUEST_HEADER_FORMAT.size or size > MAX_REQUEST_SIZE:
+                    break
+                self.submit(session, await reader.readexactly(size))
+                # Stops reading from a client that doesn't read its responses
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            session.closed = True
+            self.sessions.discard(session)
+            # Requests of a closed session are never run, so the game is free for the next one
+            self.env_pool.append(session.env)
+            writer.close()
+
+    def submit(self, session, message):
+        """Queue a request for the next tick, or answer it now if it's shed or broken"""
+        self.request_count += 1
+        opcode, request_id = REQUEST_HEADER_FORMAT.unpack_from(message)
+        body = message[REQUEST_HEADER_FORMAT.size:]
+        expected_size = {OP_RESET: RESET_FORMAT.size, OP_STEP: STEP_FORMAT.size, OP_OBSERVE: 0}.get(opcode)
+        if expected_size is None or len(body) != expected_size:
+            self.respond(session, STATUS_ERROR, request_id, "Bad request {} of {} bytes".format(opcode, len(body)).encode())
+            return
+
+        # A session with nothing queued is always let in, so the busy sessions are the ones shed
+        queued = len(session.requests)
+        if queued >= self.max_queued or (queued and self.pending >= self.max_pending):
+            self.shed_count += 1
+            self.respond(session, STATUS_BUSY, request_id)
+            return
+
+        session.requests.append((opcode, request_id, body))
+        self.pending += 1
+        if not session.scheduled:
+            session.scheduled = True
+            self.ready.append(session)
+        if not self.tick_scheduled:
+            self.tick_scheduled = True
+            asyncio.get_running_loop().call_soon(self.run_tick)
+
+    def run_tick(self):
+        """Run up to batch_size queued requests, one per session in turn"""
+        self.tick_scheduled = False
+        self.tick_count += 1
+        ready = self.ready
+        for index in range(0, self.batch_size):
+            if not ready:
+                break
+            session = ready.popleft()
+            opcode, request_id, body = session.requests.popleft()
+            self.pending -= 1
+            if session.requests:
+                ready.append(session)
+            else:
+                session.scheduled = False
+            if not session.closed:
+                self.run_request(session, opcode, request_id, body)
+
+        # The rest wait for the next tick, after the loop has read what's arrived
+        if ready:
+            self.tick_scheduled = True
+            asyncio.get_running_loop().call_soon(self.run_tick)
+
+    def run_request(self, session, opcode, request_id, body):
+        """Run one request on the session's game, with the session's random state, and send the response"""
+        env = session.env
+        random.setstate(session.rng_state)
+        try:
+            if opcode == OP_RESET:
+                seed, = RESET_FORMAT.unpack(body)
+                observation, info = env.reset(None if seed < 0 else seed)
+                session.observation = observation.tobytes()
+                data = session.observation
+            elif opcode == OP_STEP:
+                action, = STEP_FORMAT.unpack(body)
+                if action >= ACTION_COUNT:
+                    raise ValueError("Unknown action {}".format(action))
+                if session.observation is None:
+                    raise ValueError("Reset the game first")
+                observation, reward, terminated, truncated, info = env.step(action)
+                session.observation = observation.tobytes()
+                data = STEP_RESULT_FORMAT.pack(reward, terminated, truncated, info['frame']) + session.observation
+            else:
+                if session.observation is None:
+                    raise ValueError("Reset the game first")
+                data = session.observation
+        except ValueError as error:
+            self.respond(session, STATUS_ERROR, request_id, str(error).encode())
+            return
+        finally:
+            session.rng_state = random.getstate()
+        self.respond(session, STATUS_OK, request_id, data)
+
+    def respond(self, session, status, request_id, data=b''):
+        """Send a response on the session's connection"""
+        session.writer.write(encode_message(RESPONSE_HEADER_FORMAT.pack(status, request_id) + data))
+
+    def get_stats_text(self):
+        """A summary of the server's work so far"""
+        return "{} sessions on {} games, {} requests in {} ticks ({:.1f} per tick), {} shed ({:.1f}%)".format(
+            self.session_count, self.env_count, self.request_count, self.tick_count,
+            (self.request_count - self.shed_count) / max(1, self.tick_count), self.shed_count,
+            100 * self.shed_count / max(1, self.request_count))
+
+def encode_message(message):
+    """The message with its length in front"""
+    return MESSAGE_PREFIX_FORMAT.pack(len(message)) + message
+
+class SimulationClient():
+    """A connection to a SimulationServer, requests can be pipelined from several tasks"""
+
+    def __init__(self, reader, writer):
+        """Use connect() to make one"""
+        self.reader = reader
+        self.writer = writer
+        self.next_request_id = 0
+        # Future of each request sent by request id, shed requests are answered before the queued ones
+        self.waiting = {}
+        # Why the connection ended, once it has
+        self.error = None
+        self.read_task = asyncio.get_running_loop().create_task(self.read_responses())
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=7777, path=None):
+        """Connect to a server on a TCP port, or on a Unix socket if path is given"""
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def read_responses(self):
+        """Hand each response to the request waiting for it"""
+        try:
+            while True:
+                size, = MESSAGE_PREFIX_FORMAT.unpack(await self.reader.readexactly(MESSAGE_PREFIX_FORMAT.size))
+                message = await self.reader.readexactly(size)
+                status, request_id = RESPONSE_HEADER_FORMAT.unpack_from(message)
+                future = self.waiting.pop(request_id, None)
+                if future is None:
+                    # 'Too many sessions' comes before any request
+                    raise ServerError(message[RESPONSE_HEADER_FORMAT.size:].decode())
+                if not future.done():
+                    future.set_result((status, message[RESPONSE_HEADER_FORMAT.size:]))
+        except ServerError as error:
+            self.error = error
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.error = ConnectionError("Server closed the connection")
+        for future in self.waiting.values():
+            if not future.done():
+                future.set_exception(self.error)
+        self.waiting.clear()
+
+    async def request(self, opcode, body=b''):
+        """Send a request and wait for its data, raises ServerBusy or ServerError if it didn't run"""
+        if self.error:
+            raise self.error
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[self.next_request_id] = future
+        self.writer.write(encode_message(REQUEST_HEADER_FORMAT.pack(opcode, self.next_request_id) + body))
+        self.next_request_id = (self.next_request_id + 1) & 0xFFFFFFFF
+        status, data = await future
+        if status == STATUS_BUSY:
+            raise ServerBusy()
+        if status == STATUS_ERROR:
+            raise ServerError(data.decode())
+        return data
+
+    async def reset(self, seed=None):
+        """Start a new game, returns the observation bytes"""
+        return await self.request(OP_RESET, RESET_FORMAT.pack(-1 if seed is None else seed))
+
+    async def step(self, action):
+        """One frame with the action, returns (reward, terminated, truncated, frame, observation bytes)"""
+        data = await self.request(OP_STEP, STEP_FORMAT.pack(action))
+        return STEP_RESULT_FORMAT.unpack_from(data) + (data[STEP_RESULT_FORMAT.size:],)
+
+    async def observe(self):
+        """The current observation bytes"""
+        return await self.request(OP_OBSERVE)
+
+    async def close(self):
+        """Close the connection"""
+        self.writer.close()
+        await self.read_task
+
+async def reset_until_done(client, seed=None):
+    """Reset, sending it again while it's shed"""
+    while True:
+        try:
+            return await client.reset(seed)
+        except ServerBusy:
+            await asyncio.sleep(0.001)
+
+async def run_load_client(client, index, pipeline, end_time, stats):
+    """Keep pipeline steps in flight on one client until end_time, recording each latency"""
+    rng = random.Random(index)
+    await reset_until_done(client, index)
+
+    async def run_steps():
+        while time.perf_counter() < end_time:
+            start_time = time.perf_counter()
+            try:
+                reward, terminated, truncated, frame, observation = await client.step(rng.randrange(ACTION_COUNT))
+            except ServerBusy:
+                stats['shed'] += 1
+                # Back off a little so the shedding is worth something
+                await asyncio.sleep(0.001)
+                continue
+            stats['latencies'].append(time.perf_counter() - start_time)
+            if terminated or truncated:
+                await reset_until_done(client)
+
+    await asyncio.gather(*[run_steps() for task in range(0, pipeline)])
+
+def get_percentile(sorted_values, percentile):
+    """The percentile (0-100) of already sorted values, nearest rank"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percentile / 100))]
+
+async def run_load_test(clients=32, duration=5.0, pipeline=1, host='127.0.0.1', port=7777, path=None,
+        percentiles=(50, 90, 99)):
+    """Drive a server with clients that each keep pipeline steps in flight for duration seconds.
+    Returns a dict of the requests per second, latency percentiles (ms) and shed count"""
+    connections = [await SimulationClient.connect(host, port, path) for index in range(0, clients)]
+    stats = {'latencies': [], 'shed': 0}
+    start_time = time.perf_counter()
+    await asyncio.gather(*[run_load_client(client, index, pipeline, start_time + duration, stats)
+        for index, client in enumerate(connections)])
+    seconds = time.perf_counter() - start_time
+    for client in connections:
+        await client.close()
+
+    latencies = sorted(stats['latencies'])
+    return {'requests': len(latencies), 'seconds': seconds, 'rps': len(latencies) / seconds, 'shed': stats['shed'],
+        'percentiles': [(percentile, get_percentile(latencies, percentile) * 1000) for percentile in percentiles],
+        'max_ms': latencies[-1] * 1000 if latencies else 0.0}
@@ -0,0 +1,41 @@
+"""This module implements the fixed step simulation clock for Floor-jumper"""
+# Этот код определяет класс SimulationClock - часы симуляции с фиксированным шагом.
+
+# Каждое обновление игры (кадр симуляции) продвигает часы ровно на step_ms миллисекунд,
+# независимо от того, сколько реального времени прошло. Поэтому время уровня одинаково
+# при обычной игре, при запуске без окна, при ускоренной перемотке и при воспроизведении записи.
+
+# Часы создаются в главном цикле и передаются в Tilemap, который вызывает tick()
+# один раз за обновление. Реальное (wall-clock) время хранится отдельно,
+# как дополнительная метрика (get_wall_time_ms).
+
+import time
+
+class SimulationClock():
+    """Counts simulation frames, each one advances the simulation time by a fixed step"""
+
+    def __init__(self, step_ms):
+        """Start at frame 0"""
+        self.step_ms = step_ms
+        self.frame = 0
+        self.wall_start = time.perf_counter()
+
+    def tick(self):
+        """Advance one simulation frame"""
+        self.frame += 1
+
+    def get_time_ms(self):
+        """Simulation time since the start"""
+        return self.frame * self.step_ms
+
+    def get_wall_time_ms(self):
+        """Real time since the clock was made"""
+        return (time.perf_counter() - self.wall_start) * 1000
+
+    def get_stats_text(self):
+        """Summary of simulated vs real time"""
+        sim_ms = self.get_time_ms()
+        wall_ms = self.get_wall_time_ms()
+        speed = sim_ms / wall_ms if wall_ms > 0 else 0.0
+        return "simulation: {} frames, {:.1f}s simulated in {:.1f}s real time ({:.1f}x)".format(
+            self.frame, sim_ms / 1000, wall_ms / 1000, speed)
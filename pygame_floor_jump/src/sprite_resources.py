@@ -0,0 +1,26 @@
+"""This module implements the objects shared by every sprite of one kind for Floor-jumper"""
+# Этот код определяет класс SpriteResources - объекты, общие для всех спрайтов одного вида
+# в одной игре: настройки, экран, кадры изображений и данные столкновений (хитбоксы и маски).
+
+# Раньше каждый спрайт хранил свои ссылки на эти объекты - по слоту на каждую. Теперь спрайт
+# хранит одну ссылку на общий SpriteResources (так же, как частица хранит ссылку на свой
+# генератор), а свойства settings, screen, images, hitboxes и masks в AnimatedSprite
+# и FlyInSprite читают их оттуда.
+
+# Это не атрибуты класса: в одном процессе может быть несколько игр (сервер симуляции,
+# пакетный рендерер), у каждой свои настройки и экран.
+
+class SpriteResources():
+    """Settings, screen, frames and collision data shared by the sprites of one kind in one game"""
+
+    __slots__ = ('settings', 'screen', 'images', 'hitboxes', 'masks')
+
+    def __init__(self, settings, screen, images=None, hitboxes=None, masks=None):
+        """Store the shared objects, without hitboxes the whole image of each frame is used"""
+        self.settings = settings
+        self.screen = screen
+        self.images = images
+        if hitboxes is None and images is not None:
+            hitboxes = [image.get_rect() for image in images]
+        self.hitboxes = hitboxes
+        self.masks = masks
@@ -0,0 +1,80 @@
+"""This module implements the flat binary buffers used to snapshot the game state for Floor-jumper"""
+# Этот код определяет классы StateWriter и StateReader для снимков состояния игры (snapshot).
+
+# Снимок - это плоская строка байтов: значения пишутся подряд через заранее
+# скомпилированные struct.Struct, без имен полей и без pickle (поверхности pygame не сохраняются).
+# Каждый объект игры сам пишет и читает свое состояние (write_state / read_state),
+# а Tilemap.snapshot() / restore() вызывают их в фиксированном порядке.
+
+# StateWriter собирает куски в список и склеивает их один раз в get_bytes().
+# StateReader читает из bytes/memoryview по текущему смещению (unpack_from), без копирования.
+
+# Здесь же сохраняется состояние генератора random (624 слова Mersenne Twister, позиция и
+# gauss_next) - это самая большая часть снимка, около 2.5 КБ.
+
+import random
+import struct
+
+# uint32 length prefix for byte strings
+LENGTH_FORMAT = struct.Struct('<I')
+# Mersenne Twister state: 624 words plus the position
+RANDOM_STATE_FORMAT = struct.Struct('<625I')
+# has gauss_next, gauss_next
+RANDOM_GAUSS_FORMAT = struct.Struct('<Bd')
+
+class StateWriter():
+    """Appends packed values to a snapshot"""
+
+    def __init__(self):
+        """Start empty"""
+        self.parts = []
+
+    def write(self, state_format, *values):
+        """Pack the values with a struct.Struct"""
+        self.parts.append(state_format.pack(*values))
+
+    def write_bytes(self, data):
+        """A length prefixed byte string"""
+        self.parts.append(LENGTH_FORMAT.pack(len(data)))
+        self.parts.append(bytes(data))
+
+    def write_random_state(self, rng=random):
+        """The full state of the random module (or a random.Random)"""
+        version, internal_state, gauss_next = rng.getstate()
+        self.parts.append(RANDOM_STATE_FORMAT.pack(*internal_state))
+        self.parts.append(RANDOM_GAUSS_FORMAT.pack(gauss_next is not None, gauss_next or 0.0))
+
+    def get_bytes(self):
+        """The finished snapshot"""
+        return b''.join(self.parts)
+
+class StateReader():
+    """Unpacks values from a snapshot in the order they were written"""
+
+    def __init__(self, data):
+        """data is anything supporting the buffer protocol, e.g. bytes or a memoryview of a file"""
+        self.data = data
+        self.offset = 0
+
+    def read(self, state_format):
+        """Unpack the next values with a struct.Struct, returns the tuple"""
+        values = state_format.unpack_from(self.data, self.offset)
+        self.offset += state_format.size
+        return values
+
+    def read_bytes(self):
+        """A length prefixed byte string"""
+        length, = self.read(LENGTH_FORMAT)
+        start = self.offset
+        self.offset += length
+        return bytes(self.data[start:self.offset])
+
+    def read_random_state(self, rng=random):
+        """Put the random module (or a random.Random) back in the saved state"""
+        internal_state = self.read(RANDOM_STATE_FORMAT)
+        has_gauss, gauss_next = self.read(RANDOM_GAUSS_FORMAT)
+        rng.setstate((3, internal_state, gauss_next if has_gauss else None))
+
+    def is_finished(self):
+        """True when everything has been read"""
+        return self.offset == len(self.data)
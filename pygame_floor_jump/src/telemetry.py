@@ -0,0 +1,129 @@
+"""This module implements the per-frame telemetry recorder for Floor-jumper"""
+# Этот код определяет класс TelemetryRecorder, который записывает состояние игры каждый кадр
+# (позиция и состояние игрока, число живых врагов, разбитые блоки, убийства, время уровня,
+# время кадра) в двоичный файл, не замедляя игровой цикл.
+
+# Tilemap.update вызывает record_frame(), который только собирает значения в кортеж и кладет
+# его в ограниченную очередь (queue.Queue) без ожидания. Если очередь полна (диск не успевает),
+# запись отбрасывается и учитывается в счетчике dropped - кадр игры никогда не ждет диск.
+
+# Фоновый поток забирает записи пачками (до telemetry_batch_size), упаковывает каждую в
+# структуру фиксированного размера (TELEMETRY_RECORD_FORMAT) и пишет пачку одним write().
+# Файл сбрасывается на диск (flush) не реже, чем раз в telemetry_flush_seconds.
+
+# Файл: заголовок (магическое число, версия, размер записи и геометрия карты - левый край,
+# низ первого этажа, размер плитки и число рядов плиток в этаже, чтобы положения можно было
+# перевести в клетки и этажи карты),
+# затем записи подряд, поэтому его можно читать как массив записей.
+
+# get_stats_text() сообщает число записей, потерянных записей и среднее время record_frame()
+# в игровом цикле.
+
+import queue
+import struct
+import threading
+import time
+from src.tile_grid import FLOOR_ROWS
+
+# magic, version, record size, map left, ground floor bottom, tile width, tile height, tile rows per floor
+TELEMETRY_HEADER_FORMAT = struct.Struct('<4sHHiiHHH')
+# frame, level, player x, player bottom, player flags (TELEMETRY_FLAG_*), live blobs,
+# blocks removed, kills, elapsed level time (ms), frame time (ms)
+TELEMETRY_RECORD_FORMAT = struct.Struct('<IHiiBHIIdf')
+TELEMETRY_MAGIC = b'FJTL'
+TELEMETRY_VERSION = 3
+TELEMETRY_FLAG_FALLING = 1
+TELEMETRY_FLAG_DYING = 2
+TELEMETRY_FLAG_IDLE_TOP = 4
+TELEMETRY_FLAG_AT_TOP = 8
+
+class TelemetryRecorder():
+    """Queues a record per frame and writes them to a file on a background thread"""
+
+    def __init__(self, path, tile_map):
+        """Open the file and start the writer thread, the map has to be generated already"""
+        settings = tile_map.settings
+        self.path = path
+        self.batch_size = settings.telemetry_batch_size
+        self.flush_seconds = settings.telemetry_flush_seconds
+        self.records = queue.Queue(settings.telemetry_queue_size)
+        self.telemetry_file = open(path, 'wb')
+        # The player stands here on the ground floor, in endless mode the bounds move up as the tower is streamed
+        if tile_map.chunk_streamer:
+            ground_bottom = tile_map.chunk_streamer.base_bottom
+        else:
+            ground_bottom = tile_map.player_bounds_rect.bottom
+        self.telemetry_file.write(TELEMETRY_HEADER_FORMAT.pack(TELEMETRY_MAGIC, TELEMETRY_VERSION,
+            TELEMETRY_RECORD_FORMAT.size, tile_map.map_rect.left, ground_bottom, settings.tile_width, settings.tile_height,
+            FLOOR_ROWS))
+
+        # Statistics, the record counts and time are only touched by the game loop, the batches by the thread
+        self.recorded = 0
+        self.dropped = 0
+        self.record_time = 0.0
+        self.batches_written = 0
+        self.last_frame_time = None
+
+        self.writer_thread = threading.Thread(target=self.write_records, name='telemetry', daemon=True)
+        self.writer_thread.start()
+
+    def record_frame(self, tile_map):
+        """Queue the state of the frame that was just simulated, dropped if the writer has fallen behind"""
+        start_time = time.perf_counter()
+        frame_time_ms = 0.0
+        if self.last_frame_time is not None:
+            frame_time_ms = (start_time - self.last_frame_time) * 1000
+        self.last_frame_time = start_time
+
+        player = tile_map.player
+        flags = ((player.falling and TELEMETRY_FLAG_FALLING) | (player.dying and TELEMETRY_FLAG_DYING)
+            | (player.idle_top and TELEMETRY_FLAG_IDLE_TOP) | (player.at_top and TELEMETRY_FLAG_AT_TOP))
+        record = (tile_map.sim_clock.frame, tile_map.level_info.level, player.rect.centerx, player.rect.bottom, flags,
+            len(tile_map.enemies), tile_map.blocks_removed, tile_map.kills, tile_map.level_timer.elapsed_time_ms,
+            frame_time_ms)
+        try:
+            self.records.put_nowait(record)
+            self.recorded += 1
+        except queue.Full:
+            self.dropped += 1
+
+        self.record_time += time.perf_counter() - start_time
+
+    def write_records(self):
+        """The writer thread: pack and write the queued records in batches until close() queues None"""
+        pack = TELEMETRY_RECORD_FORMAT.pack
+        last_flush = time.perf_counter()
+        running = True
+        while running:
+            batch = []
+            try:
+                # Wait for the first record, then take whatever else is already there
+                record = self.records.get(timeout=self.flush_seconds)
+                while record is not None:
+                    batch.append(pack(*record))
+                    if len(batch) >= self.batch_size:
+                        break
+                    record = self.records.get_nowait()
+                running = record is not None
+            except queue.Empty:
+                pass
+
+            if batch:
+                self.telemetry_file.write(b''.join(batch))
+                self.batches_written += 1
+            if not running or time.perf_counter() - last_flush >= self.flush_seconds:
+                self.telemetry_file.flush()
+                last_flush = time.perf_counter()
+
+    def close(self):
+        """Write whatever is queued and close the file"""
+        # This one waits for room, the writer always makes progress
+        self.records.put(None)
+        self.writer_thread.join()
+        self.telemetry_file.close()
+
+    def get_stats_text(self):
+        """Human readable summary of the recording and its cost to the game loop"""
+        average_us = self.record_time * 1000000 / max(1, self.recorded + self.dropped)
+        return "telemetry: {} records, {} dropped, {} batches, {:.1f}us per frame in the game loop".format(
+            self.recorded, self.dropped, self.batches_written, average_us)
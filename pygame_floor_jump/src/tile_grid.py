@@ -0,0 +1,93 @@
+"""This module implements the array backed grid of tile indices for Floor-jumper"""
+# Этот код определяет класс TileGrid - двумерную сетку индексов плиток карты,
+# которая хранится в одном компактном массиве (array.array, по байту на плитку).
+
+# Сетка строится по параметрам: ширина карты, ширина игрового поля, число этажей,
+# число нижних рядов (subfloors) и колонка слива. Каждый вид ряда (пустой, с трубами,
+# дно, нижний ряд) собирается один раз из параметров, а затем копируется
+# целиком (повторение массива выполняется на уровне C, без цикла по плиткам).
+
+# Индекс -1 означает пустую клетку. Плитка в колонке col и ряду row находится
+# по индексу row * width + col, методы get() и get_row() читают сетку напрямую.
+
+from array import array
+
+# Tile image indices, these depend on the ordering of the tiles image
+TILE_EMPTY = -1
+TILE_WALL_LEFT = 6
+TILE_WALL_RIGHT = 8
+TILE_PIPE_LEFT = 15
+TILE_PIPE_RIGHT = 16
+TILE_FLOOR = 1
+TILE_FLOOR_LEFT = 9
+TILE_FLOOR_RIGHT = 10
+TILE_DRAIN = 5
+TILE_SUBFLOOR = 7
+
+# Tile rows in every floor, the height of the floor patterns built below.  Everything that works
+# out where floors are (block rows, blob spawns, the camera's rows, telemetry) uses this
+FLOOR_ROWS = 3
+
+class TileGrid():
+    """2D grid of tile indices stored row by row in a flat array"""
+
+    def __init__(self, width, playable_width, number_of_floors, number_of_subfloor_rows, drain_col, ground=True):
+        """Generate the grid, every floor is FLOOR_ROWS rows high and the subfloor rows go below the bottom floor.
+        Without the ground every floor is an upper floor, for stacking grids on top of each other"""
+        if (width - playable_width) % 2 or width - playable_width < 4:
+            raise ValueError("A map {} tiles wide can't center a {} tile playfield with walls".format(width, playable_width))
+
+        self.width = width
+        self.playable_width = playable_width
+        self.drain_col = drain_col
+        # Columns either side of the playfield, the walls take the 2 next to it
+        self.margin = (width - playable_width) // 2
+        self.first_playable_col = self.margin
+        self.last_playable_col = self.margin + playable_width - 1
+        if not self.first_playable_col <= drain_col <= self.last_playable_col:
+            raise ValueError("Drain column {} is outside the playfield".format(drain_col))
+
+        # Every 'floor' that is not the bottom or below contains FLOOR_ROWS tile rows of the same pattern,
+        # the bottom floor just has a different 3rd row.  Tiles below that all use the same pattern
+        empty_row = self.make_row(TILE_WALL_LEFT, TILE_WALL_RIGHT, TILE_EMPTY, TILE_WALL_LEFT, TILE_WALL_RIGHT)
+        pipe_row = self.make_row(TILE_WALL_LEFT, TILE_PIPE_LEFT, TILE_EMPTY, TILE_PIPE_RIGHT, TILE_WALL_RIGHT)
+        bottom_row = self.make_row(TILE_WALL_LEFT, TILE_FLOOR_LEFT, TILE_FLOOR, TILE_FLOOR_RIGHT, TILE_WALL_RIGHT)
+        bottom_row[drain_col] = TILE_DRAIN
+        sub_row = self.make_sub_row()
+
+        upper_floor = empty_row + pipe_row + empty_row
+        # bottom floor - no enemy generator
+        bottom_floor = empty_row + empty_row + bottom_row
+        if ground:
+            self.indices = upper_floor * (number_of_floors - 1) + bottom_floor + sub_row * number_of_subfloor_rows
+        else:
+            self.indices = upper_floor * number_of_floors
+        self.height = len(self.indices) // width
+
+    def make_row(self, left_outer, left_inner, fill, right_inner, right_outer):
+        """One row of tiles: the 2 wall tiles either side of the playfield, which is all 'fill'"""
+        outside = array('b', [TILE_EMPTY]) * (self.margin - 2)
+        return (outside + array('b', [left_outer, left_inner]) + array('b', [fill]) * self.playable_width
+            + array('b', [right_inner, right_outer]) + outside)
+
+    def make_sub_row(self):
+        """The rows below the bottom floor, solid except for the gap below the drain"""
+        left_wall = self.margin - 2
+        right_wall = self.width - self.margin + 2
+        row = array('b', [TILE_EMPTY]) * self.width
+        row[left_wall:self.drain_col - 1] = array('b', [TILE_WALL_LEFT]) + array('b', [TILE_SUBFLOOR]) * (self.drain_col - 2 - left_wall)
+        row[self.drain_col - 1] = TILE_WALL_RIGHT
+        row[self.drain_col + 1:right_wall - 1] = array('b', [TILE_WALL_LEFT]) + array('b', [TILE_SUBFLOOR]) * (right_wall - self.drain_col - 3)
+        row[right_wall - 1] = TILE_WALL_RIGHT
+        return row
+
+    def get(self, col, row):
+        """Tile index at the column and row, TILE_EMPTY outside the grid"""
+        if 0 <= col < self.width and 0 <= row < self.height:
+            return self.indices[row * self.width + col]
+        return TILE_EMPTY
+
+    def get_row(self, row):
+        """All the tile indices of one row"""
+        start = row * self.width
+        return self.indices[start:start + self.width]
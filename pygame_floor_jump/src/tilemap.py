@@ -5,8 +5,13 @@
 
 # __init__: Инициализирует объект Tilemap и все принадлежащие ему объекты.
 # сброс: Возвращает игру в исходное состояние.
-# generate_basic_map: Создает базовую плиточную карту.
+# generate_basic_map: Создает базовую плиточную карту (TileGrid) по параметрам из настроек.
 # generate_platforms: Добавляет платформы блоков.
+# generate_platform_layout: Выбирает раскладку блоков (случайную или из набора уровней), build_platform_row строит один ряд.
+# load_level_pack: Загружает набор заранее проверенных уровней.
+# start_next_level: Переключает на следующий уровень, заранее построенный LevelBuilder.
+# snapshot / restore: Сохраняет все состояние симуляции (включая random) в плоскую строку байтов и восстанавливает его.
+# get_spawn_floor_range: Этажи, на которых могут появляться враги (в бесконечном режиме - от ChunkStreamer).
 # move_map: Перемещает карту на заданную величину.
 # blitme: Выводит tilemap на экран.
 # check_block_collisions: проверяет наличие столкновений между игроком и платформами блоков.
@@ -26,28 +31,65 @@
 
 from src.player import Player
 from src.block import Block
+from src.blob_pool import BlobPool
 from src.blob_exit import BlobExit
+from src.camera import Camera
+from src.chunk_streamer import ChunkStreamer
+from src.level_builder import LevelBuilder
 from src.level_info import LevelInfo
+from src.level_pack import LevelPack, generate_layout
 from src.level_timer import LevelTimer
+from src.particle_system import ParticleSystem
+from src.simulation_clock import SimulationClock
+from src.sprite_resources import SpriteResources
+from src.state_buffer import StateReader, StateWriter
+from src.tile_grid import TileGrid, FLOOR_ROWS
 from src.time_bonus import TimeBonus
 import src.game_functions as gf
 import random
+import struct
 from pygame.sprite import Group
 import pygame
 
+# magic, version, flags (SNAPSHOT_FLAG_*)
+SNAPSHOT_HEADER_FORMAT = struct.Struct('<4sHB')
+SNAPSHOT_MAGIC = b'FJSS'
+SNAPSHOT_VERSION = 2
+# The parts of the game that are only there in some configurations, a snapshot can only be
+# restored into a map set up the same way
+SNAPSHOT_FLAG_ENDLESS = 1
+SNAPSHOT_FLAG_PARTICLE_SYSTEM = 2
+SNAPSHOT_FLAG_BAKED_GIBS = 4
+# simulation frame, new enemy counter, enemy generation rate, camera top
+TILEMAP_STATE_FORMAT = struct.Struct('<IIdi')
+# block row count
+BLOCKS_STATE_FORMAT = struct.Struct('<H')
+# number of live enemies, or of bonuses
+COUNT_STATE_FORMAT = struct.Struct('<H')
+
 class Tilemap():
     """Represents a collection of tile (sprites) that represent a map"""
 
-    def __init__(self, settings, screen, map_indicies, images, block_image, exit_images, player_images, blob_images):
-        """Initialize the map and all of its owned objects"""
+    def __init__(self, settings, screen, map_indicies, images, block_image, exit_images, player_images, blob_images, sim_clock=None):
+        """Initialize the map and all of its owned objects, sim_clock is the SimulationClock driven by update()"""
         self.settings = settings
+        if sim_clock is None:
+            sim_clock = SimulationClock(settings.simulation_step_ms)
+        self.sim_clock = sim_clock
         self.screen = screen
         self.images = images
         self.indicies = map_indicies
+        # Built by generate_basic_map, indicies is then the grid's flat array
+        self.tile_grid = None
+        self.map_rect = pygame.Rect((0,0), (0,0))
         self.screen_rect = screen.get_rect()
         self.player_bounds_rect = pygame.Rect((0,0), (0,0))
         self.block_image = block_image
+        # Blocks are laid out on a grid of cells this wide
+        self.block_width = block_image.get_rect().width
         self.block_group = Group()
+        # The same blocks again, in one group per row so drawing can skip the rows out of view
+        self.block_rows = []
         self.x_offset = 0
         self.drainrect = pygame.Rect((0,0), (0,0))
         self.blob_exit = None
@@ -56,88 +98,104 @@ class Tilemap():
         self.player_images = player_images
         self.blob_images = blob_images
         self.enemies = Group()
+        self.blob_pool = BlobPool(settings, screen, blob_images)
         self.new_enemy_counter = 0
+        # Session counters for the telemetry, blocks broken and blobs killed by the player
+        self.blocks_removed = 0
+        self.kills = 0
+        # Optional TelemetryRecorder fed at the end of each update
+        self.telemetry = None
         self.level_info = LevelInfo(self.settings, self.screen)
-        self.level_timer = LevelTimer(self.settings, self.screen)
+        self.level_timer = LevelTimer(self.settings, self.screen, self.sim_clock)
         self.bonuses = []
-        
+        # Scrolls the world vertically, following the player
+        self.camera = Camera(settings, self.screen_rect)
+        # Optional pack of prevalidated layouts, see build_level_pack.py
+        self.level_pack = None
+        if settings.level_pack_file:
+            self.load_level_pack(settings.level_pack_file)
+        # Builds the next level in the background, see update()
+        self.level_builder = LevelBuilder(self)
+        # Streams the floors in endless mode, made by generate_basic_map
+        self.chunk_streamer = None
+
     def reset(self):
         """Resets the game to the starting state"""
+        self.level_builder.discard()
+        # An endless tower starts over from the ground, before the player is put back on it
+        if self.chunk_streamer:
+            self.chunk_streamer.reset()
         self.player.reset()
-        self.enemies.empty()
+        self.blob_pool.release_all(self.enemies)
         gf.generate_new_random_blob(self.settings, self.screen, self.settings.image_res.enemy_blob_images, self)
-        self.generate_platforms()
+        if not self.chunk_streamer:
+            self.generate_platforms()
         self.blob_exit.stop_gibbing()
         self.level_info = LevelInfo(self.settings, self.screen)
         self.settings.enemy_generation_rate = self.settings.enemy_generation_base_rate
         self.level_timer.reset()
+        self.camera.center_on(self.player.rect)
+
+    def load_level_pack(self, path):
+        """Play the layouts from a level pack instead of random ones"""
+        level_pack = LevelPack(path)
+        if level_pack.row_width != self.settings.map_playable_width or level_pack.row_count != self.get_block_row_count():
+            level_pack.close()
+            raise ValueError("{} has {} rows of {} columns, the map needs {} rows of {}".format(path,
+                level_pack.row_count, level_pack.row_width, self.get_block_row_count(), self.settings.map_playable_width))
+        self.level_pack = level_pack
 
     def generate_basic_map(self, number_of_floors, number_of_subfloor_rows=0):
         """Builds a basic tiled map - this depends on the index ordering of the tiles image"""
-        # Every 'floor' that is not the bottom or below contains 3 tile rows of the same pattern
-        # So just make number_of_floors - 1 entries for those, then generate the bottom 'floor'
-        # which just has a different 3rd row of indices.  If tiles below that are needed for
-        # looks then they all use the same pattern
-        empty_row = [-1, 6, 8, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 6, 8, -1]
-        pipe_row = [-1, 6, 15, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 16, 8, -1]
-        bottom_row = [-1, 6, 9,  1,  1,  1,  1,  5, 1,  1,  1,  1,  1, 10, 8, -1]
-        sub_row = [-1, 6, 7,  7,  7,  7,  8,  -1,  6,  7,  7,  7,  7, 7, 8, -1]
-        drain_col = 7
-
-        row_index = 0
-        new_indices = []
-        while row_index < (number_of_floors - 1):
-            new_indices.extend(empty_row)
-            new_indices.extend(pipe_row)
-            new_indices.extend(empty_row)
-            row_index += 1
-
-        # bottom floor - no enemy generator
-        new_indices.extend(empty_row)
-        new_indices.extend(empty_row)
-        new_indices.extend(bottom_row)
-
-        # optional sub-bottom floor row
-        row_index = 0
-        while row_index < number_of_subfloor_rows:
-            new_indices.extend(sub_row)
-            row_index += 1
-
-        # Out with the old, in with the new
-        self.indicies.clear()
-        self.indicies.extend(new_indices)
+        self.tile_grid = TileGrid(self.settings.map_width, self.settings.map_playable_width,
+            number_of_floors, number_of_subfloor_rows, self.settings.map_drain_col)
+        self.indicies = self.tile_grid.indices
 
-        # Add the block platforms
-        self.generate_platforms()
+        # The bottom of the map aligns with the bottom of the screen, taller maps go up past the top
+        map_height = self.tile_grid.height * self.settings.tile_height
+        self.map_rect = pygame.Rect(0, self.screen_rect.height - map_height, self.tile_grid.width * self.settings.tile_width, map_height)
+        self.map_rect.centerx = self.screen_rect.centerx
 
         # Calculate the rect that bounds outer movment of the player (and enemies in most cases)
-        self.x_offset = (self.screen_rect.width - (self.settings.map_width * self.settings.tile_width)) // 2
-        x_offset2 = self.x_offset + self.settings.tile_width * ((self.settings.map_width - self.settings.map_playable_width)/2)
-        self.player_bounds_rect.top = 0
-        self.player_bounds_rect.left = x_offset2
+        self.x_offset = self.map_rect.left
+        self.player_bounds_rect.top = self.map_rect.top
+        self.player_bounds_rect.left = self.x_offset + self.tile_grid.first_playable_col * self.settings.tile_width
         self.player_bounds_rect.width = self.settings.map_playable_width * self.settings.tile_width
-        self.player_bounds_rect.height = self.screen_rect.height - ((number_of_subfloor_rows + 1) * self.settings.tile_height)
+        self.player_bounds_rect.height = map_height - ((number_of_subfloor_rows + 1) * self.settings.tile_height)
+        self.camera.set_bounds(self.map_rect)
+
+        # Add the block platforms
+        self.generate_platforms()
 
         # Drain collision rect
         self.drainrect.width = self.settings.tile_width
         self.drainrect.height = self.settings.tile_height
         self.drainrect.top = self.player_bounds_rect.bottom
-        self.drainrect.left = self.settings.tile_width * drain_col + self.x_offset
+        self.drainrect.left = self.settings.tile_width * self.tile_grid.drain_col + self.x_offset
         self.drainrect.inflate_ip(self.settings.tile_width * -0.99, self.settings.tile_height * -0.75)
         self.drainrect.move_ip(0, self.settings.tile_height * -0.5)
 
         # Create the 'exit'
-        self.blob_exit = BlobExit(self.settings, self.screen, self.exit_images, self)
+        self.blob_exit = BlobExit(SpriteResources(self.settings, self.screen, self.exit_images,
+            self.settings.image_res.blob_exit_hitboxes, self.settings.image_res.blob_exit_masks), self)
+        # A recycled blob is a new spawn, the bursts of the one it was must not claim it
+        self.blob_pool.on_release = self.blob_exit.forget_blob
 
         # Create the player
-        self.player = Player(self.settings, self.screen, self.player_images, self.player_bounds_rect, self)
+        self.player = Player(SpriteResources(self.settings, self.screen, self.player_images,
+            self.settings.image_res.player_sprite_hitboxes, self.settings.image_res.player_sprite_masks),
+            self.player_bounds_rect, self)
+
+        # An endless tower is streamed in chunks on top of this map's ground floor, starting on reset
+        if self.settings.endless_mode:
+            self.chunk_streamer = ChunkStreamer(self, number_of_subfloor_rows)
 
         # Position the timer
         self.level_timer.position_frame(self.screen_rect.centery, self.player_bounds_rect.right + self.settings.tile_width * 2)
 
     def generate_block(self, x, y):
         """Create a new Block object at the given x,y and return it"""
-        new_block = Block(self.settings, self.screen, self.block_image)
+        new_block = Block(self.block_image)
         new_block.rect.top = y
         new_block.rect.left = x
         return new_block
@@ -161,54 +219,244 @@ class Tilemap():
             block_bottom_right = self.generate_block(bounding_rect.left + image_rect.width, bounding_rect.top + image_rect.height)
             group.add(block_bottom_right)
 
-    def generate_platforms(self):
-        """Make groups of sprites that contain the blocks for the player to stand on"""
+    def get_block_row_count(self):
+        """Number of rows that can contain blocks, every floor except the very bottom one"""
+        return self.settings.map_number_floors - 1
 
+    def generate_platform_layout(self, level_number=None):
+        """Returns the block layout for a level, see level_pack.generate_layout() for the format.
+        With a level pack loaded the level number picks the layout, otherwise it is random"""
+        if self.level_pack and level_number:
+            return self.level_pack.get_layout(level_number)
+
+        return generate_layout(self.settings.map_playable_width, self.get_block_row_count(), random)
+
+    def build_candidate_row(self, row):
+        """Create every block that row of a layout can have, as a (top left, top right, bottom left,
+        bottom right) tuple for each column, see LevelBuilder"""
+        image_rect = self.block_image.get_rect()
+        row_top = self.player_bounds_rect.top + self.settings.tile_height * (2 + FLOOR_ROWS * row)
+        candidates = []
+        for col in range(0, self.settings.map_playable_width):
+            left = self.player_bounds_rect.left + col * self.settings.tile_width
+            candidates.append((self.generate_block(left, row_top),
+                self.generate_block(left + image_rect.width, row_top),
+                self.generate_block(left, row_top + image_rect.height),
+                self.generate_block(left + image_rect.width, row_top + image_rect.height)))
+        return candidates
+
+    def build_platform_row(self, layout, row, top=None):
+        """Create the blocks of one row of the layout and return them as a new group,
+        the rows are counted down from top (the top of the player bounds by default)"""
         # Every block is contained within the self.player_bounds_rect
+        if top is None:
+            top = self.player_bounds_rect.top
+
+        # Eligible rows are every FLOOR_ROWS-th row, starting 2 rows below the top
+        row_top = top + self.settings.tile_height * (2 + FLOOR_ROWS * row)
+        new_group = Group()
+        for col in range(0, self.settings.map_playable_width):
+            placement = layout[row * self.settings.map_playable_width + col]
+            bounding_rect = pygame.Rect(0, 0, 0,0)
+            bounding_rect.top = row_top
+            bounding_rect.left = self.player_bounds_rect.left + col * self.settings.tile_width
+            self.generate_blocks(bounding_rect, new_group, placement & 1, placement & 2)
+        return new_group
+
+    def get_spawn_floor_range(self):
+        """First and last floor blobs can spawn on, counted down from the top of the player bounds"""
+        if self.chunk_streamer:
+            return self.chunk_streamer.get_spawn_floor_range()
+
+        # Not the bottom floor, there's no pipe to spawn from
+        return (0, self.settings.map_number_floors - 2)
+
+    def generate_platforms(self, level_number=1):
+        """Make groups of sprites that contain the blocks for the player to stand on"""
+        layout = self.generate_platform_layout(level_number)
+        self.block_group.empty()
+        self.block_rows = []
+        for row in range(0, self.get_block_row_count()):
+            # Each row is its own group, used to only draw the rows in view
+            row_group = self.build_platform_row(layout, row)
+            self.block_rows.append(row_group)
+            self.block_group.add(row_group.sprites())
+
+    def start_next_level(self):
+        """Switch to the next level, its blocks were created by the level builder while the player
+        celebrated at the top, so this is mostly picking them.  The spawn and the layout are rolled
+        here, in the same order as building the whole level in this frame"""
+        self.player.reset()
+        self.blob_pool.release_all(self.enemies)
+        gf.generate_new_random_blob(self.settings, self.screen, self.settings.image_res.enemy_blob_images, self)
+        layout = self.generate_platform_layout(self.level_info.level + 1)
+        # Sprites check their cached support blocks against the current group, so replacing it is safe
+        self.block_rows, self.block_group = self.level_builder.assemble(layout)
+        self.blob_exit.stop_gibbing()
+        self.level_info.increase_level()
+        self.settings.enemy_generation_rate = max(self.settings.enemy_generation_min_rate,
+            self.settings.enemy_generation_rate - self.settings.enemy_generation_level_rate)
+        self.level_timer.reset()
+        self.camera.center_on(self.player.rect)
+
+    def get_snapshot_flags(self):
+        """The SNAPSHOT_FLAG_* bits for how this map is set up"""
+        flags = 0
+        if self.chunk_streamer:
+            flags |= SNAPSHOT_FLAG_ENDLESS
+        if isinstance(self.blob_exit.particle_gen, ParticleSystem):
+            flags |= SNAPSHOT_FLAG_PARTICLE_SYSTEM
+        if self.blob_exit.gib_animations:
+            flags |= SNAPSHOT_FLAG_BAKED_GIBS
+        return flags
+
+    def snapshot(self):
+        """Returns the whole simulation state, including the random module, as a flat byte string.
+        Take it between updates.  Images, fonts and settings aren't included, restore() needs a map
+        made with the same settings.  About 2.8KB at the start of a level, the random state is 2.5KB of it,
+        plus 36 bytes per blob and 36 to 40 per particle"""
+        writer = StateWriter()
+        writer.write(SNAPSHOT_HEADER_FORMAT, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, self.get_snapshot_flags())
+        writer.write_random_state()
+        writer.write(TILEMAP_STATE_FORMAT, self.sim_clock.frame, self.new_enemy_counter,
+            self.settings.enemy_generation_rate, self.camera.rect.top)
+        if self.chunk_streamer:
+            self.chunk_streamer.write_state(writer)
+        self.write_blocks_state(writer)
+        self.level_builder.write_state(writer)
+        self.player.write_state(writer)
+
+        enemy_list = self.enemies.sprites()
+        writer.write(COUNT_STATE_FORMAT, len(enemy_list))
+        for enemy in enemy_list:
+            enemy.write_state(writer)
+        self.blob_exit.write_state(writer, enemy_list)
+
+        self.level_info.write_state(writer)
+        self.level_timer.write_state(writer)
+        writer.write(COUNT_STATE_FORMAT, len(self.bonuses))
+        for bonus in self.bonuses:
+            bonus.write_state(writer)
+        return writer.get_bytes()
+
+    def restore(self, data):
+        """Put the simulation back in the state saved by snapshot()"""
+        reader = StateReader(data)
+        magic, version, flags = reader.read(SNAPSHOT_HEADER_FORMAT)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("Not a version {} snapshot".format(SNAPSHOT_VERSION))
+        if flags != self.get_snapshot_flags():
+            raise ValueError("The snapshot was taken from a map set up differently (flags {}, this map has {})".format(
+                flags, self.get_snapshot_flags()))
+
+        reader.read_random_state()
+        self.sim_clock.frame, self.new_enemy_counter, self.settings.enemy_generation_rate, camera_top = reader.read(TILEMAP_STATE_FORMAT)
+        if self.chunk_streamer:
+            self.chunk_streamer.read_state(reader)
+        self.read_blocks_state(reader)
+        self.camera.rect.top = camera_top
+        self.level_builder.read_state(reader)
+        self.player.read_state(reader)
+
+        enemy_count, = reader.read(COUNT_STATE_FORMAT)
+        self.blob_pool.release_all(self.enemies)
+        enemy_list = []
+        for index in range(0, enemy_count):
+            enemy = self.blob_pool.acquire()
+            if enemy is None:
+                raise ValueError("The snapshot has {} blobs, more than the live limit".format(enemy_count))
+            enemy.read_state(reader)
+            self.enemies.add(enemy)
+            enemy_list.append(enemy)
+        self.blob_exit.read_state(reader, enemy_list)
+
+        self.level_info.read_state(reader)
+        self.level_timer.read_state(reader)
+        bonus_count, = reader.read(COUNT_STATE_FORMAT)
+        self.bonuses = [TimeBonus.read_state(reader, self.settings.bonus_font) for index in range(0, bonus_count)]
+
+    def get_block_row_cells(self, row):
+        """The blocks left in a block row, one byte per cell with a bit for each of its
+        4 blocks (1 top left, 2 top right, 4 bottom left, 8 bottom right)"""
+        cells = bytearray(self.settings.map_playable_width)
+        left = self.player_bounds_rect.left
+        tile_width = self.settings.tile_width
+        row_top = self.player_bounds_rect.top + self.settings.tile_height * (2 + FLOOR_ROWS * row)
+        for block in self.block_rows[row]:
+            col, x = divmod(block.rect.left - left, tile_width)
+            cells[col] |= 1 << ((block.rect.top != row_top) * 2 + (x != 0))
+        return cells
+
+    def write_blocks_state(self, writer):
+        """Save which blocks are left, see get_block_row_cells()"""
+        writer.write(BLOCKS_STATE_FORMAT, len(self.block_rows))
+        writer.write_bytes(b''.join([self.get_block_row_cells(row) for row in range(0, len(self.block_rows))]))
+
+    def read_blocks_state(self, reader):
+        """Rebuild the block rows saved by write_blocks_state, reusing the blocks already in place"""
+        row_count, = reader.read(BLOCKS_STATE_FORMAT)
+        cells = reader.read_bytes()
+        if row_count != len(self.block_rows):
+            raise ValueError("The snapshot has {} block rows, the map has {}".format(row_count, len(self.block_rows)))
+
+        width = self.settings.map_playable_width
+        tile_width = self.settings.tile_width
+        floor_height = self.settings.tile_height * FLOOR_ROWS
+        left = self.player_bounds_rect.left
+        first_top = self.player_bounds_rect.top + self.settings.tile_height * 2
+        image_rect = self.block_image.get_rect()
+        quadrants = ((1, 0, 0), (2, image_rect.width, 0), (4, 0, image_rect.height), (8, image_rect.width, image_rect.height))
 
-        # Find each "row" of tiles that can contain blocks and add some
-        # Eligible rows are every 3rd row starting from the 2nd to top, except the very bottom floor
-        row_rect = pygame.Rect((self.player_bounds_rect.left, self.player_bounds_rect.top + (self.settings.tile_height * 2)), 
-            (self.player_bounds_rect.width, self.settings.tile_width)) 
-        
-        
+        existing_blocks = {block.rect.topleft: block for block in self.block_group}
         self.block_group.empty()
-        for row in range(0, (self.settings.map_number_floors-1)):
-            new_group = Group()
-
-            # Each column in the eligble row has 4 valid placements for a block
-            # Note - there are more permutations, these are just the ones allowed
-            # OO OO OO OO
-            # XX OX OX OO
-            for col in range(0, self.settings.map_playable_width):
-                bounding_rect = pygame.Rect(0, 0, 0,0)
-                bounding_rect.top = row_rect.top
-                bounding_rect.left = row_rect.left + col * self.settings.tile_width
-                self.generate_blocks(bounding_rect, new_group, random.choice([True, False]), random.choice([True, False]))
-            
-            # Each row is its own group.  This could limit collision checks later
-            self.block_group.add(new_group.sprites())
-            # Shif the bounding rect down one floor
-            row_rect = row_rect.move(0, self.settings.tile_height * 3)
+        for row_group in self.block_rows:
+            row_group.empty()
+
+        block_rows = []
+        for row in range(0, row_count):
+            row_group = Group()
+            row_top = first_top + row * floor_height
+            for col in range(0, width):
+                cell = cells[row * width + col]
+                for bit, x, y in quadrants:
+                    if cell & bit:
+                        position = (left + col * tile_width + x, row_top + y)
+                        block = existing_blocks.get(position)
+                        if block is None:
+                            block = self.generate_block(*position)
+                        row_group.add(block)
+            block_rows.append(row_group)
+        self.block_rows = block_rows
+
+        # The block group keeps the order the blocks were first added in, the collisions depend on it
+        if self.chunk_streamer:
+            self.chunk_streamer.set_block_rows(block_rows)
+            block_rows = self.chunk_streamer.get_block_rows_in_load_order()
+        for row_group in block_rows:
+            self.block_group.add(row_group.sprites())
 
     def update(self):
-        """Update all owned objects (blocks, player, enemies, etc)"""
+        """Update all owned objects (blocks, player, enemies, etc), this is one step of the simulation"""
+        self.sim_clock.tick()
+
         if self.player.at_top:
             self.level_timer.stop()
 
+        # While the player celebrates at the top, build the next level a row per frame
+        if self.player.idle_top and not self.level_builder.is_ready():
+            self.level_builder.step()
+
         # Check for a reset flag set on the player object
         if self.player.won_level:
-            self.player.reset()
-            self.enemies.empty()
-            gf.generate_new_random_blob(self.settings, self.screen, self.settings.image_res.enemy_blob_images, self)
-            self.generate_platforms()
-            self.blob_exit.stop_gibbing()
-            self.level_info.increase_level()
-            self.settings.enemy_generation_rate -= self.settings.enemy_generation_level_rate
-            self.level_timer.reset()
+            self.start_next_level()
 
-        # Update the player
+        # Update the player, the camera follows
         self.player.update(self, self.enemies)
+        self.camera.follow(self.player.rect)
+
+        # Keep the floors around the player loaded
+        if self.chunk_streamer:
+            self.chunk_streamer.update()
 
         # Check if it's time to add a new enemy to the map
         self.new_enemy_counter += 1
@@ -235,49 +483,81 @@ class Tilemap():
             if not bonus.alive():
                 self.bonuses.remove(bonus)
 
+        if self.telemetry:
+            self.telemetry.record_frame(self)
+
     def draw_tiles(self, draw_grid_overlay=False):
-        """Draws just the tile portion of the map"""
-        # Make the bottom of the map align with the bottom of the screen
-        number_of_rows = len(self.indicies) / self.settings.map_width
-        map_height = number_of_rows * self.settings.tile_height
-        y_offset = self.screen_rect.height - map_height
-        rect = pygame.Rect((self.x_offset, y_offset), (self.settings.tile_width, self.settings.tile_height))
-        tiles_draw_per_row = 0
-
-        # Loop through each row and render it, simple for now, map fits on the screen
-        for index in self.indicies:
-            if index >= 0:
-                self.screen.blit(self.images[index], rect)
-                if draw_grid_overlay:
-                    color_red = (255, 0, 0)
-                    pygame.draw.rect(self.screen, color_red, rect, 1)
-            tiles_draw_per_row += 1
-            rect.left += self.settings.tile_width
-
-            # Every row worth of tiles, drop down one level and reset the x coord
-            if tiles_draw_per_row == self.settings.map_width:
-                rect.top += self.settings.tile_height
-                rect.left = self.x_offset
-                tiles_draw_per_row = 0
-
-        # Draw the blocks
-        # This works because each block has 'image' member defined
-        self.block_group.draw(self.screen)
-    
+        """Draws just the tile portion of the map that is in view"""
+        for tile_grid, top in self.get_tile_grids():
+            self.draw_tile_grid(tile_grid, top, draw_grid_overlay)
+
+        self.draw_blocks()
+
+    def get_tile_grids(self):
+        """(tile grid, world y of its top) of each grid of the map, an endless tower has one per loaded chunk"""
+        if self.chunk_streamer:
+            return self.chunk_streamer.get_tile_grids()
+        return [(self.tile_grid, self.map_rect.top)]
+
+    def get_visible_tile_rows(self, tile_grid, top):
+        """(first row, end row) of the rows of the grid (with its top at world y 'top') that overlap the view"""
+        tile_height = self.settings.tile_height
+        view = self.camera.rect
+        return (max(0, (view.top - top) // tile_height),
+            min(tile_grid.height, (view.bottom - top + tile_height - 1) // tile_height))
+
+    def get_visible_block_rows(self):
+        """The indices of the block rows that overlap the view"""
+        view = self.camera.rect
+        floor_height = self.settings.tile_height * FLOOR_ROWS
+        # Row n covers one tile row, starting 2 tile rows below the top of floor n
+        first_top = self.player_bounds_rect.top + self.settings.tile_height * 2
+        first_row = max(0, (view.top - first_top - self.settings.tile_height) // floor_height + 1)
+        end_row = min(len(self.block_rows), (view.bottom - first_top + floor_height - 1) // floor_height)
+        return range(first_row, end_row)
+
+    def draw_tile_grid(self, tile_grid, top, draw_grid_overlay=False):
+        """Draws the rows of the grid (with its top at world y 'top') that are in view"""
+        tile_width = self.settings.tile_width
+        tile_height = self.settings.tile_height
+
+        # Only the rows overlapping the view, so the cost depends on the screen and not the map height
+        first_row, end_row = self.get_visible_tile_rows(tile_grid, top)
+        rect = pygame.Rect((self.x_offset, top + first_row * tile_height + self.camera.get_y_offset()), (tile_width, tile_height))
+
+        for row in range(first_row, end_row):
+            rect.left = self.x_offset
+            for index in tile_grid.get_row(row):
+                if index >= 0:
+                    self.screen.blit(self.images[index], rect)
+                    if draw_grid_overlay:
+                        color_red = (255, 0, 0)
+                        pygame.draw.rect(self.screen, color_red, rect, 1)
+                rect.left += tile_width
+            rect.top += tile_height
+
+    def draw_blocks(self):
+        """Draws the block rows that are in view"""
+        y_offset = self.camera.get_y_offset()
+        for row in self.get_visible_block_rows():
+            # This works because each block has 'image' and 'rect' members defined
+            self.screen.blits([(block.image, block.rect.move(0, y_offset)) for block in self.block_rows[row]], False)
+
     def draw(self, draw_grid_overlay=False):
         """Draws the tilemap."""
         # Draw the enemies - can't use the Gorup method because of our animation logic
         for enemy in self.enemies:
-            enemy.draw()
+            enemy.draw(self.camera)
 
         self.draw_tiles(draw_grid_overlay)
 
         # Draw the player
-        self.player.draw()
+        self.player.draw(self.camera)
 
         # Draw the exit
-        self.blob_exit.draw()
+        self.blob_exit.draw(self.camera)
 
+        # The level info and timer are drawn in screen space, they don't scroll
         # Draw the level info
         self.level_info.draw()
 
@@ -286,4 +566,4 @@ class Tilemap():
 
         # Draw bonuses
         for bonus in self.bonuses:
-            bonus.draw(self.screen)
\ No newline at end of file
+            bonus.draw(self.screen, self.camera)
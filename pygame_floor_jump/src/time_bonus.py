@@ -28,14 +28,21 @@
 from src.level_timer import LevelTimer
 import random
 import pygame
+import struct
+
+# ms_reduction, dy, frame, frame_delay, frames_max, total_frames, text rect (left, top, width, height), color
+TIME_BONUS_STATE_FORMAT = struct.Struct('<iiHHHHiiiiBBB')
 
 class TimeBonus():
     """Time reduction for killing a blob"""
 
+    # Only the text position is needed after creation, the enemy rect isn't kept
+    __slots__ = ('ms_reduction', 'dy', 'frame', 'frame_delay', 'frames_max', 'total_frames',
+        'font', 'text', 'text_rect', 'color')
+
     def __init__(self, enemy_rect, text, milliseconds, level_timer, font):
         """save the initial state"""
         self.ms_reduction = milliseconds
-        self.enemy_rect = enemy_rect
         self.dy = -4
         self.frame = 0
         self.frame_delay = 2
@@ -44,8 +51,8 @@ class TimeBonus():
         self.font = font
         self.text = text
         self.text_rect = self.font.get_rect(self.text)
-        self.text_rect.left = self.enemy_rect.left
-        self.text_rect.top = self.enemy_rect.top
+        self.text_rect.left = enemy_rect.left
+        self.text_rect.top = enemy_rect.top
         self.color = (255, 0, 0)
 
         level_timer.elapsed_time_ms = max(0, level_timer.elapsed_time_ms - milliseconds)
@@ -63,9 +70,30 @@ class TimeBonus():
             self.text_rect.move_ip(0, self.dy)
             self.color = (random.choice([255, 0]), 0, random.choice([255, 0]))
 
-    def draw(self, screen):
-        """Draw the current text"""
-        if self.total_frames < self.frames_max and self.text_rect.top >= 0:
-            self.font.render_to(screen, (self.text_rect.left, self.text_rect.top), self.text, self.color)
+    def write_state(self, writer):
+        """Save the bonus to a snapshot"""
+        rect = self.text_rect
+        writer.write(TIME_BONUS_STATE_FORMAT, self.ms_reduction, self.dy, self.frame, self.frame_delay, self.frames_max,
+            self.total_frames, rect.left, rect.top, rect.width, rect.height, *self.color)
+        writer.write_bytes(self.text.encode('utf-8'))
+
+    @classmethod
+    def read_state(cls, reader, font):
+        """Make a bonus from the state saved by write_state, without taking the time off the timer again"""
+        bonus = cls.__new__(cls)
+        (bonus.ms_reduction, bonus.dy, bonus.frame, bonus.frame_delay, bonus.frames_max, bonus.total_frames,
+            left, top, width, height, red, green, blue) = reader.read(TIME_BONUS_STATE_FORMAT)
+        bonus.text_rect = pygame.Rect(left, top, width, height)
+        bonus.color = (red, green, blue)
+        bonus.text = reader.read_bytes().decode('utf-8')
+        bonus.font = font
+        return bonus
+
+    def draw(self, screen, camera):
+        """Draw the current text, unless it's out of view or has gone past the top of the screen"""
+        if self.total_frames < self.frames_max and camera.is_visible(self.text_rect):
+            text_top = self.text_rect.top + camera.get_y_offset()
+            if text_top >= 0:
+                self.font.render_to(screen, (self.text_rect.left, text_top), self.text, self.color)
         
 
@@ -0,0 +1,277 @@
+"""This module implements the multi-process vector environments for Floor-jumper"""
+# Этот код определяет два класса, которые запускают N сред GameEnv (src/game_env.py) в отдельных
+# процессах и делают шаг во всех сразу: step(actions) принимает N действий и возвращает
+# наблюдения [N, ...], награды [N] и флаги terminated/truncated [N]. Когда эпизод в среде
+# заканчивается, она сразу начинает новый, и возвращается первое наблюдение нового эпизода.
+
+# SharedMemoryVectorEnv - наблюдения, награды, флаги, действия и команды лежат в общей памяти
+# (multiprocessing.shared_memory), у каждого процесса своя строка. Процесс пишет наблюдение
+# прямо в свою строку (символьный кодировщик пишет туда сам, пиксели копируются одним
+# присваиванием), поэтому ничего не сериализуется (pickle). Шаг синхронизируется двумя
+# семафорами (multiprocessing.Semaphore) на процесс: "начать" и "готово". Канал (Pipe) нужен только
+# при запуске: процесс сообщает форму наблюдения, а получает имена блоков общей памяти.
+# Возвращаемые массивы - это сама общая память, они меняются при следующем шаге.
+# Семафоры ждут с таймаутом (SIGNAL_POLL_SECONDS) в цикле: если рабочий процесс умер, step()
+# и reset() выбрасывают RuntimeError, а рабочий процесс завершается, если умер родитель.
+# Event здесь не подходит: set() ждет пробуждения всех ожидающих, и процесс, убитый во время
+# ожидания, навсегда блокирует того, кто вызывает set().
+
+# PipeVectorEnv - обычный способ для сравнения: команды и наблюдения передаются через Pipe,
+# то есть сериализуются каждый шаг. Сравнение - benchmarks/vector_env.py.
+
+# С fork_server (src/fork_server.py) рабочие процессы не создают среду сами, а получают
+# готовую копию среды сервера через fork - запуск занимает миллисекунды, картинки общие.
+# get_worker_memory() возвращает память каждого рабочего процесса.
+
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+from src.game_env import GameEnv
+from src.fork_server import read_memory_usage
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# What the workers are asked to do
+COMMAND_STEP = 0
+COMMAND_RESET = 1
+COMMAND_CLOSE = 2
+# How often a wait on a worker checks that the other side is still alive
+SIGNAL_POLL_SECONDS = 0.5
+
+def create_shared_array(shape, dtype):
+    """Returns (shared memory block, array over it) for a new zeroed array"""
+    dtype = numpy.dtype(dtype)
+    memory = shared_memory.SharedMemory(create=True, size=max(1, int(numpy.prod(shape)) * dtype.itemsize))
+    array = numpy.ndarray(shape, dtype=dtype, buffer=memory.buf)
+    array[...] = 0
+    return (memory, array)
+
+def attach_shared_arrays(layout):
+    """Open the arrays created by the parent, layout is {name: (block name, shape, dtype)}.
+    Returns (shared memory blocks, {name: array})"""
+    memories = []
+    arrays = {}
+    for name, (block_name, shape, dtype) in layout.items():
+        memory = shared_memory.SharedMemory(name=block_name)
+        memories.append(memory)
+        arrays[name] = numpy.ndarray(shape, dtype=numpy.dtype(dtype), buffer=memory.buf)
+    return (memories, arrays)
+
+def create_worker_env(env_options, fork_server):
+    """The environment of a worker, made from env_options or inherited from the fork server"""
+    if fork_server:
+        return fork_server.create_env()
+    return GameEnv(**env_options)
+
+def acquire_while_alive(semaphore, process):
+    """Wait for the semaphore, returns False instead if the process on the other side exits first"""
+    while not semaphore.acquire(timeout=SIGNAL_POLL_SECONDS):
+        if not process.is_alive():
+            return False
+    return True
+
+def run_shared_memory_worker(index, connection, env_options, start_signal, finished_signal, fork_server=None):
+    """A worker process of SharedMemoryVectorEnv: run commands on its environment until told to close"""
+    env = create_worker_env(env_options, fork_server)
+    connection.send((env.observation_shape, env.observation_dtype.str))
+    memories, arrays = attach_shared_arrays(connection.recv())
+    connection.close()
+
+    slot = arrays['observations'][index]
+    if env.symbolic:
+        # The encoder writes the observation straight into the shared row
+        env.encoder.buffer = slot
+    parent = multiprocessing.parent_process()
+    while True:
+        # Nobody will start another command once the parent is gone, so the worker closes itself
+        if not acquire_while_alive(start_signal, parent):
+            break
+        command = arrays['commands'][index]
+        if command == COMMAND_CLOSE:
+            break
+
+        if command == COMMAND_RESET:
+            seed = int(arrays['seeds'][index])
+            observation, info = env.reset(None if seed < 0 else seed)
+            reward, terminated, truncated = (0.0, False, False)
+        else:
+            observation, reward, terminated, truncated, info = env.step(int(arrays['actions'][index]))
+            if terminated or truncated:
+                observation, info = env.reset()
+
+        if observation is not slot:
+            slot[...] = observation
+        arrays['rewards'][index] = reward
+        arrays['terminated'][index] = terminated
+        arrays['truncated'][index] = truncated
+        finished_signal.release()
+
+    # The views have to go before the blocks can be closed
+    env = None
+    slot = None
+    observation = None
+    arrays.clear()
+    for memory in memories:
+        memory.close()
+
+def run_pipe_worker(connection, env_options, fork_server=None):
+    """A worker process of PipeVectorEnv: receive commands and send the results back through the pipe"""
+    env = create_worker_env(env_options, fork_server)
+    connection.send((env.observation_shape, env.observation_dtype.str))
+    while True:
+        command, data = connection.recv()
+        if command == COMMAND_CLOSE:
+            break
+
+        if command == COMMAND_RESET:
+            observation, info = env.reset(data)
+            connection.send((observation, 0.0, False, False))
+        else:
+            observation, reward, terminated, truncated, info = env.step(data)
+            if terminated or truncated:
+                observation, info = env.reset()
+            connection.send((observation, reward, terminated, truncated))
+    connection.close()
+
+class SharedMemoryVectorEnv():
+    """num_envs GameEnv worker processes stepped together, results are passed in shared memory"""
+
+    # False when NumPy isn't installed
+    available = numpy is not None
+
+    def __init__(self, num_envs, fork_server=None, **env_options):
+        """Start the workers, env_options are the GameEnv arguments.  With a fork_server the
+        workers are forked from its environment and env_options are ignored"""
+        self.num_envs = num_envs
+        context = fork_server.context if fork_server else multiprocessing
+        # Otherwise each worker starts its own tracker when it opens the blocks, which unlinks them when the worker exits
+        resource_tracker.ensure_running()
+        self.start_signals = [context.Semaphore(0) for index in range(0, num_envs)]
+        self.finished_signals = [context.Semaphore(0) for index in range(0, num_envs)]
+        connections = []
+        self.processes = []
+        for index in range(0, num_envs):
+            parent_connection, child_connection = context.Pipe()
+            process = context.Process(target=run_shared_memory_worker, args=(index, child_connection,
+                env_options, self.start_signals[index], self.finished_signals[index], fork_server), daemon=True)
+            process.start()
+            child_connection.close()
+            connections.append(parent_connection)
+            self.processes.append(process)
+
+        # The workers know the observation shape once their environment is made
+        shape, dtype = connections[0].recv()
+        for connection in connections[1:]:
+            connection.recv()
+        self.observation_shape = tuple(shape)
+        self.memories = []
+        layout = {}
+        for name, array_shape, array_dtype in (('observations', (num_envs,) + self.observation_shape, dtype),
+                ('rewards', (num_envs,), numpy.float32), ('terminated', (num_envs,), numpy.bool_),
+                ('truncated', (num_envs,), numpy.bool_), ('actions', (num_envs,), numpy.int32),
+                ('commands', (num_envs,), numpy.uint8), ('seeds', (num_envs,), numpy.int64)):
+            memory, array = create_shared_array(array_shape, array_dtype)
+            setattr(self, name, array)
+            self.memories.append(memory)
+            layout[name] = (memory.name, array_shape, numpy.dtype(array_dtype).str)
+        for connection in connections:
+            connection.send(layout)
+            connection.close()
+
+    def run_command(self, command):
+        """Have every worker run the command and wait for all of them, raises RuntimeError if one
+        has died (the environment can only be closed after that)"""
+        self.commands[:] = command
+        for signal in self.start_signals:
+            signal.release()
+        for signal, process in zip(self.finished_signals, self.processes):
+            if not acquire_while_alive(signal, process):
+                raise RuntimeError("Vector env worker {} exited with code {}".format(process.pid, process.exitcode))
+
+    def reset(self, seed=None):
+        """Start a new episode in every environment, environment i gets seed + i.  Returns the observations"""
+        self.seeds[:] = -1 if seed is None else numpy.arange(seed, seed + self.num_envs)
+        self.run_command(COMMAND_RESET)
+        return self.observations
+
+    def step(self, actions):
+        """One step of every environment.  Returns (observations, rewards, terminated, truncated),
+        arrays in shared memory that the next step overwrites"""
+        self.actions[:] = actions
+        self.run_command(COMMAND_STEP)
+        return (self.observations, self.rewards, self.terminated, self.truncated)
+
+    def get_worker_memory(self):
+        """(rss, pss, private) in KB of each worker process, None where it can't be read"""
+        return [read_memory_usage(process.pid) for process in self.processes]
+
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        self.commands[:] = COMMAND_CLOSE
+        for signal in self.start_signals:
+            signal.release()
+        for process in self.processes:
+            process.join()
+        for name in ('observations', 'rewards', 'terminated', 'truncated', 'actions', 'commands', 'seeds'):
+            setattr(self, name, None)
+        for memory in self.memories:
+            memory.close()
+            memory.unlink()
+        self.memories = []
+
+class PipeVectorEnv():
+    """num_envs GameEnv worker processes stepped together, results are pickled through pipes"""
+
+    # False when NumPy isn't installed
+    available = numpy is not None
+
+    def __init__(self, num_envs, fork_server=None, **env_options):
+        """Start the workers, env_options are the GameEnv arguments.  With a fork_server the
+        workers are forked from its environment and env_options are ignored"""
+        self.num_envs = num_envs
+        context = fork_server.context if fork_server else multiprocessing
+        self.connections = []
+        self.processes = []
+        for index in range(0, num_envs):
+            parent_connection, child_connection = context.Pipe()
+            process = context.Process(target=run_pipe_worker, args=(child_connection, env_options, fork_server),
+                daemon=True)
+            process.start()
+            child_connection.close()
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+        shape, dtype = [connection.recv() for connection in self.connections][0]
+        self.observation_shape = tuple(shape)
+
+    def run_command(self, command, data):
+        """Send each worker its command, returns (observations, rewards, terminated, truncated)"""
+        for connection, value in zip(self.connections, data):
+            connection.send((command, value))
+        results = [connection.recv() for connection in self.connections]
+        observations, rewards, terminated, truncated = zip(*results)
+        return (numpy.stack(observations), numpy.array(rewards, dtype=numpy.float32),
+            numpy.array(terminated, dtype=numpy.bool_), numpy.array(truncated, dtype=numpy.bool_))
+
+    def reset(self, seed=None):
+        """Start a new episode in every environment, environment i gets seed + i.  Returns the observations"""
+        seeds = [None if seed is None else seed + index for index in range(0, self.num_envs)]
+        return self.run_command(COMMAND_RESET, seeds)[0]
+
+    def step(self, actions):
+        """One step of every environment.  Returns (observations, rewards, terminated, truncated)"""
+        return self.run_command(COMMAND_STEP, [int(action) for action in actions])
+
+    def get_worker_memory(self):
+        """(rss, pss, private) in KB of each worker process, None where it can't be read"""
+        return [read_memory_usage(process.pid) for process in self.processes]
+
+    def close(self):
+        """Stop the workers"""
+        for connection in self.connections:
+            connection.send((COMMAND_CLOSE, None))
+        for process in self.processes:
+            process.join()
+        for connection in self.connections:
+            connection.close()